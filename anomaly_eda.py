@@ -0,0 +1,287 @@
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+from stats_eda import KLLSketch, numeric_columns
+
+# ================================
+# 🕵️ Deteção de anomalias multivariada
+# ================================
+# O IQR olha para uma coluna de cada vez; registos suspeitos (ex.: fraude em
+# notas fiscais) costumam ser atípicos na combinação de valores. Os detetores
+# abaixo treinam numa amostra (ou incrementalmente, bloco a bloco), pontuam
+# todas as linhas em blocos de ANOMALY_CHUNK_ROWS e guardam só as
+# ANOMALY_MAX_ROWS linhas com maior score: memória limitada. Ao esgotar
+# ANOMALY_TIME_BUDGET segundos param e reportam quantas linhas pontuaram.
+ANOMALY_FIT_ROWS = int(os.getenv("EDA_ANOMALY_FIT_ROWS", "50000"))
+ANOMALY_CHUNK_ROWS = int(os.getenv("EDA_ANOMALY_CHUNK_ROWS", "100000"))
+ANOMALY_MAX_ROWS = int(os.getenv("EDA_ANOMALY_MAX_ROWS", "5000"))
+ANOMALY_TIME_BUDGET = float(os.getenv("EDA_ANOMALY_TIME_BUDGET", "20"))
+ANOMALY_CONTAMINATION = float(os.getenv("EDA_ANOMALY_CONTAMINATION", "0.01"))
+
+# Limiar clássico do z-score modificado (Iglewicz & Hoaglin)
+ROBUST_Z_THRESHOLD = 3.5
+
+METHODS = {
+    "robust": "z-score robusto (MAD)",
+    "isolation": "Isolation Forest",
+    "streaming": "MiniBatchKMeans incremental",
+}
+
+
+def _chunks(df, columns):
+    """(rótulos, valores float64) de cada bloco de linhas; datasets em disco numerados por posição."""
+    if hasattr(df, "iter_chunks"):
+        start = 0
+        for chunk in df.iter_chunks(columns):
+            values = chunk[columns].to_numpy(dtype="float64", na_value=np.nan)
+            yield pd.RangeIndex(start, start + len(values)), values
+            start += len(values)
+        return
+    for start in range(0, len(df), ANOMALY_CHUNK_ROWS):
+        chunk = df.iloc[start:start + ANOMALY_CHUNK_ROWS][columns]
+        yield chunk.index, chunk.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _sample(df, columns, n, seed=0):
+    """Amostra aleatória de até n linhas (por blocos, para datasets em disco)."""
+    if hasattr(df, "iter_chunks"):
+        rng = np.random.default_rng(seed)
+        frac = min(1.0, n / max(len(df), 1))
+        parts = [values[rng.random(len(values)) < frac] for _, values in _chunks(df, columns)]
+        return np.concatenate(parts) if parts else np.empty((0, len(columns)))
+    frame = df[columns]
+    if len(frame) > n:
+        frame = frame.sample(n=n, random_state=seed)
+    return frame.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def robust_center_scale(sample):
+    """
+    Mediana e MAD/0.6745 por coluna (comparável ao desvio padrão numa normal).
+    Com MAD 0 usa IQR/1.349 e depois o desvio padrão; colunas constantes ficam NaN.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        center = np.nanmedian(sample, axis=0)
+        mad = np.nanmedian(np.abs(sample - center), axis=0) / 0.6745
+        q1, q3 = np.nanpercentile(sample, [25, 75], axis=0)
+        std = np.nanstd(sample, axis=0)
+    scale = np.where(mad > 0, mad, np.where(q3 - q1 > 0, (q3 - q1) / 1.349, std))
+    return center, np.where(scale > 0, scale, np.nan)
+
+
+class RobustZDetector:
+    """Maior |z-score modificado| da linha, com mediana e MAD estimados numa amostra."""
+
+    incremental = False
+    threshold = ROBUST_Z_THRESHOLD
+
+    def fit(self, df, columns, deadline):
+        sample = _sample(df, columns, ANOMALY_FIT_ROWS)
+        self.center, self.scale = robust_center_scale(sample)
+        return len(sample)
+
+    def score(self, values):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            z = np.abs((values - self.center) / self.scale)
+            return np.nan_to_num(np.nanmax(z, axis=1), nan=0.0)
+
+
+class IsolationDetector:
+    """IsolationForest treinado numa amostra; ausentes preenchidos com a mediana."""
+
+    incremental = False
+    threshold = None
+
+    def fit(self, df, columns, deadline):
+        from sklearn.ensemble import IsolationForest
+        sample = _sample(df, columns, ANOMALY_FIT_ROWS)
+        self.center, self.scale = robust_center_scale(sample)
+        self.model = IsolationForest(n_estimators=100, random_state=0).fit(self._fill(sample))
+        return len(sample)
+
+    def _fill(self, values):
+        return np.where(np.isnan(values), np.nan_to_num(self.center), values)
+
+    def score(self, values):
+        # score_samples: menor = mais anómalo; invertido para "maior = mais suspeito"
+        return -self.model.score_samples(self._fill(values))
+
+
+class StreamingDetector:
+    """
+    StandardScaler + MiniBatchKMeans treinados com partial_fit bloco a bloco
+    (uma passagem, sem amostra em memória); score = distância ao centróide
+    mais próximo nos dados padronizados.
+    """
+
+    incremental = True
+    threshold = None
+    n_clusters = 8
+
+    def fit(self, df, columns, deadline):
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.cluster import MiniBatchKMeans
+        self.scaler = StandardScaler()
+        self.model = MiniBatchKMeans(n_clusters=self.n_clusters, random_state=0, n_init=3)
+        seen, pending = 0, []
+        for _, values in _chunks(df, columns):
+            self.scaler.partial_fit(values)
+            pending.append(values)
+            # O k-means precisa de pelo menos n_clusters linhas por chamada
+            if sum(map(len, pending)) >= self.n_clusters:
+                block = np.concatenate(pending)
+                self.model.partial_fit(self._scaled(block))
+                seen, pending = seen + len(block), []
+            if time.monotonic() > deadline:
+                break
+        if not seen:
+            raise ValueError(f"são precisas pelo menos {self.n_clusters} linhas")
+        self.center, self.scale = self.scaler.mean_, np.where(self.scaler.scale_ > 0, self.scaler.scale_, np.nan)
+        return seen
+
+    def _scaled(self, values):
+        return np.nan_to_num(self.scaler.transform(values), nan=0.0)
+
+    def score(self, values):
+        return self.model.transform(self._scaled(values)).min(axis=1)
+
+
+DETECTORS = {"robust": RobustZDetector, "isolation": IsolationDetector, "streaming": StreamingDetector}
+
+
+class _TopRows:
+    """As `k` linhas com maior score vistas até agora (memória O(k))."""
+
+    def __init__(self, k):
+        self.k = k
+        self.labels, self.scores, self.columns = [], [], []
+        self.size = 0
+
+    def floor(self):
+        return -np.inf if self.size < self.k else float(np.min(np.concatenate(self.scores)))
+
+    def add(self, labels, scores, columns):
+        self.labels.append(np.asarray(labels, dtype=object))
+        self.scores.append(scores)
+        self.columns.append(np.asarray(columns, dtype=object))
+        self.size += len(scores)
+        if self.size > 2 * self.k:
+            self._trim()
+
+    def _trim(self):
+        labels, scores, columns = (np.concatenate(p) for p in (self.labels, self.scores, self.columns))
+        keep = np.argpartition(-scores, self.k - 1)[:self.k] if len(scores) > self.k else slice(None)
+        self.labels, self.scores, self.columns = [labels[keep]], [scores[keep]], [columns[keep]]
+        self.size = len(self.scores[0])
+
+    def frame(self, threshold) -> pd.DataFrame:
+        if not self.size:
+            return pd.DataFrame({"score": [], "colunas": []})
+        self._trim()
+        rows = pd.DataFrame({"score": self.scores[0], "colunas": self.columns[0]},
+                            index=pd.Index(self.labels[0]))
+        rows = rows[rows["score"] > threshold]
+        return rows.sort_values("score", ascending=False, kind="stable")
+
+
+def _deviating_columns(values, center, scale, names, top=3):
+    """Para cada linha, as colunas mais afastadas do centro (em desvios), ex.: 'valor (+8.1)'."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        z = np.nan_to_num((values - center) / scale, nan=0.0)
+    order = np.argsort(-np.abs(z), axis=1)[:, :top]
+    return [", ".join(f"{names[j]} ({z[i, j]:+.1f})" for j in row if z[i, j] != 0)
+            for i, row in enumerate(order)]
+
+
+class AnomalyReport:
+    """
+    Resultado de detect_anomalies(): `rows` (linhas acima do limiar, até
+    ANOMALY_MAX_ROWS, com score e colunas mais desviadas) e os números da
+    execução. `complete` é False se o orçamento de tempo acabou antes de
+    pontuar todas as linhas.
+    """
+
+    def __init__(self, method, columns, rows, threshold, n_rows, n_scored, n_flagged, fit_rows, elapsed):
+        self.method = method
+        self.columns = list(columns)
+        self.rows = rows
+        self.threshold = threshold
+        self.n_rows = n_rows
+        self.n_scored = n_scored
+        self.n_flagged = n_flagged
+        self.fit_rows = fit_rows
+        self.elapsed = elapsed
+
+    @property
+    def complete(self):
+        return self.n_scored >= self.n_rows
+
+    def to_csv(self) -> bytes:
+        return self.rows.to_csv(index_label="linha").encode("utf-8")
+
+    def summary(self) -> dict:
+        return {
+            "método": METHODS[self.method],
+            "colunas": len(self.columns),
+            "linhas": self.n_rows,
+            "linhas pontuadas": self.n_scored,
+            "linhas de treino": self.fit_rows,
+            "limiar": round(float(self.threshold), 4),
+            "linhas suspeitas": self.n_flagged,
+            "tempo (s)": round(self.elapsed, 2),
+        }
+
+
+def detect_anomalies(df, method="isolation", columns=None, contamination=None,
+                     time_budget=None, max_rows=None) -> AnomalyReport:
+    """
+    Pontua todas as linhas com o detetor `method` (robust, isolation ou
+    streaming) sobre as colunas numéricas. O limiar é o z-score modificado
+    3.5 no modo robust e o quantil 1 - contamination dos scores (sketch KLL,
+    calculado na mesma passagem) nos outros.
+    """
+    start = time.monotonic()
+    budget = ANOMALY_TIME_BUDGET if time_budget is None else time_budget
+    contamination = ANOMALY_CONTAMINATION if contamination is None else contamination
+    deadline = start + budget
+    columns = list(numeric_columns(df) if columns is None else columns)
+
+    detector = DETECTORS[method]()
+    empty = pd.DataFrame({"score": [], "colunas": []})
+    if not columns or len(df) == 0:
+        return AnomalyReport(method, columns, empty, np.nan, len(df), 0, 0, 0, time.monotonic() - start)
+    # O treino incremental fica com metade do orçamento; a outra metade é para pontuar
+    fit_rows = detector.fit(df, columns, start + budget / 2 if detector.incremental else deadline)
+    names = [str(c) for c in columns]
+
+    top, sketch = _TopRows(max_rows or ANOMALY_MAX_ROWS), KLLSketch(k=400)
+    n_scored = n_over = 0
+    for labels, values in _chunks(df, columns):
+        scores = detector.score(values)
+        sketch.update(scores)
+        n_scored += len(scores)
+        if detector.threshold is not None:
+            n_over += int((scores > detector.threshold).sum())
+        # Só as linhas que podem entrar no top ganham a descrição das colunas
+        candidates = np.flatnonzero(scores > top.floor())
+        if len(candidates) > top.k:
+            candidates = candidates[np.argpartition(-scores[candidates], top.k - 1)[:top.k]]
+        if len(candidates):
+            top.add(labels[candidates], scores[candidates],
+                    _deviating_columns(values[candidates], detector.center, detector.scale, names))
+        if time.monotonic() > deadline:
+            break
+
+    if detector.threshold is not None:
+        threshold, n_flagged = detector.threshold, n_over
+    else:
+        threshold = float(sketch.quantile(1 - contamination))
+        n_flagged = int(round(sketch.count_outside(-np.inf, threshold)))
+    return AnomalyReport(method, columns, top.frame(threshold), threshold, len(df), n_scored,
+                         n_flagged, fit_rows, time.monotonic() - start)
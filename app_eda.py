@@ -1,23 +1,30 @@
 import os, sys
+import logging
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 from dotenv import load_dotenv
 
-# 🆕 Suporte a URL/streaming/chunks
-import requests
-import tempfile
-
 from io import StringIO
 
 sys.path.append(os.path.dirname(__file__))
-from utils_eda import read_any
+from cache_eda import read_any_cached
+from store_eda import build_store
+from download_eda import download_to_temp
+from stats_eda import top_values, histogram_bins
+from charts_eda import histogram_figure
 from eda_agents.orchestrator import Orchestrator
-from memory import init_memory, save_qa, get_history_filtered, get_all_users
-from langchain_google_genai import ChatGoogleGenerativeAI
+from eda_agents.advisor_agent import AdvisorAgent
+from memory import init_memory, save_qa, get_history_filtered, get_all_users, cache_info, cache_clear
+from eda_agents import llm as llm_cache
+from eda_agents.llm import get_llm, StreamedText
+from eda_agents.resilience import guard_state, breaker
 
 # ========== Boot ==========
 load_dotenv()
+# Tamanho dos prompts (antes/depois do digest) e afins no log do servidor
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logging.getLogger("eda").setLevel(os.getenv("EDA_LOG_LEVEL", "INFO"))
 gemini_key = os.getenv("GEMINI_API_KEY") or st.secrets.get("GEMINI_API_KEY")
 
 init_memory()
@@ -31,6 +38,19 @@ if "user" not in st.session_state:
 if "general_summary" not in st.session_state:
     st.session_state["general_summary"] = None
 
+# Agentes reaproveitados entre reruns (os clientes LLM vêm do registo partilhado)
+@st.cache_resource
+def get_advisor(api_key):
+    return AdvisorAgent(gemini_api_key=api_key)
+
+def get_orchestrator(dfs):
+    orch = st.session_state.get("orchestrator")
+    if orch is None:
+        orch = st.session_state["orchestrator"] = Orchestrator(dfs, gemini_api_key=gemini_key)
+    elif orch.dfs is not dfs:
+        orch.set_datasets(dfs)
+    return orch
+
 # ========== Sidebar ==========
 with st.sidebar:
     st.title("⚙️ Configurações Rápidas")
@@ -47,7 +67,7 @@ with st.sidebar:
     st.header("👥 Agentes do Processo")
     st.markdown("""
     - 📊 **AnalystAgent** → Estatísticas descritivas, tipos, valores ausentes  
-    - 📈 **VisualizerAgent** → Gráficos (histogramas, boxplots, barras)  
+    - 📈 **VisualizerAgent** → Gráficos (histogramas, boxplots, barras, dispersão, linhas)  
     - 🔗 **PatternAgent** → Correlações, padrões e frequências  
     - ⚠️ **AnomalyAgent** → Detecção de outliers (IQR)  
     - 🧠 **AdvisorAgent** → Resumos gerais e conclusões automáticas
@@ -61,20 +81,6 @@ st.title("🔎 EDA baseada em Agentes (LangChain + Streamlit)")
 # ========== Tabs ==========
 tabs = st.tabs(["📂 Processamento", "📊 Resumo Geral", "🗂 Histórico", "⚙️ Configurações"])
 
-# ===== Funções auxiliares (modo URL/chunks) =====
-def download_to_temp(url: str, chunk_bytes: int = 8 * 1024 * 1024) -> str:
-    """
-    Faz download do ficheiro por streaming para um arquivo temporário e retorna o caminho.
-    Evita estourar memória durante o download.
-    """
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
-        with requests.get(url, stream=True, timeout=120) as r:
-            r.raise_for_status()
-            for b in r.iter_content(chunk_size=chunk_bytes):
-                if b:  # ignora keep-alive
-                    tmp.write(b)
-        return tmp.name
-
 # ========== Aba Processamento ==========
 with tabs[0]:
     st.subheader("📂 Carregamento e Perguntas sobre os Dados")
@@ -91,15 +97,43 @@ with tabs[0]:
                 type=["csv", "zip"],
                 accept_multiple_files=True
             )
+            compactar = st.toggle(
+                "Compactar tipos de dados (menos memória)", value=False,
+                help="Reduz inteiros/decimais, converte números e datas pt-BR e texto repetitivo em categorias."
+            )
 
             if uploaded:
-                dfs = read_any(uploaded)
+                # Progresso por membro de ZIP (só aparece quando há parsing real)
+                load_progress = st.empty()
+                def on_member(member, done, total, elapsed):
+                    load_progress.progress(done / total, text=f"📦 {member} lido em {elapsed:.2f}s ({done}/{total})")
+
+                # Reruns com o mesmo upload reutilizam os mesmos DataFrames: os perfis
+                # (stats_eda.profile_of) são por objeto e perder-se-iam a cada pergunta
+                upload_key = (compactar, tuple((f.file_id, f.name, f.size) for f in uploaded))
+                if st.session_state.get("upload_key") == upload_key and st.session_state["dfs"] is not None:
+                    dfs = st.session_state["dfs"]
+                    compact_reports = st.session_state.get("compact_reports", {})
+                else:
+                    # Cache por conteúdo: ficheiros já vistos não refazem o parsing
+                    compact_reports = {}
+                    dfs = read_any_cached(uploaded, on_progress=on_member,
+                                          compact=compactar, reports=compact_reports)
+                    st.session_state["upload_key"] = upload_key
+                    st.session_state["compact_reports"] = compact_reports
+                load_progress.empty()
                 st.session_state["dfs"] = dfs
                 st.success(f"{len(dfs)} dataset(s) carregado(s): {list(dfs.keys())}")
 
+                if compact_reports:
+                    with st.expander("🗜️ Memória poupada pela compactação"):
+                        for name, report in compact_reports.items():
+                            saved = report["Bytes poupados"].sum() / 1024**2
+                            st.caption(f"{name}: {saved:.1f} MB poupados")
+                            st.dataframe(report, use_container_width=True)
+
                 # Resumo textual inicial
-                from eda_agents.advisor_agent import AdvisorAgent
-                advisor = AdvisorAgent(gemini_api_key=gemini_key)
+                advisor = get_advisor(gemini_key)
                 st.session_state["general_summary"] = advisor.summarize({
                     "agent": "System",
                     "result": [f"Dados carregados: {list(dfs.keys())}"]
@@ -119,13 +153,14 @@ with tabs[0]:
 
                     num_cols = df.select_dtypes(include="number").columns
                     if len(num_cols) > 0:
-                        fig_num = px.histogram(df, x=num_cols[0], nbins=30,
-                                               title=f"Distribuição inicial — {name} [{num_cols[0]}]")
+                        edges, counts = histogram_bins(df, num_cols[0])
+                        fig_num = histogram_figure(edges, counts, f"Distribuição inicial — {name} [{num_cols[0]}]",
+                                                   num_cols[0])
                         summary_charts.append(fig_num)
 
                     cat_cols = df.select_dtypes(exclude="number").columns
                     if len(cat_cols) > 0:
-                        top_cat = df[cat_cols[0]].value_counts().reset_index().head(10)
+                        top_cat = top_values(df, cat_cols[0], 10).reset_index()
                         top_cat.columns = [cat_cols[0], "Frequência"]
                         fig_cat = px.bar(top_cat, x=cat_cols[0], y="Frequência",
                                          title=f"Categorias mais frequentes — {name} [{cat_cols[0]}]")
@@ -140,6 +175,7 @@ with tabs[0]:
                 st.info(f"Já existem {len(dfs)} dataset(s) carregado(s): {list(dfs.keys())}")
                 if st.button("🧹 Limpar datasets carregados"):
                     st.session_state["dfs"] = None
+                    st.session_state["upload_key"] = None
                     st.session_state["general_summary"] = None
                     st.success("Datasets e resumo geral removidos. Faça upload novamente para continuar.")
             else:
@@ -149,6 +185,8 @@ with tabs[0]:
             # ------- Modo via URL com processamento incremental (recomendado) -------
             st.markdown("Cole o link direto do ficheiro **CSV** (ex.: `https://.../dados.csv`).")
             url = st.text_input("URL do ficheiro")
+            sha256_esperado = st.text_input("SHA-256 esperado (opcional)",
+                                            help="Se indicado, o ficheiro descarregado é validado contra este hash.")
 
             col_dl, col_cfg = st.columns([1, 1])
             with col_dl:
@@ -167,40 +205,44 @@ with tabs[0]:
 
             if processar and url:
                 try:
-                    with st.spinner("🔄 A descarregar ficheiro (streaming)..."):
-                        tmp_path = download_to_temp(url)
-
-                    st.info("🧠 A processar por partes com o Orchestrator (sem exibir parciais)…")
-                    orch = Orchestrator({}, gemini_api_key=gemini_key)
-
-                    total_linhas = 0
-                    total_chunks = 0
+                    dl_progress = st.empty()
+                    def on_download(done, total, elapsed):
+                        mb = done / 1024**2
+                        text = f"🔄 A descarregar… {mb:.1f} MB ({mb / elapsed if elapsed else 0:.1f} MB/s)"
+                        dl_progress.progress(min(done / total, 1.0) if total else 0.0, text=text)
+
+                    dl_stats = {}
+                    tmp_path = download_to_temp(url, expected_sha256=sha256_esperado or None,
+                                                on_progress=on_download, stats=dl_stats)
+                    dl_progress.empty()
+                    st.caption(
+                        f"📥 {dl_stats['bytes'] / 1024**2:.1f} MB em {dl_stats['seconds']:.1f}s "
+                        f"({dl_stats['mb_per_s']:.1f} MB/s, {dl_stats['segments']} segmento(s)) • "
+                        f"SHA-256 `{dl_stats['sha256'][:16]}…`"
+                    )
+
+                    st.info("🧠 A converter por partes para um armazenamento colunar em disco…")
+                    dataset_name = os.path.splitext(os.path.basename(url.split("?")[0]))[0] or "via_url"
 
                     # Barra de progresso simples (desacoplada do nº real de chunks)
                     progress = st.progress(0)
-                    progress_step = 0
-
-                    # Processamento incremental: NÃO concatena, NÃO renderiza parciais
-                    for i, chunk in enumerate(pd.read_csv(tmp_path, chunksize=int(chunksize_input))):
-                        total_chunks += 1
-                        total_linhas += len(chunk)
+                    progress_state = {"step": 0.0}
 
-                        # Chamada ao orquestrador por chunk
-                        ans = orch.answer("Gerar resumo automático deste chunk", df=chunk)
+                    def on_chunk(i, total_linhas, chunk):
+                        progress_state["step"] = min(progress_state["step"] + 0.05, 0.95)
+                        progress.progress(progress_state["step"])
 
-                        # Registo no histórico (sem renderizar outputs)
-                        save_qa(st.session_state["user"], f"Chunk {i+1}", str(ans))
-
-                        # Atualiza progress bar (progresso heurístico)
-                        progress_step = min(progress_step + 0.05, 0.95)
-                        progress.progress(progress_step)
+                    # Conversão incremental: NÃO concatena; cada chunk vira um ficheiro Arrow
+                    dataset = build_store(tmp_path, dataset_name, chunksize=int(chunksize_input), on_chunk=on_chunk)
+                    os.remove(tmp_path)
+                    total_linhas, total_chunks = len(dataset), len(dataset.parts)
 
                     # Consolidação final pelo AdvisorAgent
-                    from eda_agents.advisor_agent import AdvisorAgent
-                    advisor = AdvisorAgent(gemini_api_key=gemini_key)
+                    advisor = get_advisor(gemini_key)
                     resumo_final = advisor.summarize({
                         "agent": "System",
                         "result": [f"{total_chunks} chunks processados ({total_linhas} linhas no total)"]
+                                  + dataset.profile.summary_lines()
                     })
                     st.session_state["general_summary"] = resumo_final
                     progress.progress(1.0)
@@ -210,8 +252,9 @@ with tabs[0]:
                     st.subheader("🧠 Resumo Geral Final")
                     st.write(resumo_final["content"])
 
-                    # Como não concatenamos, mantemos um placeholder leve em dfs
-                    st.session_state["dfs"] = {"via_url.csv": pd.DataFrame()}  # placeholder leve
+                    # O dataset fica em disco (memory-map); os agentes leem só as colunas necessárias
+                    st.session_state["dfs"] = {dataset_name: dataset}
+                    st.session_state["upload_key"] = None
 
                 except Exception as e:
                     st.error(f"Erro ao descarregar/processar o ficheiro: {e}")
@@ -241,21 +284,23 @@ with tabs[0]:
         if st.session_state["dfs"] is None:
             st.warning("📂 Carregue datasets antes de fazer perguntas.")
         else:
-            orch = Orchestrator(st.session_state["dfs"], gemini_api_key=gemini_key)
+            orch = get_orchestrator(st.session_state["dfs"])
 
             if ask and q:
                 with st.spinner("⏳ Processando sua pergunta..."):
                     ans = orch.answer(q)
-                save_qa(st.session_state["user"], q, str(ans))
                 st.session_state["last_answer"] = ans
                 st.markdown(f"**Agente chamado:** `{ans.get('agent', 'Desconhecido')}`")
 
                 if not ans.get("result"):
                     st.warning("Nenhum resultado detalhado foi retornado pelo agente.")
 
-                blocks = ans.get("result", [])
-                for block in blocks:
-                    st.subheader(block.get("title", ""))
+                # Gráficos e tabelas aparecem já; os comentários do LLM ficam com um espaço
+                # reservado e são preenchidos token a token numa segunda passagem
+                blocks, streams = ans.get("result", []), []
+                for i, block in enumerate(blocks):
+                    title_slot = st.empty()
+                    title_slot.subheader(block.get("title", ""))
                     st.markdown("---")
 
                     btype = block.get("type", "text")
@@ -266,8 +311,26 @@ with tabs[0]:
                         st.json(content)
                     elif btype == "table":
                         st.dataframe(content, use_container_width=True)
+                        if block.get("download"):
+                            # CSV gerado só ao clicar (ex.: todas as linhas com outliers)
+                            file_name, data = block["download"]
+                            st.download_button("⬇️ Baixar CSV", data, file_name=file_name,
+                                               mime="text/csv", on_click="ignore",
+                                               key=f"download_{i}")
+                    elif isinstance(content, StreamedText):
+                        streams.append((block, content, title_slot, st.empty()))
                     else:
                         st.write(content)
+
+                for block, content, title_slot, slot in streams:
+                    slot.write_stream(iter(content))
+                    if content.failed and content.fallback_title:
+                        block["title"] = content.fallback_title
+                        title_slot.subheader(block["title"])
+                    block["content"] = content.text
+
+                # Guardado depois de mostrar: os comentários já estão completos
+                save_qa(st.session_state["user"], q, str(ans))
             else:
                 with st.spinner("⏳ Aguardando sua pergunta..."):
                     st.info("Digite sua pergunta no painel à esquerda e clique em **Responder** para começar a análise.")
@@ -374,18 +437,51 @@ with tabs[3]:
     st.write(f"🔑 Modelo configurado: `{os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')}`")
     st.write("A chave da API é carregada automaticamente do arquivo `.env`.")
 
+    st.divider()
+    st.subheader("🗄️ Cache de respostas do LLM")
+    cache_on = st.toggle("Usar cache de respostas", value=llm_cache.LLM_CACHE_ENABLED,
+                         help="Desligue para forçar novas chamadas ao modelo.")
+    llm_cache.set_cache_enabled(cache_on)
+    stats, info = llm_cache.cache_stats(), cache_info()
+    lookups = stats["hits"] + stats["misses"]
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Hits (sessão)", stats["hits"], f"{stats['hits'] / lookups:.0%}" if lookups else None)
+    c2.metric("Misses (sessão)", stats["misses"])
+    c3.metric("Entradas guardadas", info["entries"])
+    st.caption(
+        f"{info['bytes'] / 1024:.1f} KB em cache • {info['stored_hits']} reutilizações acumuladas • "
+        f"TTL {llm_cache.LLM_CACHE_TTL / 3600:g} h • máx. {llm_cache.LLM_CACHE_MAX_ENTRIES} entradas"
+    )
+    if st.button("🧹 Limpar cache"):
+        cache_clear()
+        st.success("Cache limpo.")
+
+    st.divider()
+    st.subheader("🚦 Estado da API Gemini")
+    guard = guard_state()
+    estados = {"closed": "🟢 Normal", "half_open": "🟡 Em teste", "open": "🔴 Em pausa (fallback local)"}
+    g1, g2, g3 = st.columns(3)
+    g1.metric("Circuito", estados[guard["state"]])
+    g2.metric("Falhas seguidas", guard["failures"])
+    g3.metric("Pedidos evitados", guard["rejected"])
+    st.caption(
+        f"Limite {guard['rpm']:g} pedidos/min (rajada {guard['burst']}, {guard['tokens']:.1f} disponíveis) • "
+        f"{guard['retries']} nova(s) tentativa(s) com jitter"
+        + (f" • nova tentativa em {guard['retry_in']:.0f}s" if guard["retry_in"] is not None else "")
+    )
+    if guard["last_error"]:
+        st.caption(f"Último erro: `{guard['last_error']}`")
+    if guard["state"] != "closed" and st.button("🔄 Reativar chamadas à API"):
+        breaker.reset()
+        st.success("Circuito fechado: as próximas perguntas voltam a usar o LLM.")
+
     st.divider()
     st.subheader("🔎 Teste da Chave Gemini")
     if st.button("Testar chave da API"):
         try:
-            model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-            llm = ChatGoogleGenerativeAI(
-                model=model_name,
-                temperature=0,
-                google_api_key=gemini_key
-            )
+            llm = get_llm(temperature=0, api_key=gemini_key)
             with st.spinner("⏳ Validando chave..."):
-                resp = llm.invoke("Responda apenas com: OK")
+                resp = llm.llm.invoke("Responda apenas com: OK")
             st.success(f"✅ Chave válida! Resposta: {resp.content}")
         except Exception as e:
             st.error(f"❌ Erro ao validar chave: {e}")
@@ -0,0 +1,137 @@
+"""
+Benchmark e verificação do download segmentado (download_to_temp) contra um
+servidor http.server local que aceita pedidos Range, com ETag e If-Range.
+
+Cenários:
+  * 1 segmento vs. N segmentos (tempo, MB/s e SHA-256 do ficheiro final);
+  * retoma: uma tentativa com 2 segmentos é interrompida a meio, um parcial
+    é corrompido (fica maior que o segmento), corre-se com 4 segmentos (não
+    pode usar as partes da divisão em 2) e de novo com 2 (retoma-as e
+    descarta a corrompida);
+  * o callback de progresso é sempre chamado na thread de quem pediu.
+
+Uso:
+    python benchmarks/bench_download.py --mb 20 --segments 4 --latency 0.002
+"""
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serve `server.payload` com suporte a Range/If-Range; pode cortar respostas a meio."""
+
+    block = 64 * 1024
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status, start, end):
+        payload = self.server.payload
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", self.server.etag)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers(200, 0, len(self.server.payload) - 1)
+
+    def do_GET(self):
+        payload = self.server.payload
+        start, end, status = 0, len(payload) - 1, 200
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if match and (if_range is None or if_range == self.server.etag):
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            status = 206
+        self._headers(status, start, end)
+        limit = self.server.cut_after
+        sent = 0
+        for pos in range(start, end + 1, self.block):
+            if limit is not None and sent >= limit:
+                return  # corta a ligação a meio da resposta
+            chunk = payload[pos:min(pos + self.block, end + 1)]
+            time.sleep(self.server.latency)
+            self.wfile.write(chunk)
+            sent += len(chunk)
+
+
+def serve(payload, latency):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.payload, server.etag, server.latency, server.cut_after = payload, '"v1"', latency, None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/dados.csv"
+
+
+def run(url, segments, expected, chunk_bytes=1024**2):
+    from download_eda import download_to_temp
+    stats, threads = {}, set()
+    path = download_to_temp(url, chunk_bytes=chunk_bytes, segments=segments, expected_sha256=expected, stats=stats,
+                            on_progress=lambda *a: threads.add(threading.get_ident()))
+    os.remove(path)
+    assert threads <= {threading.get_ident()}, "on_progress chamado fora da thread de quem pediu"
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=20)
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.002, help="atraso (s) por bloco de 64 KB")
+    args = parser.parse_args()
+
+    import download_eda
+    payload = np.random.default_rng(0).bytes(args.mb * 1024**2)
+    sha = hashlib.sha256(payload).hexdigest()
+    server, url = serve(payload, args.latency)
+
+    print(f"{'cenário':<34} {'segm.':>5} {'s':>7} {'MB/s':>8} {'retomado (MB)':>14}")
+    def show(label, st):
+        print(f"{label:<34} {st['segments']:>5} {st['seconds']:>7.2f} {st['mb_per_s']:>8.1f} "
+              f"{st['resumed_bytes'] / 1024**2:>14.1f}")
+
+    show("sequencial por segmento único", run(url, 1, sha))
+    show("paralelo", run(url, args.segments, sha))
+
+    # Tentativa com 2 segmentos interrompida: cada segmento fica com ~1/4 dos bytes
+    server.cut_after, retries = len(payload) // 4, download_eda.DOWNLOAD_RETRIES
+    download_eda.DOWNLOAD_RETRIES = 0
+    try:
+        run(url, 2, sha)
+        raise AssertionError("a tentativa interrompida devia falhar")
+    except OSError:
+        pass
+    finally:
+        server.cut_after, download_eda.DOWNLOAD_RETRIES = None, retries
+    parts = sorted(glob.glob(os.path.join(tempfile.gettempdir(), f"eda_dl_*_{len(payload)}_2seg.part*")))
+    assert len(parts) == 2, parts
+    # Corrompe o 2º parcial: maior do que o segmento, tem de ser descartado
+    with open(parts[1], "ab") as fh:
+        fh.write(b"\0" * len(payload))
+
+    show("4 segmentos após falha com 2", run(url, 4, sha))
+    st = run(url, 2, sha)
+    assert st["resumed_bytes"] > 0 and st["bytes"] == len(payload)
+    show("retoma com 2 (parcial corrompido)", st)
+    assert not glob.glob(os.path.join(tempfile.gettempdir(), f"eda_dl_*_{len(payload)}_*seg.part*"))
+    server.shutdown()
+    print("OK: tamanhos e SHA-256 corretos em todos os cenários")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark de histogramas: px.histogram com a coluna inteira (antes) vs. bins
+calculados no servidor com histogram_bins + histogram_figure (depois).
+
+Mede o tamanho do JSON da figura (o que o Streamlit envia ao browser) e o
+tempo de construção + serialização no servidor. O desenho no browser não é
+medido aqui, mas cresce com o mesmo payload.
+
+Uso:
+    python benchmarks/bench_histograms.py --rows 100000,1000000,5000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fig = fn()
+    payload = fig.to_json()
+    return time.perf_counter() - t0, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="100000,1000000,5000000")
+    parser.add_argument("--rule", default="fd", choices=["fd", "sturges"])
+    args = parser.parse_args()
+
+    from stats_eda import histogram_bins
+    from charts_eda import histogram_figure
+
+    print(f"{'linhas':>9} {'antes (MB)':>11} {'antes (s)':>10} {'depois (KB)':>12} "
+          f"{'depois (s)':>11} {'bins':>5}")
+    rng = np.random.default_rng(0)
+    for rows in (int(r) for r in args.rows.split(",")):
+        df = pd.DataFrame({"valor_total": rng.gamma(2.0, 5000.0, rows)})
+        t_before, size_before = timed(lambda: px.histogram(df, x="valor_total"))
+
+        bins = {}
+        def after():
+            edges, counts = histogram_bins(df.copy(), "valor_total", args.rule)
+            bins["n"] = len(counts)
+            return histogram_figure(edges, counts, "valor_total", "valor_total")
+        t_after, size_after = timed(after)
+        print(f"{rows:>9} {size_before / 1024**2:>11.1f} {t_before:>10.2f} {size_after / 1024:>12.1f} "
+              f"{t_after:>11.3f} {bins['n']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark do roteamento de intenções: classificador local vs. LLM.
+
+Mede, num conjunto rotulado separado do de treino, a exatidão do classificador
+local, a fração de perguntas resolvidas sem LLM (confiança >= limiar) e a
+latência por pergunta. Com --llm (requer GEMINI_API_KEY) mede também o
+roteador estruturado do LLM nas mesmas perguntas.
+
+Uso:
+    python benchmarks/bench_intent_router.py [--threshold 0.6] [--llm]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from eda_agents.intent_classifier import IntentClassifier, INTENT_CONFIDENCE  # noqa: E402
+
+HELD_OUT = [
+    ("Me dá um resumo estatístico das colunas", "analyst"),
+    ("Quantos nulos tem cada coluna?", "analyst"),
+    ("Qual o desvio padrão do valor?", "analyst"),
+    ("Quais os tipos das variáveis?", "analyst"),
+    ("Como está distribuído o valor total?", "histogram"),
+    ("Faça o histograma da quantidade", "histogram"),
+    ("A distribuição da idade é normal?", "histogram"),
+    ("Quero um boxplot por coluna", "boxplot"),
+    ("Mostre gráficos de caixa", "boxplot"),
+    ("Box plot do desconto", "boxplot"),
+    ("Gráfico de barras da UF", "barplot"),
+    ("Top 10 municípios em barras", "barplot"),
+    ("Quais categorias dominam?", "barplot"),
+    ("Mostre a pizza do tipo de pagamento", "pie"),
+    ("Qual a proporção de notas por UF?", "pie"),
+    ("Participação de cada categoria", "pie"),
+    ("Correlação entre preço e quantidade", "pattern"),
+    ("Quais variáveis estão correlacionadas?", "pattern"),
+    ("Quais os valores mais frequentes do CFOP?", "pattern"),
+    ("Há relação entre desconto e valor?", "pattern"),
+    ("Dispersão do desconto contra o valor", "scatter"),
+    ("Plote quantidade vs preço unitário", "scatter"),
+    ("Faça um gráfico de dispersão do frete", "scatter"),
+    ("Gráfico de linha do faturamento", "line"),
+    ("Como o valor evoluiu ao longo do tempo?", "line"),
+    ("Série temporal da quantidade vendida", "line"),
+    ("Tem outlier no valor unitário?", "anomaly"),
+    ("Existem notas com valores anómalos?", "anomaly"),
+    ("Há registros suspeitos de fraude?", "anomaly"),
+    ("Valores fora do normal na quantidade?", "anomaly"),
+    ("Quais as conclusões até aqui?", "advisor"),
+    ("Resuma o que descobrimos", "advisor"),
+    ("Que recomendações finais você faria?", "advisor"),
+    ("Quais próximos passos sugeres?", "advisor"),
+]
+
+
+def percentile_us(samples, q):
+    return float(np.percentile(samples, q) * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threshold", type=float, default=INTENT_CONFIDENCE)
+    parser.add_argument("--llm", action="store_true", help="mede também o roteador LLM")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    clf = IntentClassifier()
+    print(f"Treino do classificador local (inclui import do scikit-learn): {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    correct = local = local_correct = 0
+    latencies = []
+    misses = []
+    for question, label in HELD_OUT:
+        t = time.perf_counter()
+        intent, conf = clf.predict(question)
+        latencies.append(time.perf_counter() - t)
+        correct += intent == label
+        if conf >= args.threshold:
+            local += 1
+            local_correct += intent == label
+        if intent != label:
+            misses.append((question, label, intent, conf))
+
+    n = len(HELD_OUT)
+    print(f"Perguntas: {n}")
+    print(f"Exatidão local (todas):            {correct / n:.1%}")
+    print(f"Resolvidas sem LLM (conf >= {args.threshold}): {local / n:.1%}")
+    print(f"Exatidão nas resolvidas localmente: {local_correct / max(local, 1):.1%}")
+    print(f"Latência local: p50={percentile_us(latencies, 50):.0f} µs  p95={percentile_us(latencies, 95):.0f} µs")
+    for q, label, intent, conf in misses:
+        print(f"  ✗ {q!r}: esperado {label}, obtido {intent} ({conf:.2f})")
+
+    if args.llm:
+        import pandas as pd
+        from eda_agents.orchestrator import Orchestrator, ROUTER_PROMPT, Route
+
+        orch = Orchestrator({"notas": pd.DataFrame(columns=["uf", "valor_total", "quantidade"])},
+                            gemini_api_key=os.getenv("GEMINI_API_KEY"))
+        chain = ROUTER_PROMPT | orch.llm.with_structured_output(Route)
+        llm_lat, llm_ok = [], 0
+        for question, label in HELD_OUT:
+            t = time.perf_counter()
+            try:
+                llm_ok += chain.invoke({"question": question, "catalog": orch._catalog()}).intent == label
+            except Exception as e:
+                print(f"  erro LLM: {e}")
+            llm_lat.append(time.perf_counter() - t)
+        print(f"Exatidão LLM: {llm_ok / n:.1%}")
+        print(f"Latência LLM: p50={np.percentile(llm_lat, 50) * 1000:.0f} ms  "
+              f"p95={np.percentile(llm_lat, 95) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de deteção de outliers IQR em tabelas largas: ciclo por coluna do
+AnomalyAgent antigo (dois quantile() e um filtro por coluna) vs. outlier_scan
+(um quantile() sobre o bloco numérico e uma matriz booleana de outliers).
+
+Cada repetição usa uma cópia nova do DataFrame, para medir o cálculo a frio
+(sem o perfil em cache); a 2ª chamada a outlier_scan mostra o custo a quente.
+
+Uso:
+    python benchmarks/bench_iqr_outliers.py --rows 100000 --cols 200,500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_frame(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.standard_t(4, size=(rows, cols))
+    values[rng.random((rows, cols)) < 0.001] = np.nan
+    return pd.DataFrame(values, columns=[f"v{i}" for i in range(cols)])
+
+
+def loop_before(df):
+    """Ciclo por coluna, como em AnomalyAgent.iqr_outliersOld."""
+    counts, rows = {}, pd.Index([])
+    for col in df.select_dtypes(include="number").columns:
+        q1 = df[col].quantile(0.25)
+        q3 = df[col].quantile(0.75)
+        iqr = q3 - q1
+        outliers = df[(df[col] < q1 - 1.5 * iqr) | (df[col] > q3 + 1.5 * iqr)][col]
+        counts[col] = len(outliers)
+        rows = rows.union(outliers.index)
+    return counts, rows
+
+
+def best_of(fn, repeats):
+    times, result = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--cols", default="200,500")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from stats_eda import outlier_scan
+
+    print(f"{'linhas':>8} {'colunas':>8} {'ciclo (s)':>10} {'vetor. (s)':>11} {'ganho':>7} "
+          f"{'a quente (ms)':>14} {'linhas c/ outliers':>19}")
+    for cols in (int(c) for c in args.cols.split(",")):
+        df = make_frame(args.rows, cols)
+        t_loop, (counts, rows) = best_of(lambda: loop_before(df), args.repeats)
+        t_vec, scan = best_of(lambda: outlier_scan(df.copy()), args.repeats)
+        warm_df = df.copy()
+        outlier_scan(warm_df)
+        t_warm, _ = best_of(lambda: outlier_scan(warm_df), args.repeats)
+
+        assert scan.table["outliers"].to_dict() == counts
+        assert set(scan.rows.index) == set(rows)
+        print(f"{args.rows:>8} {cols:>8} {t_loop:>10.2f} {t_vec:>11.2f} {t_loop / t_vec:>6.1f}x "
+              f"{t_warm * 1000:>14.2f} {len(scan.rows):>19}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark ponta-a-ponta do Orchestrator com o LLM simulado (sem rede).
+
+Corre Orchestrator.answer para cada intenção sobre datasets sintéticos de
+vários tamanhos e reporta p50/p95 de:
+  - roteamento: plan() (classificador local ou chamada estruturada ao LLM);
+  - cálculo: answer() até devolver os blocos, sem o tempo bloqueado no LLM;
+  - LLM: espera pelos comentários (streaming) + chamadas síncronas ao LLM.
+A 1ª execução de cada pergunta é fria; as seguintes já usam o DatasetProfile.
+
+Uso:
+    python benchmarks/bench_orchestrator.py [--sizes 10000,100000] [--repeats 5]
+                                            [--latency-ms 300] [--token-ms 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+QUESTIONS = {
+    "analyst": "Quais são as estatísticas descritivas?",
+    "histogram": "Mostre as distribuições",
+    "boxplot": "Mostre boxplots",
+    "barplot": "Gráfico de barras das categorias",
+    "pie": "Gráfico de pizza das categorias",
+    "scatter": "Gráfico de dispersão das variáveis numéricas",
+    "line": "Gráfico de linhas do num_0",
+    "pattern": "Existe correlação entre as variáveis?",
+    "frequencies": "Quais as frequências das categorias mais comuns?",
+    "anomaly": "Quais variáveis têm outliers?",
+    "advisor": "Resuma as conclusões das análises",
+    "plano": "Mostre as distribuições e os outliers",
+}
+
+
+def synthetic(n_rows, n_numeric=8, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(n_numeric):
+        col = rng.lognormal(size=n_rows) if i % 2 else rng.normal(100, 15, n_rows)
+        col[rng.random(n_rows) < 0.01] *= 10  # alguns outliers
+        data[f"num_{i}"] = col
+    data["uf"] = rng.choice(["SP", "RJ", "MG", "BA", "PR"], n_rows)
+    data["cliente"] = rng.integers(0, n_rows // 10 + 1, n_rows).astype(str)
+    return pd.DataFrame(data)
+
+
+def pct(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,500000")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    # LLM simulado, sem cache de respostas nem limitador: medimos só o nosso tempo
+    os.environ.update({
+        "EDA_LLM_FAKE": "1", "EDA_LLM_FAKE_LATENCY_MS": str(args.latency_ms),
+        "EDA_LLM_FAKE_TOKEN_MS": str(args.token_ms), "EDA_LLM_CACHE": "0", "EDA_LLM_RPM": "0",
+        "SQLITE_DB": os.path.join(tempfile.mkdtemp(), "bench.db"),
+    })
+    sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+    from eda_agents.orchestrator import Orchestrator
+    from eda_agents.fake_llm import FakeChatModel
+    from eda_agents.llm import StreamedText
+    from eda_agents.intent_classifier import get_classifier
+    from memory import init_memory, save_qa
+
+    init_memory()
+    get_classifier()  # treino do classificador fora das medições
+    print(f"LLM simulado: {args.latency_ms:g} ms até ao 1º token, {args.token_ms:g} ms/token")
+    header = (f"{'linhas':>8} {'intenção':<12} {'rot. p50':>9} {'cálc. 1ª':>9} {'cálc. p50':>9} "
+              f"{'cálc. p95':>9} {'LLM p50':>9} {'LLM p95':>9} {'total p95':>9}")
+    print(header)
+    print("-" * len(header))
+    for n_rows in (int(s) for s in args.sizes.split(",")):
+        orch = Orchestrator({"sintetico": synthetic(n_rows)}, gemini_api_key="fake")
+
+        # Tempo do plan() chamado dentro de answer(), incluindo uma eventual chamada ao LLM
+        plan_time = {}
+        plan = orch.plan
+        def timed_plan(question):
+            blocked, start = FakeChatModel.main_thread_seconds, time.perf_counter()
+            result = plan(question)
+            plan_time["seconds"] = time.perf_counter() - start
+            plan_time["llm"] = FakeChatModel.main_thread_seconds - blocked
+            return result
+        orch.plan = timed_plan
+
+        for intent, question in QUESTIONS.items():
+            routing, compute, llm, total, cold = [], [], [], [], None
+            for rep in range(args.repeats):
+                blocked = FakeChatModel.main_thread_seconds
+                t0 = time.perf_counter()
+                ans = orch.answer(question)
+                t1 = time.perf_counter()
+                # Chamadas síncronas ao LLM fora do roteamento (ex.: AdvisorAgent)
+                sync_llm = FakeChatModel.main_thread_seconds - blocked - plan_time["llm"]
+                for block in ans["result"]:
+                    if isinstance(block.get("content"), StreamedText):
+                        str(block["content"])
+                t2 = time.perf_counter()
+                save_qa("demo@local", question, str(ans))  # histórico para o AdvisorAgent
+
+                compute_s = (t1 - t0) - plan_time["seconds"] - sync_llm
+                if rep == 0:
+                    cold = compute_s * 1000
+                    continue
+                routing.append(plan_time["seconds"])
+                compute.append(compute_s)
+                llm.append((t2 - t1) + sync_llm)
+                total.append(t2 - t0)
+            print(f"{n_rows:>8} {intent:<12} {pct(routing, 50):>8.2f}m {cold:>8.1f}m {pct(compute, 50):>8.1f}m "
+                  f"{pct(compute, 95):>8.1f}m {pct(llm, 50):>8.0f}m {pct(llm, 95):>8.0f}m "
+                  f"{pct(total, 95):>8.0f}m")
+    print(f"\nChamadas ao LLM simulado: {FakeChatModel.calls} (tempos em ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de leitura de CSV: motor python com sep=None (antes) vs. read_csv_fast (depois).
+
+Gera um CSV sintético no estilo das exportações de notas fiscais (separador ';'
+e decimal ',') e mede, em processos isolados, o tempo de carga e o pico de RSS.
+
+Uso:
+    python benchmarks/bench_read_any.py --rows 1000000
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "chave_acesso": rng.integers(10**15, 10**16, rows).astype(str),
+        "uf": rng.choice(["SP", "RJ", "MG", "BA", "PR", "RS"], rows),
+        "cfop": rng.integers(5000, 7000, rows),
+        "quantidade": rng.integers(1, 500, rows),
+        "valor_unitario": rng.gamma(2.0, 50.0, rows).round(2),
+        "valor_total": rng.gamma(2.0, 5000.0, rows).round(2),
+        "data_emissao": pd.Timestamp("2024-01-01")
+        + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+    })
+    df.to_csv(path, sep=";", decimal=",", index=False)
+
+
+def _load_before(path):
+    return pd.read_csv(path, sep=None, engine="python")
+
+
+def _load_after(path):
+    from utils_eda import read_csv_fast
+    return read_csv_fast(path)
+
+
+def _worker(loader, path, queue):
+    t0 = time.perf_counter()
+    df = loader(path)
+    elapsed = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_kb / 1024, df.shape))
+
+
+def run(loader, path):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    p = ctx.Process(target=_worker, args=(loader, path, queue))
+    p.start()
+    result = queue.get()
+    p.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "nf_sintetico.csv")
+        make_csv(path, args.rows)
+        size_mb = os.path.getsize(path) / 1024**2
+        print(f"CSV sintético: {args.rows:,} linhas, {size_mb:.1f} MB")
+        print(f"{'variante':<10} {'tempo (s)':>10} {'pico RSS (MB)':>14}  shape")
+        for label, loader in [("antes", _load_before), ("depois", _load_after)]:
+            elapsed, peak_mb, shape = run(loader, path)
+            print(f"{label:<10} {elapsed:>10.2f} {peak_mb:>14.1f}  {shape}")
+
+
+if __name__ == "__main__":
+    main()
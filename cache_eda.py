@@ -0,0 +1,134 @@
+import os, json, hashlib, shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from utils_eda import read_any, dataset_name
+
+CACHE_DIR = os.getenv("EDA_CACHE_DIR", ".eda_cache")
+CACHE_MAX_BYTES = int(float(os.getenv("EDA_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+# Incrementar quando a forma de leitura mudar, para invalidar entradas antigas
+CACHE_VERSION = "3"
+_HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(f, salt="") -> str:
+    """
+    Calcula o SHA-256 do conteúdo de um ficheiro (caminho ou objeto tipo ficheiro),
+    lendo por blocos e repondo a posição original. `salt` distingue variantes
+    da leitura do mesmo conteúdo (ex.: com e sem compactação).
+    """
+    h = hashlib.sha256(f"{CACHE_VERSION}:{salt}".encode())
+    if isinstance(f, (str, os.PathLike)):
+        with open(f, "rb") as fh:
+            for b in iter(lambda: fh.read(_HASH_CHUNK), b""):
+                h.update(b)
+        return h.hexdigest()
+
+    start = f.tell()
+    for b in iter(lambda: f.read(_HASH_CHUNK), b""):
+        h.update(b)
+    f.seek(start)
+    return h.hexdigest()
+
+
+def _entry_dir(digest):
+    return os.path.join(CACHE_DIR, digest)
+
+
+def _load_entry(digest):
+    """
+    Lê uma entrada do cache via memory-map (Arrow IPC) ou devolve None.
+    Devolve (nomes guardados, DataFrames, relatórios de compactação ou None).
+    """
+    path = _entry_dir(digest)
+    index = os.path.join(path, "index.json")
+    if not os.path.exists(index):
+        return None
+    try:
+        with open(index, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        frames = [feather.read_table(os.path.join(path, f"{i}.arrow"), memory_map=True).to_pandas()
+                  for i in range(len(meta["names"]))]
+        reports = [None if r is None else pd.DataFrame(r) for r in meta["reports"]]
+    except Exception:
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+    os.utime(index)  # marca como usado recentemente (LRU)
+    return meta["names"], frames, reports
+
+
+def _store_entry(digest, names, frames, reports):
+    """Grava os DataFrames em Arrow IPC sem compressão (permite memory-map)."""
+    path = _entry_dir(digest)
+    tmp = f"{path}.tmp{os.getpid()}"
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        for i, df in enumerate(frames):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(table, os.path.join(tmp, f"{i}.arrow"), compression="uncompressed")
+        with open(os.path.join(tmp, "index.json"), "w", encoding="utf-8") as fh:
+            json.dump({
+                "names": list(names),
+                "reports": [None if r is None else r.to_dict(orient="records") for r in reports],
+            }, fh, default=str)
+        os.replace(tmp, path)
+    except Exception:
+        # Tipos não suportados pelo Arrow: segue sem cache
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    evict(CACHE_MAX_BYTES)
+
+
+def _dir_size(path):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """Remove as entradas menos usadas recentemente até o cache caber em max_bytes."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for e in os.scandir(CACHE_DIR):
+        index = os.path.join(e.path, "index.json")
+        if e.is_dir() and os.path.exists(index):
+            entries.append((os.stat(index).st_mtime, _dir_size(e.path), e.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def read_any_cached(files, workers=None, on_progress=None, compact=False, reports=None):
+    """
+    Versão de read_any com cache endereçado por conteúdo: ficheiros já vistos
+    (mesmo hash) são lidos do cache local em milissegundos, sem novo parsing.
+    Os restantes argumentos são repassados a read_any nos ficheiros novos;
+    os relatórios de compactação também ficam guardados no cache.
+
+    O cache guarda só as tabelas: o nome de um CSV vem sempre do upload atual
+    (o mesmo conteúdo pode chegar com outro nome); num ZIP os nomes vêm dos
+    membros, que fazem parte do conteúdo. Nomes repetidos seguem read_any
+    (o último ficheiro prevalece).
+    """
+    dfs = {}
+    for f in files:
+        digest = file_digest(f, salt="compact" if compact else "")
+        cached = _load_entry(digest)
+        if cached is None:
+            file_reports = {}
+            parsed = read_any([f], workers=workers, on_progress=on_progress,
+                              compact=compact, reports=file_reports)
+            cached = list(parsed), list(parsed.values()), [file_reports.get(n) for n in parsed]
+            _store_entry(digest, *cached)
+        names, frames, file_reports = cached
+        fname = str(getattr(f, "name", f))
+        if not fname.lower().endswith(".zip"):
+            names = [dataset_name(fname)] * len(frames)
+        for name, df, report in zip(names, frames, file_reports):
+            dfs[name] = df
+            if reports is not None and report is not None:
+                reports[name] = report
+    return dfs
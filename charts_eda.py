@@ -0,0 +1,194 @@
+import os
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# ================================
+# 📊 Gráficos a partir de estatísticas já agregadas
+# ================================
+# Os gráficos do plotly.express recebem a coluna inteira e embutem-na no JSON
+# da figura (centenas de MB para milhões de linhas). Aqui as agregações são
+# feitas no servidor (stats_eda) e a figura leva apenas o resultado.
+
+# Dispersão e linhas: acima de CHART_WEBGL_ROWS linhas de origem usam traços
+# WebGL (scattergl); nenhuma figura leva mais de CHART_POINT_BUDGET pontos
+# por série (LTTB em séries ordenadas, amostra uniforme na dispersão)
+CHART_WEBGL_ROWS = int(os.getenv("EDA_CHART_WEBGL_ROWS", "10000"))
+CHART_POINT_BUDGET = int(os.getenv("EDA_CHART_POINTS", "5000"))
+
+
+def histogram_figure(edges, counts, title, label) -> go.Figure:
+    """Histograma desenhado como barras contíguas: um valor por bin, não por linha."""
+    edges = np.asarray(edges, dtype="float64")
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        hovertemplate="[%{customdata[0]:.4g}, %{customdata[1]:.4g}]: %{y}<extra></extra>",
+        marker_line_width=0,
+    ))
+    fig.update_layout(title=title, xaxis_title=label, yaxis_title="count", bargap=0)
+    return fig
+
+
+def box_figure(stats, title, label) -> go.Figure:
+    """
+    Boxplot com quartis, mediana e bigodes já calculados (stats_eda.box_stats)
+    e, por cima, a amostra de outliers como pontos.
+    """
+    fig = go.Figure(go.Box(
+        x=[label], q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+        lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]], mean=[stats["mean"]],
+        name=label, boxpoints=False, showlegend=False,
+    ))
+    points = stats["points"]
+    if len(points):
+        sampled = f"amostra de {len(points)} de {stats['outliers']}" if len(points) < stats["outliers"] \
+            else f"{stats['outliers']}"
+        fig.add_trace(go.Scatter(
+            x=[label] * len(points), y=points, mode="markers", name=f"outliers ({sampled})",
+            marker=dict(size=4, opacity=0.6), hovertemplate="%{y:.4g}<extra></extra>", showlegend=True,
+        ))
+    fig.update_layout(title=title, yaxis_title=label, xaxis_title=None)
+    return fig
+
+
+def lttb(x, y, n_out) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: índices de `n_out` pontos que preservam a
+    forma da série (x crescente). Mantém o primeiro e o último; em cada bucket
+    fica o ponto que forma o maior triângulo com o ponto escolhido antes e a
+    média do bucket seguinte.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype("int64") + 1
+    edges[-1] = n - 1
+    # Médias de todos os buckets de uma vez (o último "bucket" é o ponto final)
+    sizes = np.diff(np.append(edges, n))
+    avg_x = np.add.reduceat(x, edges) / sizes
+    avg_y = np.add.reduceat(y, edges) / sizes
+    idx = np.empty(n_out, dtype="int64")
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[i + 1]) * (ys - y[a]) - (x[a] - xs) * (avg_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def _numeric_axis(values) -> np.ndarray:
+    """Eixo x como float64 para o LTTB (datas em nanossegundos)."""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("int64").to_numpy(dtype="float64")
+    return values.to_numpy(dtype="float64")
+
+
+def _trace(webgl):
+    return go.Scattergl if webgl else go.Scatter
+
+
+def _column_chunks(df, columns):
+    """Blocos de `columns`: um só para DataFrames, um por parte para datasets em disco."""
+    if hasattr(df, "iter_chunks"):
+        yield from df.iter_chunks(columns)
+    else:
+        yield df[columns]
+
+
+def sample_points(df, x, y, budget=None, seed=0):
+    """
+    Amostra uniforme (sem reposição) de até `budget` pares (x, y) sem ausentes,
+    numa passagem bloco a bloco e com memória O(budget): cada ponto recebe uma
+    chave aleatória e ficam as `budget` menores (reservoir por chaves).
+
+    :return: (DataFrame com colunas x e y, nº de pares na origem)
+    """
+    budget = budget or CHART_POINT_BUDGET
+    rng = np.random.default_rng(seed)
+    kept, n = pd.DataFrame({"x": [], "y": [], "key": []}), 0
+    for chunk in _column_chunks(df, [x, y]):
+        pairs = pd.DataFrame({"x": chunk[x].to_numpy(), "y": chunk[y].to_numpy()}).dropna()
+        n += len(pairs)
+        pairs["key"] = rng.random(len(pairs))
+        kept = pd.concat([kept, pairs], ignore_index=True) if len(kept) else pairs
+        if len(kept) > budget:
+            kept = kept.nsmallest(budget, "key")
+    return kept[["x", "y"]].reset_index(drop=True), n
+
+
+def lttb_points(df, x_col, col, budget=None):
+    """
+    Série `col` ao longo de `x_col` (ou da ordem das linhas, se None) reduzida
+    por LTTB a `budget` pontos sem carregar a coluna inteira: cada bloco é
+    reduzido a `budget` pontos e o LTTB corre de novo sobre a junção. Exato
+    para DataFrames (um só bloco); em disco, aproximado se as partes não
+    estiverem ordenadas por x.
+
+    :return: (DataFrame com colunas x e y, nº de pontos na origem)
+    """
+    budget = budget or CHART_POINT_BUDGET
+    parts, start, n = [], 0, 0
+    for chunk in _column_chunks(df, ([x_col] if x_col else []) + [col]):
+        x = chunk[x_col].to_numpy() if x_col else np.arange(start, start + len(chunk))
+        start += len(chunk)
+        frame = pd.DataFrame({"x": x, "y": chunk[col].to_numpy()}).dropna()
+        frame = frame.sort_values("x", kind="stable")
+        n += len(frame)
+        keep = lttb(_numeric_axis(frame["x"]), frame["y"].to_numpy(dtype="float64"), budget)
+        parts.append(frame.iloc[keep])
+    if not parts:
+        return pd.DataFrame({"x": [], "y": []}), 0
+    merged = pd.concat(parts, ignore_index=True).sort_values("x", kind="stable")
+    keep = lttb(_numeric_axis(merged["x"]), merged["y"].to_numpy(dtype="float64"), budget)
+    return merged.iloc[keep].reset_index(drop=True), n
+
+
+def line_figure(x, series, title, xlabel, budget=None, rows=None) -> go.Figure:
+    """
+    Uma linha por série de `series` ({nome: valores}) sobre o eixo ordenado x,
+    cada uma reduzida por LTTB a `budget` pontos. `rows` é o nº de pontos na
+    origem quando as séries já chegam reduzidas (ex.: por lttb_points).
+    """
+    budget = budget or CHART_POINT_BUDGET
+    x = pd.Series(x).reset_index(drop=True)
+    rows = len(x) if rows is None else rows
+    webgl = rows > CHART_WEBGL_ROWS
+    fig = go.Figure()
+    for name, values in series.items():
+        frame = pd.DataFrame({"x": x, "y": pd.Series(values).reset_index(drop=True)}).dropna()
+        frame = frame.sort_values("x", kind="stable")
+        keep = lttb(_numeric_axis(frame["x"]), frame["y"].to_numpy(dtype="float64"), budget)
+        fig.add_trace(_trace(webgl)(x=frame["x"].iloc[keep], y=frame["y"].iloc[keep],
+                                    mode="lines", name=str(name)))
+    suffix = f" (≤{budget} pontos por série, LTTB)" if rows > budget else ""
+    fig.update_layout(title=title + suffix, xaxis_title=xlabel)
+    return fig
+
+
+def scatter_figure(x, y, title, xlabel, ylabel, budget=None, seed=0, rows=None) -> go.Figure:
+    """
+    Dispersão de x × y; acima de `budget` pontos, amostra uniforme (sem ordem
+    não há LTTB). `rows` é o nº de pontos na origem quando x e y já são uma
+    amostra (ex.: de sample_points).
+    """
+    budget = budget or CHART_POINT_BUDGET
+    frame = pd.DataFrame({"x": pd.Series(x).reset_index(drop=True),
+                          "y": pd.Series(y).reset_index(drop=True)}).dropna()
+    n = len(frame) if rows is None else rows
+    if len(frame) > budget:
+        frame = frame.sample(n=budget, random_state=seed)
+    fig = go.Figure(_trace(n > CHART_WEBGL_ROWS)(
+        x=frame["x"], y=frame["y"], mode="markers", marker=dict(size=4, opacity=0.5),
+        hovertemplate=f"{xlabel}=%{{x}}<br>{ylabel}=%{{y}}<extra></extra>"))
+    suffix = f" (amostra de {len(frame)} de {n} pontos)" if n > len(frame) else ""
+    fig.update_layout(title=title + suffix, xaxis_title=xlabel, yaxis_title=ylabel)
+    return fig
@@ -0,0 +1,206 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+# ================================
+# 🧾 Resumos compactos para prompts do LLM
+# ================================
+# Em vez de embutir describe()/corr().to_dict() inteiros (dezenas de milhares
+# de tokens em tabelas largas), os agentes enviam um resumo ordenado pelo que
+# mais interessa (correlações mais fortes, colunas mais assimétricas, mais
+# outliers, ...) e cortado num orçamento de tokens.
+PROMPT_TOKEN_BUDGET = int(os.getenv("EDA_PROMPT_TOKENS", "1200"))
+CHARS_PER_TOKEN = 4  # estimativa grosseira, suficiente para limitar o tamanho
+
+log = logging.getLogger("eda.prompts")
+
+
+def estimate_tokens(text) -> int:
+    return -(-len(str(text)) // CHARS_PER_TOKEN)
+
+
+def _fmt(v) -> str:
+    if isinstance(v, (int, np.integer)):
+        return str(v)
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return str(v)
+    return "nan" if np.isnan(f) else f"{f:.4g}"
+
+
+def _clip(text, limit) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def fit_lines(header, lines, budget=None) -> str:
+    """Junta as linhas (já ordenadas por relevância) até esgotar o orçamento de tokens."""
+    budget = budget or PROMPT_TOKEN_BUDGET
+    out, used = [header], estimate_tokens(header)
+    for i, line in enumerate(lines):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            out.append(f"(+{len(lines) - i} itens omitidos por limite de tamanho)")
+            break
+        out.append(line)
+        used += cost
+    return "\n".join(out)
+
+
+def numeric_digest(desc, budget=None) -> str:
+    """
+    Resumo de um describe() numérico (estatísticas nas linhas, colunas nas
+    colunas), das variáveis mais assimétricas para as mais simétricas.
+    """
+    desc = desc.apply(pd.to_numeric, errors="coerce")
+    if desc.shape[1] == 0:
+        return "Sem variáveis numéricas."
+    stats = desc.T
+    std = stats["std"].where(stats["std"] > 0) if "std" in stats else None
+    if std is not None and "50%" in stats:
+        # Assimetria de Pearson (média vs. mediana) — não exige nova passagem pelos dados
+        score = (3 * (stats["mean"] - stats["50%"]) / std).abs()
+    elif std is not None:
+        score = (std / stats["mean"].abs()).abs()
+    else:
+        score = pd.Series(0.0, index=stats.index)
+    labels = {"count": "n", "mean": "média", "std": "dp", "min": "mín", "25%": "q1",
+              "50%": "mediana", "75%": "q3", "max": "máx"}
+    lines = []
+    for col in score.fillna(0).sort_values(ascending=False).index:
+        row = stats.loc[col]
+        parts = [f"{labels[k]}={_fmt(row[k])}" for k in labels if k in row.index]
+        if "50%" in row.index and std is not None and pd.notna(score[col]):
+            parts.append(f"assimetria≈{_fmt(score[col])}")
+        lines.append(f"- {col}: " + ", ".join(parts))
+    return fit_lines(f"{len(lines)} variáveis numéricas (mais assimétricas primeiro):", lines, budget)
+
+
+def summary_digest(desc, budget=None) -> str:
+    """
+    Resumo de um describe(include="all").T ou perfil de streaming (colunas nas
+    linhas): metade do orçamento para as numéricas e metade para as restantes.
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    numeric = desc["mean"].notna() if "mean" in desc else pd.Series(False, index=desc.index)
+    stat_cols = [c for c in ("count", "mean", "std", "min", "25%", "50%", "75%", "max") if c in desc]
+    parts = [numeric_digest(desc.loc[numeric, stat_cols].T, budget // 2)]
+    if "top" in desc:
+        parts.append(categorical_digest(desc.loc[~numeric & desc["top"].notna(),
+                                                 ["count", "unique", "top", "freq"]].T, budget // 2))
+    elif (~numeric).any():
+        parts.append(f"Outras colunas: {_clip(', '.join(map(str, desc.index[~numeric])), budget * 2)}")
+    if "nulls" in desc:
+        nulls = pd.to_numeric(desc["nulls"], errors="coerce").fillna(0)
+        worst = nulls[nulls > 0].sort_values(ascending=False).head(10)
+        if len(worst):
+            parts.append("Mais valores ausentes: " + ", ".join(f"{c}={int(n)}" for c, n in worst.items()))
+    return "\n".join(parts)
+
+
+def categorical_digest(desc, budget=None) -> str:
+    """Resumo de describe_categorical(): colunas com a categoria mais dominante primeiro."""
+    if desc.shape[1] == 0:
+        return "Sem variáveis categóricas."
+    stats = desc.T
+    share = pd.to_numeric(stats["freq"], errors="coerce") / pd.to_numeric(stats["count"], errors="coerce")
+    lines = []
+    for col in share.fillna(0).sort_values(ascending=False).index:
+        row = stats.loc[col]
+        lines.append(f"- {col}: n={_fmt(row['count'])}, únicos={row['unique']}, "
+                     f"mais comum='{_clip(row['top'], 40)}' ({share[col]:.0%})")
+    return fit_lines(f"{len(lines)} variáveis categóricas (mais concentradas primeiro):", lines, budget)
+
+
+def correlation_digest(corr, top_k=15, budget=None) -> str:
+    """Os top_k pares distintos com maior |r|."""
+    values = corr.to_numpy(dtype="float64")
+    i, j = np.triu_indices(len(corr.columns), k=1)
+    r = values[i, j]
+    ok = ~np.isnan(r)
+    i, j, r = i[ok], j[ok], r[ok]
+    order = np.argsort(-np.abs(r))[:top_k]
+    cols = corr.columns
+    lines = [f"- {cols[i[o]]} × {cols[j[o]]}: r={r[o]:+.2f}" for o in order]
+    if not lines:
+        return "Sem pares de variáveis numéricas com correlação definida."
+    return fit_lines(f"Pares com correlação mais forte ({len(cols)} variáveis, {len(r)} pares):",
+                     lines, budget)
+
+
+def outlier_digest(table, budget=None) -> str:
+    """Resumo de iqr_table(): colunas com mais outliers primeiro; as limpas só contadas."""
+    if table.empty:
+        return "Sem variáveis numéricas."
+    table = table.sort_values("outliers", ascending=False)
+    flagged = table[table["outliers"] > 0]
+    lines = []
+    for col, r in flagged.iterrows():
+        approx = "≈" if r.get("rank_error", 0) > 0 else ""
+        lines.append(f"- {col}: {approx}{int(r['outliers'])} outliers, "
+                     f"limites [{_fmt(r['lower'])}, {_fmt(r['upper'])}], IQR={_fmt(r['iqr'])}")
+    header = (f"{len(flagged)} de {len(table)} variáveis numéricas com outliers (IQR, 1.5×); "
+              f"mais afetadas primeiro:")
+    return fit_lines(header, lines, budget)
+
+
+def anomaly_digest(report, budget=None, top=15) -> str:
+    """Resumo de um AnomalyReport: números da execução e as linhas com maior score."""
+    head = (f"Método: {report.summary()['método']} sobre {len(report.columns)} variáveis numéricas; "
+            f"{report.n_scored} de {report.n_rows} linhas pontuadas; "
+            f"{report.n_flagged} acima do limiar {_fmt(report.threshold)}.")
+    lines = [f"- linha {label}: score={_fmt(r['score'])}; colunas mais desviadas: {_clip(r['colunas'], 120)}"
+             for label, r in report.rows.head(top).iterrows()]
+    return fit_lines(head + "\nLinhas mais suspeitas:", lines, budget)
+
+def frequency_digest(tables, budget=None, per_column=5) -> str:
+    """Resumo das tabelas de top-k por coluna ({coluna: DataFrame [valor, Frequência]})."""
+    lines = []
+    for col, freq in tables.items():
+        pairs = ", ".join(f"{_clip(v, 30)}={int(n)}" for v, n in freq.head(per_column).itertuples(index=False))
+        lines.append(f"- {col}: {pairs}")
+    return fit_lines(f"Categorias mais frequentes em {len(lines)} variáveis:", lines, budget)
+
+
+def blocks_digest(blocks, budget=None) -> str:
+    """Resumo de blocos de resultado: texto encurtado, dimensões das tabelas, títulos dos gráficos."""
+    lines = []
+    for block in blocks:
+        if not isinstance(block, dict):
+            lines.append(f"- {_clip(block, 300)}")
+            continue
+        title, btype, content = block.get("title", ""), block.get("type", "text"), block.get("content")
+        if btype == "chart":
+            lines.append(f"- [gráfico] {title}")
+        elif btype == "table" and isinstance(content, pd.DataFrame):
+            lines.append(f"- [tabela {content.shape[0]}×{content.shape[1]}] {title}: "
+                         f"{_clip(content.head(3).to_dict(), 200)}")
+        else:
+            lines.append(f"- {title}: {_clip(content, 400)}")
+    return fit_lines(f"{len(lines)} bloco(s) de resultado:", lines, budget)
+
+
+def history_digest(history, budget=None) -> str:
+    """Perguntas/respostas anteriores, das mais recentes para as mais antigas, encurtadas."""
+    lines = [f"Pergunta: {_clip(q, 200)}\nResposta: {_clip(a, 500)}" for q, a, _ in history]
+    return fit_lines(f"{len(lines)} interação(ões) anteriores (mais recentes primeiro):", lines, budget)
+
+
+def log_prompt(agent, dataset, prompt, digest=None, raw=None) -> str:
+    """
+    Regista o tamanho estimado do prompt e o que teria com o conteúdo bruto
+    no lugar do digest (raw: texto ou função que o produz, só chamada se o
+    log estiver ativo). Devolve o prompt para uso inline.
+    """
+    if log.isEnabledFor(logging.INFO):
+        after = estimate_tokens(prompt)
+        if digest is not None and raw is not None:
+            raw = raw() if callable(raw) else raw
+            before = after - estimate_tokens(digest) + estimate_tokens(raw)
+            log.info("%s[%s]: prompt ≈%d tokens (bruto ≈%d, %+.0f%%)",
+                     agent, dataset, after, before, 100 * (after / max(before, 1) - 1))
+        else:
+            log.info("%s[%s]: prompt ≈%d tokens", agent, dataset, after)
+    return prompt
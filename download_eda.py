@@ -0,0 +1,169 @@
+import os, time, hashlib, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import requests
+
+DOWNLOAD_SEGMENTS = int(os.getenv("EDA_DOWNLOAD_SEGMENTS", "4"))
+DOWNLOAD_RETRIES = 3
+# Abaixo deste tamanho não compensa dividir em segmentos
+MIN_SEGMENT_BYTES = 4 * 1024 * 1024
+# Intervalo (s) entre atualizações de progresso enviadas pela thread que chamou
+PROGRESS_INTERVAL = 0.2
+
+
+def _probe(url):
+    """
+    Devolve (tamanho, aceita Range, validador) do recurso; o validador é o
+    ETag ou o Last-Modified (None se o servidor não enviar nenhum).
+    """
+    try:
+        r = requests.head(url, allow_redirects=True, timeout=30)
+        r.raise_for_status()
+        size = int(r.headers.get("Content-Length", 0)) or None
+        ranges = r.headers.get("Accept-Ranges", "").lower() == "bytes"
+        validator = r.headers.get("ETag") or r.headers.get("Last-Modified")
+        return size, ranges and size is not None, validator
+    except (requests.RequestException, ValueError):
+        return None, False, None
+
+
+def _fetch_segment(url, part_path, start, end, chunk_bytes, progress, validator=None):
+    """
+    Descarrega os bytes [start, end] para part_path, retomando a partir do que
+    já existir no ficheiro parcial e tentando novamente em caso de falha.
+    Um parcial maior do que o segmento não é de confiança e é descartado.
+    """
+    expected = end - start + 1
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if have > expected:
+            os.remove(part_path)
+            have = 0
+        if have == expected:
+            return
+        headers = {"Range": f"bytes={start + have}-{end}"}
+        if validator and have:
+            # Se o ficheiro mudou no servidor, a resposta é 200 (inteiro) e não 206
+            headers["If-Range"] = validator
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=120) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise IOError("Servidor ignorou o cabeçalho Range ou o ficheiro mudou desde o início do download")
+                with open(part_path, "ab") as fh:
+                    for b in r.iter_content(chunk_size=chunk_bytes):
+                        if b:
+                            fh.write(b)
+                            progress(len(b))
+        except requests.RequestException:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
+    got = os.path.getsize(part_path)
+    if got != expected:
+        raise IOError(f"Segmento com {got} bytes em vez de {expected}: {part_path}")
+
+
+def download_to_temp(url: str, chunk_bytes: int = 8 * 1024 * 1024, segments: int = None,
+                     expected_sha256: str = None, on_progress=None, stats: dict = None) -> str:
+    """
+    Faz download do ficheiro por streaming para um arquivo temporário e retorna o caminho.
+    Evita estourar memória durante o download.
+
+    Se o servidor aceitar pedidos Range, o ficheiro é dividido em `segments`
+    partes descarregadas em paralelo; partes já existentes de uma tentativa
+    anterior são retomadas em vez de descarregadas de novo.
+
+    :param expected_sha256: se indicado, o ficheiro final é validado contra este hash
+    :param on_progress: callback opcional (bytes descarregados, total ou None, segundos),
+                        chamado sempre na thread que chamou esta função
+    :param stats: dict opcional preenchido com bytes, bytes retomados, segundos,
+                  MB/s, sha256 e nº de segmentos
+    """
+    segments = segments or DOWNLOAD_SEGMENTS
+    size, ranges, validator = _probe(url)
+    n = max(1, min(segments, size // MIN_SEGMENT_BYTES)) if ranges else 1
+    # As partes só são retomadas pela mesma divisão da mesma versão do ficheiro
+    key = hashlib.sha1(f"{url}\n{validator or ''}".encode()).hexdigest()[:16]
+    base = os.path.join(tempfile.gettempdir(), f"eda_dl_{key}_{size or 'x'}_{n}seg")
+
+    lock = threading.Lock()
+    state = {"done": 0, "resumed": 0}
+    t0 = time.perf_counter()
+
+    def progress(n):
+        # Chamado pelas threads do pool: só atualiza o estado. O callback é
+        # chamado pela thread de quem pediu o download (ex.: o script Streamlit,
+        # cujo contexto não existe nas threads do pool)
+        with lock:
+            state["done"] += n
+
+    def report():
+        if on_progress:
+            on_progress(state["done"], size, time.perf_counter() - t0)
+
+    if ranges:
+        step = -(-size // n)
+        bounds = [(i * step, min(size, (i + 1) * step) - 1) for i in range(n)]
+        parts = [f"{base}.part{i}" for i in range(n)]
+        have = [os.path.getsize(p) if os.path.exists(p) else 0 for p in parts]
+        state["done"] = state["resumed"] = sum(h for h, (s, e) in zip(have, bounds) if h <= e - s + 1)
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            futures = [pool.submit(_fetch_segment, url, p, s, e, chunk_bytes, progress, validator)
+                       for p, (s, e) in zip(parts, bounds)]
+            pending = futures
+            while pending:
+                _, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                report()
+                if any(f.done() and f.exception() for f in futures):
+                    break
+            for fut in futures:
+                fut.result()
+    else:
+        # Sem suporte a Range: download sequencial (sem retoma possível)
+        parts = [f"{base}.part0"]
+        last = 0.0
+        with open(parts[0], "wb") as fh, requests.get(url, stream=True, timeout=120) as r:
+            r.raise_for_status()
+            for b in r.iter_content(chunk_size=chunk_bytes):
+                if b:  # ignora keep-alive
+                    fh.write(b)
+                    progress(len(b))
+                    if time.perf_counter() - last >= PROGRESS_INTERVAL:
+                        last = time.perf_counter()
+                        report()
+        report()
+
+    # Junta os segmentos no ficheiro final calculando o SHA-256 pelo caminho
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
+        for p in parts:
+            with open(p, "rb") as fh:
+                for b in iter(lambda: fh.read(chunk_bytes), b""):
+                    digest.update(b)
+                    tmp.write(b)
+        final_path = tmp.name
+    for p in parts:
+        os.remove(p)
+
+    if size and os.path.getsize(final_path) != size:
+        got = os.path.getsize(final_path)
+        os.remove(final_path)
+        raise IOError(f"Tamanho inválido: esperado {size} bytes (Content-Length), obtido {got}")
+
+    sha256 = digest.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256.strip().lower():
+        os.remove(final_path)
+        raise ValueError(f"Checksum inválido: esperado {expected_sha256}, obtido {sha256}")
+
+    elapsed = time.perf_counter() - t0
+    if stats is not None:
+        fetched = state["done"] - state["resumed"]
+        stats.update({
+            "bytes": os.path.getsize(final_path),
+            "resumed_bytes": state["resumed"],
+            "seconds": elapsed,
+            "mb_per_s": fetched / 1024**2 / elapsed if elapsed else 0.0,
+            "sha256": sha256,
+            "segments": n,
+        })
+    return final_path
@@ -1,5 +1,5 @@
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+from .llm import get_llm
+from digest_eda import blocks_digest, history_digest, log_prompt
 
 class AdvisorAgent:
     """
@@ -9,12 +9,7 @@ class AdvisorAgent:
     """
 
     def __init__(self, gemini_api_key):
-        model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-        self.llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            temperature=0.2,
-            google_api_key=gemini_api_key
-        )
+        self.llm = get_llm(temperature=0.2, api_key=gemini_api_key)
 
     def summarize(self, last_answer):
         """
@@ -35,12 +30,13 @@ class AdvisorAgent:
 
         agent_name = last_answer.get("agent", "Agente desconhecido")
         blocks = last_answer["result"]
+        digest = blocks_digest(blocks)
 
         prompt = f"""
         Você é um assistente de análise exploratória de dados.
         Baseado no resultado produzido pelo agente {agent_name}:
 
-        {blocks}
+        {digest}
 
         Gere:
         - Um resumo claro e curto (3 a 5 frases).
@@ -49,6 +45,7 @@ class AdvisorAgent:
         Sempre inclua a seção "Perguntas sugeridas:" no final.
         """
 
+        log_prompt("AdvisorAgent", agent_name, prompt, digest, lambda: str(blocks))
         try:
             commentary = self.llm.invoke(prompt).content.strip()
         except Exception:
@@ -96,7 +93,7 @@ class AdvisorAgent:
                 )
             }
 
-        hist_text = "\n".join([f"Pergunta: {q}\nResposta: {a}" for q, a, _ in history])
+        hist_text = history_digest(history)
 
         prompt = f"""
         Você é um assistente de análise de dados.
@@ -110,6 +107,8 @@ class AdvisorAgent:
         - 3 perguntas sugeridas para aprofundar a exploração dos dados.
         """
 
+        log_prompt("AdvisorAgent", "histórico", prompt, hist_text,
+                   lambda: "\n".join(f"Pergunta: {q}\nResposta: {a}" for q, a, _ in history))
         try:
             resp = self.llm.invoke(prompt)
             content = resp.content.strip()
@@ -1,8 +1,9 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-import os
+from .llm import get_llm, submit_prompts, StreamedText
+from digest_eda import summary_digest, log_prompt
 import pandas as pd
 import plotly.express as px
-from utils_eda import build_result_block
+from utils_eda import build_result_block, select_datasets, select_columns
+from stats_eda import describe_all
 
 class AnalystAgentOld:
     def __init__(self, dfs: dict):
@@ -112,39 +113,51 @@ class AnalystAgentLastWorkingVersion2:
                 })
 
         return results
-    
-
 
 
 class AnalystAgent:
     def __init__(self, dfs, gemini_api_key):
         self.dfs = dfs
-        model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-        self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=0.2, google_api_key=gemini_api_key)
+        self.llm = get_llm(temperature=0.2, api_key=gemini_api_key)
+
+    def describe(self, datasets=None, columns=None):
+        tables = []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            cols = select_columns(df.columns, columns)
+            profile = getattr(df, "profile", None)
+            if profile is not None:
+                # Dataset em disco: estatísticas acumuladas na conversão, sem reler os dados
+                desc = profile.describe().loc[list(cols)]
+            else:
+                # describe por coluna guardado no perfil do DataFrame: a 2ª pergunta não relê os dados
+                desc = describe_all(df, cols)
+            tables.append((name, desc))
+
+        # Um pedido ao LLM por dataset, todos em paralelo
+        prompts = []
+        for name, desc in tables:
+            digest = summary_digest(desc)
+            prompts.append(log_prompt("AnalystAgent", name,
+                                      f"Explique resumidamente as estatísticas do dataset {name}:\n{digest}",
+                                      digest, lambda: str(desc.head().to_dict())))
+        replies = submit_prompts(self.llm, prompts)
 
-    def describe(self):
         results = []
-        for name, df in self.dfs.items():
-            desc = df.describe(include="all").T
+        for (name, desc), reply in zip(tables, replies):
             results.append({
                 "title": f"📊 Resumo estatístico — {name}",
                 "type": "table",
                 "content": desc
             })
 
-            prompt = f"Explique resumidamente as estatísticas do dataset {name}: {desc.head().to_dict()}"
-            try:
-                resp = self.llm.invoke(prompt)
-                commentary = resp.content
-            except Exception as e:
-                commentary = (
-                    "Resumo automático indisponível (possível quota excedida). "
-                    "Verifique valores ausentes, outliers e distribuições para obter insights iniciais."
-                )
+            commentary = StreamedText(reply, fallback=(
+                "Resumo automático indisponível (possível quota excedida). "
+                "Verifique valores ausentes, outliers e distribuições para obter insights iniciais."
+            ))
 
             results.append({
                 "title": f"📝 Comentários — {name}",
                 "type": "text",
                 "content": commentary
             })
-        return results
\ No newline at end of file
+        return results
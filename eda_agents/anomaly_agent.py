@@ -1,14 +1,18 @@
-import os
 import pandas as pd
-from langchain_google_genai import ChatGoogleGenerativeAI
+from .llm import get_llm, submit_prompts, StreamedText
+from stats_eda import outlier_scan, box_stats, numeric_columns
+from charts_eda import box_figure
+from utils_eda import select_datasets, select_columns
+from digest_eda import outlier_digest, anomaly_digest, log_prompt
+from anomaly_eda import detect_anomalies, METHODS
+
+# Linhas mais atípicas mostradas na resposta (todas ficam no CSV para download)
+OUTLIER_ROWS_SHOWN = 20
 
 class AnomalyAgent:
     def __init__(self, dfs, gemini_api_key):
         self.dfs = dfs
-        model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-        self.llm = ChatGoogleGenerativeAI(
-            model=model_name, temperature=0.2, google_api_key=gemini_api_key
-        )
+        self.llm = get_llm(temperature=0.2, api_key=gemini_api_key)
 
     def iqr_outliersOld(self):
         results = []
@@ -50,87 +54,147 @@ class AnomalyAgent:
             })
         return results
 
-    def iqr_outliers(self):
-        import plotly.express as px
+    def iqr_outliers(self, datasets=None, columns=None):
         results = []
 
-        for name, df in self.dfs.items():
-            # 🔹 Tenta usar o LLM como primeira via
-            try:
-                numeric_cols = df.select_dtypes(include="number").columns
-                prompt = (
-                    f"Você é um especialista em análise de dados. "
-                    f"Avalie o dataset '{name}' e identifique quais variáveis numéricas "
-                    f"apresentam outliers com base no método IQR (Interquartile Range). "
-                    f"Explique resumidamente, em tom humano, "
-                    f"quais variáveis são mais críticas e o que isso pode indicar. "
-                    f"Dados estatísticos iniciais: {df.describe(include='number').to_dict()}."
+        # Limites IQR, contagens e linhas com outliers numa só passagem vetorizada:
+        # alimentam o prompt, o fallback local e a tabela de linhas atípicas
+        # (quantis exatos em memória; sketches KLL para datasets em disco)
+        selected = []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            numeric_cols = select_columns(numeric_columns(df), columns)
+            scan = outlier_scan(df, columns=numeric_cols)
+            selected.append((name, df, numeric_cols, scan))
+
+        # 🔹 LLM como primeira via — um pedido por dataset, todos em paralelo
+        prompts = []
+        for name, df, numeric_cols, scan in selected:
+            digest = outlier_digest(scan.table)
+            prompts.append(log_prompt("AnomalyAgent", name, (
+                f"Você é um especialista em análise de dados. "
+                f"Avalie o dataset '{name}' e identifique quais variáveis numéricas "
+                f"apresentam outliers com base no método IQR (Interquartile Range). "
+                f"Explique resumidamente, em tom humano, "
+                f"quais variáveis são mais críticas e o que isso pode indicar. "
+                f"Resultado do IQR:\n{digest}"
+            ), digest, lambda table=scan.table: str(table.to_dict())))
+        replies = submit_prompts(self.llm, prompts)
+
+        for (name, df, numeric_cols, scan), reply in zip(selected, replies):
+            # 🔹 Fallback local (caso LLM falhe)
+            def local_summary(table=scan.table):
+                resumo_geral = []
+                for col, r in table.iterrows():
+                    if r["rank_error"] > 0:
+                        resumo = (
+                            f"A variável **{col}** possui **≈{int(r['outliers'])} outlier(s)** "
+                            f"(±{int(r['outliers_error'])}; erro de rank ≤ {r['rank_error']:.2%}). "
+                            f"IQR ≈ {r['iqr']:.2f}, limites ≈ [{r['lower']:.2f}, {r['upper']:.2f}]."
+                        )
+                    else:
+                        resumo = (
+                            f"A variável **{col}** possui **{int(r['outliers'])} outlier(s)**. "
+                            f"IQR = {r['iqr']:.2f}, limites [{r['lower']:.2f}, {r['upper']:.2f}]."
+                        )
+                    resumo_geral.append(resumo)
+                return "\n".join(resumo_geral) + (
+                    "\n\nResumo automático indisponível. "
+                    "Variáveis com muitos outliers podem indicar erros de medição, "
+                    "valores atípicos ou fenômenos raros que merecem investigação."
                 )
 
-                commentary = self.llm.invoke(prompt).content
+            results.append({
+                "title": f"🧠 Interpretação Automática — {name}",
+                "type": "text",
+                "content": StreamedText(reply, fallback=local_summary,
+                                        fallback_title=f"⚠️ Resumo de Outliers — {name}")
+            })
 
+            # 🔹 Linhas com mais outliers (score = distância às cercas em IQRs)
+            if len(scan.rows):
+                top = scan.rows.head(OUTLIER_ROWS_SHOWN)
+                if isinstance(df, pd.DataFrame):
+                    top = top.join(df.loc[top.index, scan.columns])
                 results.append({
-                    "title": f"🧠 Interpretação Automática — {name}",
-                    "type": "text",
-                    "content": commentary
+                    "title": f"🚩 Linhas mais atípicas — {name} ({len(scan.rows)} com outliers)",
+                    "type": "table",
+                    "content": top,
+                    "download": (f"outliers_{name}.csv", scan.to_csv)
                 })
 
-                # 🔹 Boxplots automáticos (suporte visual)
-                numeric_cols = df.select_dtypes(include="number").columns
-                for col in numeric_cols:
-                    try:
-                        fig = px.box(df, y=col, title=f"Boxplot de {col} — {name}")
-                        results.append({
-                            "title": f"📊 Boxplot — {col} ({name})",
-                            "type": "chart",
-                            "content": fig
-                        })
-                    except Exception:
-                        pass
-
-            except Exception:
-                # 🔹 Fallback local (caso LLM falhe)
-                numeric_cols = df.select_dtypes(include="number").columns
-                resumo_geral = []
-
-                for col in numeric_cols:
-                    q1 = df[col].quantile(0.25)
-                    q3 = df[col].quantile(0.75)
-                    iqr = q3 - q1
-                    lower = q1 - 1.5 * iqr
-                    upper = q3 + 1.5 * iqr
-                    outliers = df[(df[col] < lower) | (df[col] > upper)][col]
-
-                    resumo = (
-                        f"A variável **{col}** possui **{len(outliers)} outlier(s)**. "
-                        f"IQR = {iqr:.2f}, limites [{lower:.2f}, {upper:.2f}]."
-                    )
-                    resumo_geral.append(resumo)
+            # 🔹 Boxplots automáticos (suporte visual)
+            for col in numeric_cols:
+                try:
+                    fig = box_figure(box_stats(df, col), f"Boxplot de {col} — {name}", col)
+                    results.append({
+                        "title": f"📊 Boxplot — {col} ({name})",
+                        "type": "chart",
+                        "content": fig
+                    })
+                except Exception:
+                    pass
 
-                    try:
-                        fig = px.box(df, y=col, title=f"Boxplot de {col} — {name}")
-                        results.append({
-                            "title": f"📊 Boxplot — {col} ({name})",
-                            "type": "chart",
-                            "content": fig
-                        })
-                    except Exception:
-                        pass
+        return results
 
-                results.append({
-                    "title": f"⚠️ Resumo de Outliers — {name}",
-                    "type": "text",
-                    "content": "\n".join(resumo_geral)
-                })
+    def multivariate_outliers(self, method="isolation", datasets=None, columns=None):
+        """
+        Anomalias na combinação de valores (robust, isolation ou streaming; ver
+        anomaly_eda): cada linha recebe um score e as mais suspeitas são
+        mostradas com as colunas que mais se afastam do padrão.
+        """
+        results, selected = [], []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            numeric_cols = select_columns(numeric_columns(df), columns)
+            if len(numeric_cols) == 0:
+                continue
+            selected.append((name, df, detect_anomalies(df, method, columns=numeric_cols)))
+
+        # 🔹 LLM como primeira via — um pedido por dataset, todos em paralelo
+        prompts = []
+        for name, df, report in selected:
+            digest = anomaly_digest(report)
+            prompts.append(log_prompt("AnomalyAgent", name, (
+                f"Você é um especialista em análise de dados e deteção de fraude. "
+                f"No dataset '{name}' cada linha recebeu um score de anomalia multivariado "
+                f"({METHODS[method]}). Explique resumidamente, em tom humano, o que as linhas "
+                f"mais suspeitas têm em comum, que combinações de valores chamam a atenção "
+                f"e o que vale a pena verificar. Resultado:\n{digest}"
+            ), digest))
+        replies = submit_prompts(self.llm, prompts)
+
+        for (name, df, report), reply in zip(selected, replies):
+            # 🔹 Fallback local (caso LLM falhe)
+            def local_summary(report=report):
+                partial = "" if report.complete else (
+                    f" O orçamento de tempo acabou: foram pontuadas {report.n_scored} "
+                    f"de {report.n_rows} linhas.")
+                lines = [f"- Linha **{label}** (score {r['score']:.3g}): {r['colunas']}"
+                         for label, r in report.rows.head(5).iterrows()]
+                return (f"**{report.n_flagged}** linha(s) acima do limiar ({METHODS[method]}, "
+                        f"limiar {report.threshold:.3g}).{partial}\n\n" + "\n".join(lines) + (
+                    "\n\nResumo automático indisponível. Linhas atípicas na combinação de "
+                    "valores podem indicar erros de registo ou operações que merecem auditoria."))
 
+            results.append({
+                "title": f"🧠 Interpretação Automática — {name}",
+                "type": "text",
+                "content": StreamedText(reply, fallback=local_summary,
+                                        fallback_title=f"🕵️ Resumo de Anomalias — {name}")
+            })
+            results.append({
+                "title": f"⚙️ Execução — {METHODS[method]} ({name})",
+                "type": "json",
+                "content": report.summary()
+            })
+            if len(report.rows):
+                top = report.rows.head(OUTLIER_ROWS_SHOWN)
+                if isinstance(df, pd.DataFrame):
+                    top = top.join(df.loc[top.index, report.columns])
                 results.append({
-                    "title": f"📝 Comentários — {name}",
-                    "type": "text",
-                    "content": (
-                        "Resumo automático indisponível. "
-                        "Variáveis com muitos outliers podem indicar erros de medição, "
-                        "valores atípicos ou fenômenos raros que merecem investigação."
-                    )
+                    "title": f"🚩 Linhas mais suspeitas — {name} ({report.n_flagged} acima do limiar)",
+                    "type": "table",
+                    "content": top,
+                    "download": (f"anomalias_{method}_{name}.csv", report.to_csv)
                 })
 
         return results
@@ -0,0 +1,113 @@
+import os
+import time
+import random
+import hashlib
+import threading
+from typing import Literal, get_args, get_origin
+from pydantic import BaseModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableLambda
+
+from .llm import _prompt_text
+
+# ================================
+# 🧪 Modelo de chat simulado (sem rede)
+# ================================
+# Ativado com EDA_LLM_FAKE=1: get_llm() devolve este modelo no lugar do
+# ChatGoogleGenerativeAI. As respostas são determinísticas (dependem só do
+# prompt) e a latência é configurável, para medir o nosso próprio tempo de
+# cálculo sem o ruído da rede.
+FAKE_LATENCY_MS = float(os.getenv("EDA_LLM_FAKE_LATENCY_MS", "500"))
+FAKE_TOKEN_MS = float(os.getenv("EDA_LLM_FAKE_TOKEN_MS", "10"))
+FAKE_TOKENS = int(os.getenv("EDA_LLM_FAKE_TOKENS", "40"))
+
+VOCABULARY = (
+    "os dados mostram uma distribuição assimétrica com valores extremos em algumas variáveis "
+    "a mediana fica abaixo da média o que sugere cauda longa à direita recomenda-se investigar "
+    "as correlações mais fortes e validar os registos atípicos antes de conclusões definitivas"
+).split()
+
+
+def fake_enabled() -> bool:
+    return os.getenv("EDA_LLM_FAKE", "0") == "1"
+
+
+def _fake_value(annotation, metadata, rng):
+    origin = get_origin(annotation)
+    if origin is Literal:
+        return rng.choice(get_args(annotation))
+    if origin is list:
+        n = max([getattr(m, "min_length", 0) or 0 for m in metadata] + [1])
+        return [_fake_value(get_args(annotation)[0], [], rng) for _ in range(n)]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _fake_instance(annotation, rng)
+    return {str: "simulado", int: 0, float: 0.0, bool: False}.get(annotation)
+
+
+def _fake_instance(schema, rng):
+    """Instância válida do schema: campos opcionais com o default, obrigatórios sorteados."""
+    values = {}
+    for name, field in schema.model_fields.items():
+        if field.is_required():
+            values[name] = _fake_value(field.annotation, field.metadata, rng)
+        else:
+            values[name] = field.get_default(call_default_factory=True)
+    return schema.model_validate(values)
+
+
+class FakeChatModel:
+    """
+    Substituto local do ChatGoogleGenerativeAI com invoke, stream e
+    with_structured_output. Cada chamada espera `latency_ms` até ao primeiro
+    pedaço e `token_ms` por pedaço seguinte. Guarda nº de chamadas e o tempo
+    em que bloqueou a thread principal (útil para separar tempos no benchmark).
+    """
+
+    calls = 0
+    main_thread_seconds = 0.0
+    _lock = threading.Lock()
+
+    def __init__(self, model="fake", temperature=0.0, latency_ms=None, token_ms=None, tokens=None):
+        self.model = model
+        self.temperature = temperature
+        self.latency = (FAKE_LATENCY_MS if latency_ms is None else latency_ms) / 1000
+        self.token_delay = (FAKE_TOKEN_MS if token_ms is None else token_ms) / 1000
+        self.tokens = FAKE_TOKENS if tokens is None else tokens
+
+    def _rng(self, prompt):
+        digest = hashlib.sha256(_prompt_text(prompt).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _words(self, prompt):
+        rng = self._rng(prompt)
+        return [rng.choice(VOCABULARY) + " " for _ in range(self.tokens)]
+
+    def _sleep(self, seconds):
+        start = time.perf_counter()
+        time.sleep(seconds)
+        with FakeChatModel._lock:
+            if threading.current_thread() is threading.main_thread():
+                FakeChatModel.main_thread_seconds += time.perf_counter() - start
+
+    def _count(self):
+        with FakeChatModel._lock:
+            FakeChatModel.calls += 1
+
+    def invoke(self, prompt, **kwargs):
+        self._count()
+        words = self._words(prompt)
+        self._sleep(self.latency + self.token_delay * (len(words) - 1))
+        return AIMessage(content="".join(words).strip())
+
+    def stream(self, prompt, **kwargs):
+        self._count()
+        for i, word in enumerate(self._words(prompt)):
+            self._sleep(self.latency if i == 0 else self.token_delay)
+            yield AIMessageChunk(content=word)
+
+    def with_structured_output(self, schema, **kwargs):
+        def respond(prompt):
+            self._count()
+            self._sleep(self.latency)
+            return _fake_instance(schema, self._rng(prompt))
+        return RunnableLambda(respond)
@@ -0,0 +1,204 @@
+import os
+import re
+import unicodedata
+from collections import Counter
+import numpy as np
+
+# Limiar de confiança abaixo do qual o Orchestrator recorre ao LLM
+INTENT_CONFIDENCE = float(os.getenv("EDA_INTENT_CONFIDENCE", "0.6"))
+
+# Palavras-chave inequívocas por intenção (texto já sem acentos e em minúsculas)
+KEYWORDS = {
+    "boxplot": r"\bbox ?plots?\b|\bcaixa",
+    "histogram": r"\bhistogram|\bdistribuic|\bdistribution",
+    "pie": r"\bpizza|\bpie\b|\bsetores\b|\bproporc",
+    "barplot": r"\bbarras?\b|\bbar ?(?:plot|chart)s?\b",
+    "scatter": r"\bscatter|\b(?:grafico|diagrama)s? de dispersao|\bversus\b|\bvs\b",
+    "line": r"\bgraficos? de linhas?\b|\bline ?(?:plot|chart)s?\b|\bseries? tempora|\bao longo do tempo|\bevolucao",
+    "anomaly": r"\boutliers?\b|\banomal|\batipic|\bdiscrepant|\bvalores extremos|\bfraud|\bisolation forest",
+    "pattern": r"\bcorrela|\bpadro|\bpadrao|\bpattern|\bcluster|\bfrequen",
+    "advisor": r"\bconclus|\bresum|\brecomenda|\bsummar|\binsights?\b",
+    "analyst": r"\bestatistic|\bmedias?\b|\bmediana|\bdesvio|\bausente|\bnulos?\b|\bmissing|\btipos?\b|\bdescri",
+}
+
+# Separadores de pedidos numa mesma pergunta ("distribuições e outliers de preço")
+CLAUSE_SPLIT = re.compile(r"\s*(?:[,;]|\be\b|\band\b|\btambem\b|\balem d[eo]s?\b|\bassim como\b)\s*")
+MAX_PLAN_STEPS = 4
+
+# Conjunto rotulado usado para treinar o modelo TF-IDF + regressão logística
+LABELLED_QUESTIONS = [
+    ("Quais são as estatísticas descritivas?", "analyst"),
+    ("Mostre média, mediana e desvio padrão", "analyst"),
+    ("Quantos valores ausentes existem?", "analyst"),
+    ("Quais são os tipos de dados das colunas?", "analyst"),
+    ("Descreva o dataset", "analyst"),
+    ("Qual o mínimo e o máximo de cada variável?", "analyst"),
+    ("Há colunas com nulos?", "analyst"),
+    ("Quantas linhas e colunas tem a tabela?", "analyst"),
+    ("Qual a variabilidade das variáveis numéricas?", "analyst"),
+    ("Summary statistics of the data", "analyst"),
+    ("Mostre as distribuições", "histogram"),
+    ("Como se distribuem os valores de preço?", "histogram"),
+    ("Gere histogramas das variáveis numéricas", "histogram"),
+    ("Qual o formato da distribuição do valor total?", "histogram"),
+    ("A distribuição é assimétrica?", "histogram"),
+    ("Plot the histogram of amount", "histogram"),
+    ("Mostre a densidade dos valores", "histogram"),
+    ("Gráfico de frequência das variáveis numéricas", "histogram"),
+    ("Mostre boxplots", "boxplot"),
+    ("Gere um box plot do valor unitário", "boxplot"),
+    ("Quero ver o diagrama de caixa das colunas", "boxplot"),
+    ("Compare a dispersão com boxplots", "boxplot"),
+    ("Show a boxplot of price", "boxplot"),
+    ("Mostre quartis e mediana em gráfico de caixa", "boxplot"),
+    ("Gráfico de barras das categorias", "barplot"),
+    ("Quais categorias aparecem mais? Mostre em barras", "barplot"),
+    ("Mostre as UFs com mais notas em barras", "barplot"),
+    ("Bar chart of the categories", "barplot"),
+    ("Contagem por categoria em gráfico de barras", "barplot"),
+    ("Ranking das categorias mais comuns", "barplot"),
+    ("Gráfico de pizza das categorias", "pie"),
+    ("Mostre a proporção de cada categoria", "pie"),
+    ("Qual a participação percentual de cada UF?", "pie"),
+    ("Pie chart of payment type", "pie"),
+    ("Mostre em setores a divisão por tipo", "pie"),
+    ("Qual a fatia de cada categoria no total?", "pie"),
+    ("Gráfico de dispersão entre preço e quantidade", "scatter"),
+    ("Mostre valor total versus quantidade", "scatter"),
+    ("Scatter plot of price vs amount", "scatter"),
+    ("Plote os pontos de uma variável contra a outra", "scatter"),
+    ("Diagrama de dispersão das variáveis numéricas", "scatter"),
+    ("Gráfico de linhas do valor total", "line"),
+    ("Como evolui o valor ao longo do tempo?", "line"),
+    ("Mostre a série temporal das vendas", "line"),
+    ("Line chart of revenue over time", "line"),
+    ("Evolução mensal das notas emitidas", "line"),
+    ("Existe correlação entre as variáveis?", "pattern"),
+    ("Quais colunas estão relacionadas?", "pattern"),
+    ("Mostre a matriz de correlação", "pattern"),
+    ("Quais os valores mais frequentes?", "pattern"),
+    ("Há padrões nos dados?", "pattern"),
+    ("Quais variáveis andam juntas?", "pattern"),
+    ("Which variables are correlated?", "pattern"),
+    ("Existe relação entre quantidade e valor?", "pattern"),
+    ("Quais variáveis têm outliers?", "anomaly"),
+    ("Existem valores atípicos?", "anomaly"),
+    ("Detecte anomalias nos dados", "anomaly"),
+    ("Há valores extremos no valor total?", "anomaly"),
+    ("Quais registros são suspeitos?", "anomaly"),
+    ("Find outliers in the amounts", "anomaly"),
+    ("Há notas fora do padrão?", "anomaly"),
+    ("Existem fraudes ou registros estranhos?", "anomaly"),
+    ("Use Isolation Forest para achar registros suspeitos", "anomaly"),
+    ("Anomalias multivariadas com z-score robusto", "anomaly"),
+    ("Quais notas têm combinações de valores fora do comum?", "anomaly"),
+    ("Quais as conclusões da análise?", "advisor"),
+    ("Resuma as descobertas anteriores", "advisor"),
+    ("Que recomendações você dá?", "advisor"),
+    ("Faça um resumo geral", "advisor"),
+    ("O que aprendemos até agora?", "advisor"),
+    ("Summarize the findings", "advisor"),
+    ("Quais os próximos passos?", "advisor"),
+    ("Quais insights principais?", "advisor"),
+]
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos, para regras e TF-IDF."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class IntentClassifier:
+    """
+    Classificador local de intenções: palavras-chave inequívocas primeiro e,
+    depois, TF-IDF de n-gramas de caracteres com regressão logística treinada
+    em LABELLED_QUESTIONS. Roda em microssegundos e devolve uma confiança
+    que o Orchestrator compara com INTENT_CONFIDENCE.
+    """
+
+    def __init__(self, examples=LABELLED_QUESTIONS):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        texts, labels = zip(*examples)
+        self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True)
+        model = LogisticRegression(C=10.0, max_iter=1000)
+        model.fit(self.vectorizer.fit_transform([normalize(t) for t in texts]), labels)
+        # Pesos extraídos para prever sem a sobrecarga de validação do scikit-learn
+        self.classes = [str(c) for c in model.classes_]
+        self.coef = model.coef_.T
+        self.intercept = model.intercept_
+        self._analyzer = self.vectorizer.build_analyzer()
+        self._vocab = self.vectorizer.vocabulary_
+        self._idf = self.vectorizer.idf_
+        self._keywords = {intent: re.compile(p) for intent, p in KEYWORDS.items()}
+
+    def _proba(self, text):
+        # Mesmo cálculo do TfidfVectorizer (tf sublinear × idf, norma L2), sem matriz esparsa
+        counts = Counter(self._vocab[g] for g in self._analyzer(text) if g in self._vocab)
+        scores = self.intercept.copy()
+        if counts:
+            idx = np.fromiter(counts.keys(), dtype=np.intp)
+            weights = (1 + np.log(np.fromiter(counts.values(), dtype=float))) * self._idf[idx]
+            scores += (weights / np.linalg.norm(weights)) @ self.coef[idx]
+        exp = np.exp(scores - scores.max())
+        return exp / exp.sum()
+
+    def predict(self, question: str):
+        """:return: (intenção, confiança entre 0 e 1)"""
+        text = normalize(question)
+        hits = [intent for intent, rx in self._keywords.items() if rx.search(text)]
+        if len(hits) == 1:
+            return hits[0], 1.0
+        proba = self._proba(text)
+        if hits:
+            # Várias palavras-chave: decide o modelo, restrito às intenções citadas
+            scores = {c: p for c, p in zip(self.classes, proba) if c in hits}
+            best = max(scores, key=scores.get)
+            return best, float(scores[best] / sum(scores.values()))
+        best = int(proba.argmax())
+        return self.classes[best], float(proba[best])
+
+
+    def predict_plan(self, question: str):
+        """
+        Intenções de uma pergunta com vários pedidos: cada oração é classificada
+        e entram as intenções confiantes, pela ordem em que aparecem. Orações
+        sem intenção confiante (ex.: "e preco") juntam-se à intenção anterior;
+        a mesma intenção em duas orações junta os dois trechos. Se houver menos
+        de duas intenções, vale a classificação da pergunta inteira.
+
+        :return: lista de (intenção, confiança, trecho da pergunta que a originou)
+        """
+        clauses = [c for c in CLAUSE_SPLIT.split(normalize(question)) if c.strip()]
+        plan, last, pending = {}, None, []
+        if len(clauses) > 1:
+            for clause in clauses:
+                intent, confidence = self.predict(clause)
+                if confidence < INTENT_CONFIDENCE:
+                    if last is None:
+                        pending.append(clause)
+                    else:
+                        plan[last][1].append(clause)
+                    continue
+                if intent not in plan:
+                    plan[intent] = [confidence, pending]
+                plan[intent][1].append(clause)
+                last, pending = intent, []
+        if len(plan) < 2:
+            intent, confidence = self.predict(question)
+            return [(intent, confidence, question)]
+        return [(intent, confidence, " e ".join(parts))
+                for intent, (confidence, parts) in list(plan.items())[:MAX_PLAN_STEPS]]
+
+
+_classifier = None
+
+
+def get_classifier() -> IntentClassifier:
+    """Instância partilhada, treinada no primeiro uso."""
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier()
+    return _classifier
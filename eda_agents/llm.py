@@ -0,0 +1,319 @@
+import os
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from memory import init_memory, cache_get, cache_put
+from .resilience import call_guarded, breaker
+
+# Cache persistente das respostas do LLM (tabela llm_cache na mesma BD do histórico)
+LLM_CACHE_ENABLED = os.getenv("EDA_LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = float(os.getenv("EDA_LLM_CACHE_TTL_HOURS", "168")) * 3600
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("EDA_LLM_CACHE_MAX_ENTRIES", "5000"))
+# Máximo de chamadas ao LLM em simultâneo (partilhado por todos os agentes)
+LLM_CONCURRENCY = max(1, int(os.getenv("EDA_LLM_CONCURRENCY", "4")))
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+_table_ready = False
+
+
+def set_cache_enabled(enabled: bool):
+    """Liga/desliga o cache em tempo de execução (ex.: a partir da aba Configurações)."""
+    global LLM_CACHE_ENABLED
+    LLM_CACHE_ENABLED = bool(enabled)
+
+
+def cache_stats():
+    """Contadores de hits/misses deste processo."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(kind):
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def _prompt_text(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    return "\n".join(f"{getattr(m, 'type', '')}: {getattr(m, 'content', m)}" for m in prompt)
+
+
+def cache_key(model, temperature, prompt) -> str:
+    """SHA-256 de modelo, temperatura e prompt normalizado (espaços colapsados)."""
+    normalized = re.sub(r"\s+", " ", _prompt_text(prompt)).strip()
+    return hashlib.sha256(f"{model}|{temperature}|{normalized}".encode("utf-8")).hexdigest()
+
+
+def _ensure_table():
+    global _table_ready
+    if not _table_ready:
+        # Os agentes podem ser usados fora da app, sem init_memory() prévio
+        init_memory()
+        _table_ready = True
+
+
+def chunk_text(chunk) -> str:
+    """Texto de uma mensagem/pedaço, seja o content uma string ou uma lista de partes."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+
+
+def cached(model, temperature, prompt, compute):
+    """
+    Devolve a resposta em cache para (modelo, temperatura, prompt) ou chama
+    compute() — que deve devolver texto — e guarda o resultado.
+    """
+    if not LLM_CACHE_ENABLED:
+        return compute()
+    _ensure_table()
+    key = cache_key(model, temperature, prompt)
+    hit = cache_get(key, LLM_CACHE_TTL)
+    if hit is not None:
+        _count("hits")
+        return hit
+    _count("misses")
+    text = compute()
+    if isinstance(text, str) and text.strip():
+        cache_put(key, model, temperature, text, LLM_CACHE_MAX_ENTRIES)
+    return text
+
+
+class CachedLLM:
+    """
+    Envolve um chat model e guarda as respostas de invoke() em SQLite, com
+    TTL e limite de entradas (LRU). Os restantes atributos (ex.:
+    with_structured_output) passam diretamente para o modelo original.
+
+    Com factory=..., o modelo só é construído no primeiro uso.
+    """
+
+    def __init__(self, llm=None, factory=None, model=None, temperature=None):
+        self._llm = llm
+        self._factory = factory
+        self._lock = threading.Lock()
+        self.model = model or getattr(llm, "model", type(llm).__name__)
+        self.temperature = temperature if temperature is not None else getattr(llm, "temperature", None)
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = self._factory()
+        return self._llm
+
+    def _invoke(self, prompt, **kwargs):
+        # Só os misses chegam à API: passam pelo limitador, retries e circuit breaker
+        return call_guarded(lambda: self.llm.invoke(prompt, **kwargs))
+
+    def _stream(self, prompt, **kwargs):
+        # Retries só até ao 1º pedaço (depois já há texto entregue); o circuit
+        # breaker regista o resultado do stream inteiro, incluindo falhas a meio
+        def start():
+            chunks = iter(self.llm.stream(prompt, **kwargs))
+            return chunks, next(chunks, None)
+        chunks, first = call_guarded(start, settle=False)
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        except GeneratorExit:
+            # Quem lia desistiu do stream: não conta como sucesso nem falha
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        breaker.record_success()
+
+    def invoke(self, prompt, **kwargs):
+        if not LLM_CACHE_ENABLED:
+            return self._invoke(prompt, **kwargs)
+        text = cached(self.model, self.temperature, prompt,
+                      lambda: self._invoke(prompt, **kwargs).content)
+        return AIMessage(content=text)
+
+    def stream(self, prompt, **kwargs):
+        """Como invoke(), mas devolve pedaços à medida que chegam; um hit sai num só pedaço."""
+        if not LLM_CACHE_ENABLED:
+            yield from self._stream(prompt, **kwargs)
+            return
+        _ensure_table()
+        key = cache_key(self.model, self.temperature, prompt)
+        hit = cache_get(key, LLM_CACHE_TTL)
+        if hit is not None:
+            _count("hits")
+            yield AIMessageChunk(content=hit)
+            return
+        _count("misses")
+        parts = []
+        for chunk in self._stream(prompt, **kwargs):
+            parts.append(chunk_text(chunk))
+            yield chunk
+        text = "".join(parts)
+        if text.strip():
+            cache_put(key, self.model, self.temperature, text, LLM_CACHE_MAX_ENTRIES)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+
+# ===== Registo de clientes partilhados =====
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def default_model() -> str:
+    return os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+
+
+def get_llm(temperature, api_key=None, model=None) -> CachedLLM:
+    """
+    Cliente partilhado por (modelo, temperatura, chave) em todo o processo.
+    O ChatGoogleGenerativeAI (e as suas ligações HTTP) só é criado na
+    primeira chamada ao LLM e depois reutilizado por todos os agentes.
+    Com EDA_LLM_FAKE=1 é usado o FakeChatModel local.
+    """
+    from .fake_llm import FakeChatModel, fake_enabled
+    model = model or default_model()
+    key = (model, temperature, api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            def factory():
+                if fake_enabled():
+                    return FakeChatModel(model=model, temperature=temperature)
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                # Sem retries internos: quem repete (com jitter e circuit breaker) é call_guarded
+                return ChatGoogleGenerativeAI(model=model, temperature=temperature,
+                                              google_api_key=api_key, max_retries=0)
+            client = _clients[key] = CachedLLM(factory=factory, model=model, temperature=temperature)
+        return client
+
+
+# ===== Chamadas concorrentes =====
+_pool = None
+
+
+def _executor():
+    global _pool
+    with _clients_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY, thread_name_prefix="eda-llm")
+        return _pool
+
+
+class LLMReply:
+    """
+    Resposta de um prompt em curso numa thread do pool. Pode ser iterada
+    (pedaços de texto à medida que chegam, mesmo por vários consumidores)
+    ou esperada com result(): texto completo, ou None se a chamada falhou.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.failed = False
+        self.done = False
+        self._cond = threading.Condition()
+
+    def _run(self, llm, prompt):
+        try:
+            chunks = llm.stream(prompt) if hasattr(llm, "stream") else [llm.invoke(prompt)]
+            for chunk in chunks:
+                with self._cond:
+                    self.parts.append(chunk_text(chunk))
+                    self._cond.notify_all()
+        except Exception:
+            self.failed = True
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def __iter__(self):
+        i = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.done or i < len(self.parts))
+                new, finished = self.parts[i:], self.done
+            i += len(new)
+            yield from new
+            if finished and i >= len(self.parts):
+                return
+
+    def result(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.done)
+        return None if self.failed else "".join(self.parts)
+
+
+class StreamedText:
+    """
+    Conteúdo de um bloco de texto que ainda está a ser gerado pelo LLM.
+    A interface itera-o para mostrar os tokens à medida que chegam; se a
+    chamada falhar, sai o fallback local (texto ou função que o produz) e,
+    se indicado, o bloco passa a usar fallback_title. str()/repr() esperam
+    pela resposta, por isso o histórico guarda sempre o texto final.
+    """
+
+    def __init__(self, reply, fallback, fallback_title=None):
+        self.reply = reply
+        self._fallback = fallback
+        self.fallback_title = fallback_title
+
+    @property
+    def failed(self):
+        return self.reply.result() is None
+
+    def _fallback_text(self):
+        if callable(self._fallback):
+            self._fallback = self._fallback()
+        return self._fallback
+
+    def __iter__(self):
+        streamed = False
+        for piece in self.reply:
+            streamed = True
+            yield piece
+        if self.reply.failed:
+            yield ("\n\n" if streamed else "") + self._fallback_text()
+
+    @property
+    def text(self):
+        result = self.reply.result()
+        if result is None:
+            partial = "".join(self.reply.parts)
+            return (partial + "\n\n" if partial else "") + self._fallback_text()
+        return result
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return repr(self.text)
+
+
+def submit_prompts(llm, prompts):
+    """
+    Dispara os prompts em paralelo (no máximo LLM_CONCURRENCY de cada vez) e
+    devolve um LLMReply por prompt, pela ordem original. Uma chamada que
+    falha só afeta o seu dataset (o agente aplica o fallback local), e os
+    gráficos podem ser montados enquanto as respostas chegam.
+    """
+    replies = []
+    for prompt in prompts:
+        reply = LLMReply()
+        _executor().submit(reply._run, llm, prompt)
+        replies.append(reply)
+    return replies
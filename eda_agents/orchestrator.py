@@ -1,7 +1,10 @@
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 #from langchain.prompts import ChatPromptTemplate
 from langchain_core.prompts import ChatPromptTemplate
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 
 
 from .analyst_agent import AnalystAgent
@@ -9,43 +12,69 @@ from .visualizer_agent import VisualizerAgent
 from .pattern_agent import PatternAgent
 from .anomaly_agent import AnomalyAgent
 from .advisor_agent import AdvisorAgent
+from .llm import get_llm, cached
+from .resilience import call_guarded
+from .intent_classifier import get_classifier, normalize, INTENT_CONFIDENCE, MAX_PLAN_STEPS
+from stats_eda import shared_stats
 from memory import get_history
 
-INTENT_PROMPT = ChatPromptTemplate.from_messages([
+class Route(BaseModel):
+    """Decisão de roteamento devolvida numa única chamada estruturada ao LLM."""
+    intent: Literal["analyst", "histogram", "boxplot", "barplot", "pie", "scatter", "line", "pattern", "anomaly",
+                    "advisor"] = Field(
+        description="Categoria da pergunta")
+    datasets: List[str] = Field(default_factory=list,
+                                description="Datasets mencionados na pergunta (vazio = todos)")
+    columns: List[str] = Field(default_factory=list,
+                               description="Colunas mencionadas na pergunta (vazio = todas)")
+    pattern_kind: Optional[Literal["correlations", "frequencies"]] = Field(
+        default=None, description="Para 'pattern': correlações numéricas ou frequências categóricas")
+    top_k: Optional[int] = Field(default=None, description="Nº de categorias pedido (barras/frequências)")
+    anomaly_method: Optional[Literal["iqr", "robust", "isolation", "streaming"]] = Field(
+        default=None, description="Para 'anomaly': iqr (por coluna, padrão), robust (z-score/MAD), "
+                                  "isolation (Isolation Forest, combinações de valores/fraude) ou "
+                                  "streaming (incremental, datasets muito grandes)")
+
+
+class Plan(BaseModel):
+    """Plano de execução: um passo por pedido da pergunta (normalmente só um)."""
+    steps: List[Route] = Field(min_length=1, max_length=MAX_PLAN_STEPS,
+                               description="Passos independentes, pela ordem em que aparecem na pergunta")
+
+
+ROUTER_PROMPT = ChatPromptTemplate.from_messages([
     ("system",
-     "Você é um orquestrador de agentes EDA. Analise a pergunta e escolha SOMENTE UMA categoria entre:\n"
+     "Você é um orquestrador de agentes EDA. Analise a pergunta e monte um plano com um passo por "
+     "pedido (no máximo 4; normalmente só um). Cada passo tem UMA categoria entre:\n"
      " - 'analyst' (estatísticas, tipos, ausentes)\n"
      " - 'histogram' (gráficos de distribuição para variáveis numéricas)\n"
      " - 'boxplot' (gráficos de boxplots para variáveis numéricas)\n"
      " - 'barplot' (gráficos de barras para variáveis categóricas)\n"
      " - 'pie' (gráficos de pizza para variáveis categóricas com poucas categorias)\n"
+     " - 'scatter' (gráficos de dispersão entre pares de variáveis numéricas)\n"
+     " - 'line' (gráficos de linhas: séries ao longo do tempo ou da ordem das linhas)\n"
      " - 'pattern' (correlações, frequências, clusters simples)\n"
-     " - 'anomaly' (detecção de outliers)\n"
+     " - 'anomaly' (detecção de outliers; multivariada com Isolation Forest, z-score robusto ou incremental)\n"
      " - 'advisor' (quando o usuário pedir conclusões gerais ou resumo das análises)\n"
-     "Responda apenas com a palavra da categoria."),
+     "Use vários passos só se a pergunta pedir explicitamente análises diferentes "
+     "(ex.: 'distribuições e outliers do preço' = histogram + anomaly).\n"
+     "Em cada passo indique também os datasets e as colunas citados, usando exatamente "
+     "os nomes abaixo; deixe as listas vazias se a pergunta não restringir.\n"
+     "Datasets e colunas disponíveis:\n{catalog}"),
     ("human", "{question}")
 ])
 
-ANALYST_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", "Você é o Agente Analista. Foque em estatísticas descritivas, tipos e valores ausentes."),
-    ("human", "{question}")
-])
-VISUAL_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", "Você é o Agente Visualizador. Escolha gráficos adequados (histogramas, boxplots, barras, pizza)."),
-    ("human", "{question}")
-])
-PATTERN_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", "Você é o Agente de Padrões. Foque em correlações numéricas e valores mais/menos frequentes."),
-    ("human", "{question}")
-])
-ANOMALY_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", "Você é o Agente de Anomalias. Foque em detecção de outliers com IQR."),
-    ("human", "{question}")
-])
-ADVISOR_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", "Você é o Agente de Conclusões. Resuma descobertas e recomendações a partir do histórico de análises."),
-    ("human", "{question}")
-])
+# Limite de colunas listadas por dataset no prompt do roteador
+CATALOG_MAX_COLUMNS = 60
+
+# Modo de deteção de anomalias pedido na pergunta (texto já normalizado); sem
+# correspondência fica o IQR por coluna
+ANOMALY_METHODS = {
+    "streaming": r"\bstreaming|\bincremental|\bonline\b|\bem fluxo",
+    "robust": r"\bz-?scores?\b|\bmad\b|\brobust",
+    "isolation": r"\bisolation|\bisolamento|\bmultivariad|\bcombinac|\bfraud|\bsuspeit",
+}
+
 
 class Orchestrator:
     def __init__(self, dfs: dict, gemini_api_key: str):
@@ -56,47 +85,131 @@ class Orchestrator:
         self.anomaly = AnomalyAgent(dfs, gemini_api_key=gemini_api_key)
         self.advisor = AdvisorAgent(gemini_api_key=gemini_api_key)
 
-        model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-        self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=0, google_api_key=gemini_api_key)
+        self.llm = get_llm(temperature=0, api_key=gemini_api_key)
+
+    def set_datasets(self, dfs: dict):
+        """Troca os datasets sem reconstruir agentes nem clientes LLM (reruns do Streamlit)."""
+        self.dfs = dfs
+        for agent in (self.analyst, self.visual, self.patterns, self.anomaly):
+            agent.dfs = dfs
+
+    def _catalog(self) -> str:
+        lines = []
+        for name, df in self.dfs.items():
+            cols = [str(c) for c in df.columns[:CATALOG_MAX_COLUMNS]]
+            extra = len(df.columns) - len(cols)
+            lines.append(f"- {name}: {', '.join(cols)}" + (f" (+{extra} colunas)" if extra > 0 else ""))
+        return "\n".join(lines) or "(nenhum)"
+
+    def _local_route(self, question: str, intent: str) -> Route:
+        """Monta a Route sem LLM: datasets/colunas cujo nome aparece na pergunta."""
+        text = normalize(question)
+
+        def mentioned(names):
+            return [str(n) for n in names
+                    if re.search(rf"(?<!\w){re.escape(normalize(str(n)))}(?!\w)", text)]
+
+        top_k = re.search(r"\btop\s*(\d+)|\b(\d+)\s+(?:categorias|mais)", text)
+        return Route(
+            intent=intent,
+            datasets=mentioned(self.dfs.keys()),
+            columns=mentioned(dict.fromkeys(c for df in self.dfs.values() for c in df.columns)),
+            pattern_kind="frequencies" if re.search(r"\bfrequen|\bcomuns\b", text) else None,
+            top_k=int(next(g for g in top_k.groups() if g)) if top_k else None,
+            anomaly_method=next((m for m, rx in ANOMALY_METHODS.items() if re.search(rx, text)), None),
+        )
+
+    def plan(self, question: str) -> Plan:
+        """
+        Classificador local primeiro (uma intenção por oração da pergunta); só
+        com confiança abaixo de INTENT_CONFIDENCE é feita uma única chamada
+        estruturada ao LLM que devolve o plano completo: intenções, datasets,
+        colunas e parâmetros de cada passo.
+        """
+        predictions = get_classifier().predict_plan(question)
+        if all(confidence >= INTENT_CONFIDENCE for _, confidence, _ in predictions):
+            # Colunas e parâmetros vêm do trecho de cada intenção; datasets e
+            # colunas que o trecho não cite vêm da pergunta inteira ("mostre as
+            # distribuições e os outliers do preco": os dois passos ficam no preco)
+            whole = self._local_route(question, predictions[0][0])
+            steps = []
+            for intent, _, clause in predictions:
+                step = self._local_route(clause, intent)
+                steps.append(step.model_copy(update={"datasets": step.datasets or whole.datasets,
+                                                     "columns": step.columns or whole.columns}))
+            return Plan(steps=steps)
+        inputs = {"question": question, "catalog": self._catalog()}
+        chain = ROUTER_PROMPT | self.llm.with_structured_output(Plan)
+        raw = cached(self.llm.model, self.llm.temperature, ROUTER_PROMPT.format(**inputs),
+                     lambda: call_guarded(lambda: chain.invoke(inputs)).model_dump_json())
+        return Plan.model_validate_json(raw)
+
+    def route(self, question: str) -> Route:
+        return self.plan(question).steps[0]
 
     def classify(self, question: str) -> str:
-        chain = INTENT_PROMPT | self.llm
-        resp = chain.invoke({"question": question})
-        return (resp.content or "").strip().lower()
+        return self.route(question).intent
 
     def answer(self, question: str, user="demo@local"):
-        intent = self.classify(question)
-
-        if "analyst" in intent:
-            _ = (ANALYST_PROMPT | self.llm).invoke({"question": question})
-            return {"agent": "AnalystAgent", "result": self.analyst.describe()}
-
-        if "histogram" in intent:
-            _ = (VISUAL_PROMPT | self.llm).invoke({"question": question})
-            return {"agent": "VisualizerAgent", "result": self.visual.histograms()}
-
-        if "boxplot" in intent:
-            _ = (VISUAL_PROMPT | self.llm).invoke({"question": question})
-            return {"agent": "VisualizerAgent", "result": self.visual.boxplots()}
-
-        if "barplot" in intent:
-            _ = (VISUAL_PROMPT | self.llm).invoke({"question": question})
-            return {"agent": "VisualizerAgent", "result": self.visual.barplots()}
-
-        if "pie" in intent:
-            _ = (VISUAL_PROMPT | self.llm).invoke({"question": question})
-            return {"agent": "VisualizerAgent", "result": self.visual.piecharts()}
-
-        if "pattern" in intent:
-            _ = (PATTERN_PROMPT | self.llm).invoke({"question": question})
-            return {"agent": "PatternAgent", "result": self.patterns.correlations()}
-
-        if "anomaly" in intent:
-            _ = (ANOMALY_PROMPT | self.llm).invoke({"question": question})
-            return {"agent": "AnomalyAgent", "result": self.anomaly.iqr_outliers()}
-
-        if "advisor" in intent or "conclus" in question.lower() or "resum" in question.lower():
-            _ = (ADVISOR_PROMPT | self.llm).invoke({"question": question})
+        try:
+            steps = self.plan(question).steps
+        except Exception:
+            steps = [None]
+        # Passos repetidos (mesma intenção e âmbito) só correm uma vez
+        steps = list({s.model_dump_json() if s else "": s for s in steps}.values())
+
+        # Estatísticas (describe, IQR, correlações, frequências) partilhadas entre os passos
+        with shared_stats():
+            if len(steps) == 1:
+                return self._run(steps[0], question, user)
+            with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="eda-plan") as pool:
+                futures = [pool.submit(contextvars.copy_context().run, self._run, step, question, user)
+                           for step in steps]
+                answers = [f.result() for f in futures]
+
+        answers = [a for a in answers if a["agent"] != "Unknown"] or answers[:1]
+        agents = list(dict.fromkeys(a["agent"] for a in answers))
+        return {"agent": " + ".join(agents), "result": [b for a in answers for b in a["result"]]}
+
+    def _run(self, route, question, user):
+        """Executa um passo do plano (uma intenção) no agente correspondente."""
+        intent = route.intent if route else ""
+        scope = {"datasets": route.datasets, "columns": route.columns} if route else {}
+
+        if intent == "analyst":
+            return {"agent": "AnalystAgent", "result": self.analyst.describe(**scope)}
+
+        if intent == "histogram":
+            return {"agent": "VisualizerAgent", "result": self.visual.histograms(**scope)}
+
+        if intent == "boxplot":
+            return {"agent": "VisualizerAgent", "result": self.visual.boxplots(**scope)}
+
+        if intent == "barplot":
+            return {"agent": "VisualizerAgent", "result": self.visual.barplots(top_k=route.top_k or 10, **scope)}
+
+        if intent == "pie":
+            return {"agent": "VisualizerAgent", "result": self.visual.piecharts(**scope)}
+
+        if intent == "scatter":
+            return {"agent": "VisualizerAgent", "result": self.visual.scatterplots(**scope)}
+
+        if intent == "line":
+            return {"agent": "VisualizerAgent", "result": self.visual.lineplots(**scope)}
+
+        if intent == "pattern":
+            if route.pattern_kind == "frequencies":
+                return {"agent": "PatternAgent",
+                        "result": self.patterns.frequencies(top_k=route.top_k or 10, **scope)}
+            return {"agent": "PatternAgent", "result": self.patterns.correlations(**scope)}
+
+        if intent == "anomaly":
+            if route.anomaly_method in ("robust", "isolation", "streaming"):
+                return {"agent": "AnomalyAgent",
+                        "result": self.anomaly.multivariate_outliers(method=route.anomaly_method, **scope)}
+            return {"agent": "AnomalyAgent", "result": self.anomaly.iqr_outliers(**scope)}
+
+        if intent == "advisor" or "conclus" in question.lower() or "resum" in question.lower():
             history = get_history(user, limit=20)
             return {"agent": "AdvisorAgent", "result": [self.advisor.summarize_history(history)]}
 
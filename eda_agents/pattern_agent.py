@@ -1,7 +1,9 @@
-import os
 import plotly.express as px
 import pandas as pd
-from langchain_google_genai import ChatGoogleGenerativeAI
+from .llm import get_llm, submit_prompts, StreamedText
+from stats_eda import correlation_matrix, top_values, categorical_columns
+from utils_eda import select_datasets, select_columns
+from digest_eda import correlation_digest, frequency_digest, log_prompt
 
 
 class PatternAgent:
@@ -15,52 +17,50 @@ class PatternAgent:
 
     def __init__(self, dfs, gemini_api_key):
         self.dfs = dfs
-        model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-        self.llm = ChatGoogleGenerativeAI(
-            model=model_name, temperature=0.2, google_api_key=gemini_api_key
-        )
+        self.llm = get_llm(temperature=0.2, api_key=gemini_api_key)
 
     # ============================================================
     # 🔹 MÉTODO PRINCIPAL — CORRELAÇÕES
     # ============================================================
-    def correlations(self):
+    def correlations(self, datasets=None, columns=None):
+        matrices = []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            # Matriz de correlação (por co-momentos em datasets em disco)
+            corr = correlation_matrix(df)
+            cols = [c for c in select_columns(corr.columns, columns)]
+            if len(cols) < len(corr.columns):
+                corr = corr.loc[cols, cols]
+            matrices.append((name, corr))
+
+        # 🔸 LLM PRIORITÁRIO — um pedido por dataset, todos em paralelo
+        prompts = []
+        for name, corr in matrices:
+            digest = correlation_digest(corr)
+            prompts.append(log_prompt("PatternAgent", name, (
+                f"Você é um analista de dados. Analise a matriz de correlação do dataset '{name}'. "
+                f"Descreva, de forma clara e objetiva, as relações mais fortes (positivas e negativas), "
+                f"indicando possíveis implicações. Use uma linguagem humana e precisa. "
+                f"Correlações:\n{digest}"
+            ), digest, lambda: str(corr.to_dict())))
+        replies = submit_prompts(self.llm, prompts)
+
         results = []
-        for name, df in self.dfs.items():
-            try:
-                # Matriz de correlação
-                corr = df.corr(numeric_only=True)
-
-                # 🔸 LLM PRIORITÁRIO
-                prompt = (
-                    f"Você é um analista de dados. Analise a matriz de correlação do dataset '{name}'. "
-                    f"Descreva, de forma clara e objetiva, as relações mais fortes (positivas e negativas), "
-                    f"indicando possíveis implicações. Use uma linguagem humana e precisa. "
-                    f"Matriz de correlação: {corr.to_dict()}."
-                )
-                commentary = self.llm.invoke(prompt).content
-
-                # 🔹 Gráfico de correlação (heatmap)
-                fig = px.imshow(
-                    corr,
-                    text_auto=True,
-                    color_continuous_scale="RdBu_r",
-                    title=f"Matriz de Correlação — {name}",
-                )
+        for (name, corr), reply in zip(matrices, replies):
+            # 🔹 Gráfico de correlação (heatmap)
+            fig = px.imshow(
+                corr,
+                text_auto=True,
+                color_continuous_scale="RdBu_r",
+                title=f"Matriz de Correlação — {name}",
+            )
+            results.append({
+                "title": f"🔗 Matriz de Correlação — {name}",
+                "type": "chart",
+                "content": fig
+            })
 
-                results.append({
-                    "title": f"🔗 Matriz de Correlação — {name}",
-                    "type": "chart",
-                    "content": fig
-                })
-                results.append({
-                    "title": f"🧠 Interpretação Automática — {name}",
-                    "type": "text",
-                    "content": commentary
-                })
-
-            except Exception:
-                # 🔸 FALLBACK LOCAL
-                corr = df.corr(numeric_only=True)
+            # 🔸 FALLBACK LOCAL: pares mais fortes, só calculados se o LLM falhar
+            def local_pairs(corr=corr):
                 top_corr = (
                     corr.where(~corr.isna())
                     .unstack()
@@ -71,46 +71,54 @@ class PatternAgent:
                 top_pairs = [
                     f"{a}–{b}: {v:.2f}" for (a, b), v in top_corr.head(5).items() if a != b
                 ]
-
-                fig = px.imshow(
-                    corr,
-                    text_auto=True,
-                    color_continuous_scale="RdBu_r",
-                    title=f"Matriz de Correlação — {name}",
+                return (
+                    "Resumo automático indisponível.\n\n"
+                    "Correlações mais fortes encontradas localmente:\n- "
+                    + "\n- ".join(top_pairs)
                 )
 
-                results.append({
-                    "title": f"🔗 Matriz de Correlação — {name}",
-                    "type": "chart",
-                    "content": fig
-                })
-                results.append({
-                    "title": f"📝 Comentários — {name}",
-                    "type": "text",
-                    "content": (
-                        "Resumo automático indisponível.\n\n"
-                        "Correlações mais fortes encontradas localmente:\n- "
-                        + "\n- ".join(top_pairs)
-                    ),
-                })
+            results.append({
+                "title": f"🧠 Interpretação Automática — {name}",
+                "type": "text",
+                "content": StreamedText(reply, fallback=local_pairs,
+                                        fallback_title=f"📝 Comentários — {name}")
+            })
 
         return results
 
     # ============================================================
     # 🔹 MÉTODO ADICIONAL — PADRÕES CATEGÓRICOS
     # ============================================================
-    def frequencies(self):
+    def frequencies(self, datasets=None, columns=None, top_k=10):
         """Analisa padrões de frequência em colunas categóricas."""
-        results = []
-        for name, df in self.dfs.items():
-            cat_cols = df.select_dtypes(exclude="number").columns
+        selected = []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            cat_cols = select_columns(categorical_columns(df), columns)
             if len(cat_cols) == 0:
                 continue
 
+            tables = {}
             for col in cat_cols:
-                freq = df[col].value_counts().reset_index().head(10)
+                freq = top_values(df, col, top_k).reset_index()
                 freq.columns = [col, "Frequência"]
+                tables[col] = freq
+            selected.append((name, tables))
+
+        # Interpretação via LLM — um pedido por dataset, todos em paralelo
+        prompts = []
+        for name, tables in selected:
+            digest = frequency_digest(tables)
+            prompts.append(log_prompt("PatternAgent", name, (
+                f"Analise os padrões de frequência das variáveis categóricas do dataset '{name}'. "
+                f"Descreva quais categorias aparecem com maior e menor frequência, "
+                f"e o que isso pode sugerir sobre os dados. "
+                f"Resumo de frequências:\n{digest}"
+            ), digest, lambda: str({col: freq.to_dict() for col, freq in tables.items()})))
+        replies = submit_prompts(self.llm, prompts)
 
+        results = []
+        for (name, tables), reply in zip(selected, replies):
+            for col, freq in tables.items():
                 # Gráfico local
                 try:
                     fig = px.bar(freq, x=col, y="Frequência", title=f"Top categorias — {col} ({name})")
@@ -122,21 +130,11 @@ class PatternAgent:
                 except Exception:
                     continue
 
-            # Interpretação via LLM
-            try:
-                prompt = (
-                    f"Analise os padrões de frequência das variáveis categóricas do dataset '{name}'. "
-                    f"Descreva quais categorias aparecem com maior e menor frequência, "
-                    f"e o que isso pode sugerir sobre os dados. "
-                    f"Resumo de frequências: {freq.to_dict()}."
-                )
-                commentary = self.llm.invoke(prompt).content
-            except Exception:
-                commentary = (
-                    "Resumo automático indisponível. "
-                    "Sugestão: observe as categorias dominantes — elas indicam concentração de registros "
-                    "ou possíveis viéses de coleta."
-                )
+            commentary = StreamedText(reply, fallback=(
+                "Resumo automático indisponível. "
+                "Sugestão: observe as categorias dominantes — elas indicam concentração de registros "
+                "ou possíveis viéses de coleta."
+            ))
 
             results.append({
                 "title": f"🧠 Interpretação Automática — {name}",
@@ -0,0 +1,205 @@
+import os
+import time
+import random
+import threading
+
+# ================================
+# 🚦 Proteção das chamadas ao Gemini
+# ================================
+# Um só limitador (token bucket) e um só circuit breaker para todo o processo:
+# todos os agentes partilham a mesma quota da API. Com o circuito aberto as
+# chamadas falham de imediato e os agentes passam logo ao fallback local.
+LLM_RPM = float(os.getenv("EDA_LLM_RPM", "15"))
+LLM_BURST = max(1, int(os.getenv("EDA_LLM_BURST", "5")))
+LLM_RATE_WAIT = float(os.getenv("EDA_LLM_RATE_WAIT", "30"))
+LLM_RETRIES = max(0, int(os.getenv("EDA_LLM_RETRIES", "2")))
+LLM_RETRY_BASE = float(os.getenv("EDA_LLM_RETRY_BASE", "1.0"))
+BREAKER_FAILURES = max(1, int(os.getenv("EDA_LLM_BREAKER_FAILURES", "3")))
+BREAKER_COOLDOWN = float(os.getenv("EDA_LLM_BREAKER_COOLDOWN", "60"))
+
+# Erros que não melhoram com nova tentativa (chave inválida, pedido mal formado),
+# reconhecidos pelo código HTTP, pelo estado da Google API ou pelo tipo da exceção
+# — nunca por texto solto na mensagem (um 429 pode citar "4032 s")
+PERMANENT_STATUS = {400, 401, 403, 404}
+PERMANENT_REASONS = {"INVALID_ARGUMENT", "PERMISSION_DENIED", "UNAUTHENTICATED", "NOT_FOUND", "API_KEY_INVALID"}
+PERMANENT_TYPES = {"InvalidArgument", "PermissionDenied", "Unauthenticated", "Unauthorized",
+                   "Forbidden", "BadRequest", "NotFound", "AuthenticationError", "PermissionDeniedError"}
+
+
+class CircuitOpenError(RuntimeError):
+    """O circuito está aberto: a API falhou repetidamente e ainda está em pausa."""
+
+
+class RateLimitTimeout(RuntimeError):
+    """Não houve vaga no limitador de pedidos dentro do tempo de espera."""
+
+
+class TokenBucket:
+    """Limitador de pedidos por minuto com rajadas até `burst`."""
+
+    def __init__(self, rpm=LLM_RPM, burst=LLM_BURST):
+        self.rate = rpm / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=LLM_RATE_WAIT):
+        """Espera por uma vaga; RateLimitTimeout se não houver dentro de `timeout` segundos."""
+        if self.rate <= 0:
+            return
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise RateLimitTimeout(f"limite de {self.rate * 60:g} pedidos/min atingido")
+            time.sleep(wait)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class CircuitBreaker:
+    """
+    closed → open após `failures` falhas seguidas; open → half_open passados
+    `cooldown` segundos (deixa passar um pedido de teste); half_open → closed
+    se esse pedido correr bem, ou open outra vez se falhar.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.rejected = 0
+        self._trial = False
+        self._lock = threading.Condition()
+
+    def before_call(self, timeout=LLM_RATE_WAIT):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"API indisponível: {self.last_error}")
+                self.state, self._trial = "half_open", False
+            if self.state == "half_open" and self._trial:
+                # Os restantes pedidos esperam pelo resultado do pedido de teste
+                self._lock.wait_for(lambda: self.state != "half_open" or not self._trial, timeout)
+                if self.state != "closed" and (self.state == "open" or self._trial):
+                    self.rejected += 1
+                    raise CircuitOpenError(f"API indisponível: {self.last_error}")
+            if self.state == "half_open":
+                self._trial = True
+
+    def release(self):
+        """O pedido nem chegou à API (ex.: sem vaga no limitador): liberta a vaga de teste."""
+        with self._lock:
+            if self.state == "half_open":
+                self._trial = False
+                self._lock.notify_all()
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self._trial = "closed", 0, False
+            self._lock.notify_all()
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+            if self.state == "half_open" or self.failures >= self.max_failures:
+                self.state, self.opened_at, self._trial = "open", time.monotonic(), False
+            self._lock.notify_all()
+
+    def reset(self):
+        with self._lock:
+            self.state, self.failures, self.opened_at, self._trial = "closed", 0, None, False
+            self._lock.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            return {"state": self.state, "failures": self.failures, "last_error": self.last_error,
+                    "rejected": self.rejected, "retry_in": retry_in}
+
+
+bucket = TokenBucket()
+breaker = CircuitBreaker()
+
+
+def _status_code(error):
+    """Código HTTP de uma exceção de cliente (google-genai, api_core, requests/httpx), ou None."""
+    for value in (getattr(error, "code", None), getattr(error, "status_code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _permanent(error) -> bool:
+    # Os wrappers do LangChain encadeiam a exceção original (raise ... from e)
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if _status_code(error) in PERMANENT_STATUS:
+            return True
+        if str(getattr(error, "status", "") or getattr(error, "reason", "")) in PERMANENT_REASONS:
+            return True
+        if any(cls.__name__ in PERMANENT_TYPES for cls in type(error).__mro__):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def call_guarded(fn, settle=True):
+    """
+    Executa fn() (uma chamada à API) com circuit breaker, limitador partilhado
+    e até LLM_RETRIES novas tentativas com backoff exponencial e jitter total.
+    Erros permanentes não são repetidos.
+
+    Com settle=False o sucesso não é registado no circuit breaker: quem chama
+    (ex.: um stream, que ainda pode falhar a meio) regista-o no fim com
+    breaker.record_success() / record_failure() / release().
+    """
+    breaker.before_call()
+    attempt = 0
+    while True:
+        try:
+            bucket.acquire()
+        except RateLimitTimeout:
+            breaker.release()
+            raise
+        try:
+            result = fn()
+        except Exception as e:
+            if attempt >= LLM_RETRIES or _permanent(e):
+                breaker.record_failure(e)
+                raise
+            attempt += 1
+            time.sleep(random.uniform(0, LLM_RETRY_BASE * 2 ** attempt))
+            continue
+        if settle:
+            breaker.record_success()
+        return result
+
+
+def guard_state() -> dict:
+    """Estado para a aba Configurações."""
+    return {**breaker.snapshot(), "tokens": bucket.available(), "rpm": bucket.rate * 60,
+            "burst": bucket.burst, "retries": LLM_RETRIES}
@@ -1,6 +1,16 @@
-import os
+import numpy as np
+import pandas as pd
 import plotly.express as px
-from langchain_google_genai import ChatGoogleGenerativeAI
+from .llm import get_llm, submit_prompts, StreamedText
+from stats_eda import (top_values, frequency_sketch, describe_categorical, describe_numeric,
+                       histogram_bins, box_stats, correlation_matrix, numeric_columns, categorical_columns)
+from charts_eda import histogram_figure, box_figure, scatter_figure, line_figure, sample_points, lttb_points
+from utils_eda import select_datasets, select_columns
+from digest_eda import numeric_digest, categorical_digest, correlation_digest, log_prompt
+
+# Pares de variáveis na dispersão e séries no gráfico de linhas por dataset
+SCATTER_MAX_PAIRS = 3
+LINE_MAX_SERIES = 3
 
 class VisualizerAgent:
     """
@@ -12,25 +22,37 @@ class VisualizerAgent:
 
     def __init__(self, dfs, gemini_api_key):
         self.dfs = dfs
-        model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-        self.llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            temperature=0.2,
-            google_api_key=gemini_api_key
-        )
+        self.llm = get_llm(temperature=0.2, api_key=gemini_api_key)
 
     # ============================================================
     # 🔹 HISTOGRAMAS
     # ============================================================
-    def histograms(self):
+    def histograms(self, datasets=None, columns=None):
         results = []
-        for name, df in self.dfs.items():
-            numeric_cols = df.select_dtypes(include="number").columns
+        selected = []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            numeric_cols = select_columns(numeric_columns(df), columns)
+            if len(numeric_cols) == 0:
+                continue
+            selected.append((name, df, numeric_cols))
+        # Interpretação automática via LLM — um pedido por dataset, em paralelo com os gráficos
+        prompts = []
+        for name, df, numeric_cols in selected:
+            stats = describe_numeric(df, numeric_cols)
+            digest = numeric_digest(stats)
+            prompts.append(log_prompt("VisualizerAgent", name, (
+                f"Você é um analista de dados. Analise os histogramas das variáveis numéricas "
+                f"do dataset '{name}' e descreva brevemente padrões visíveis: assimetrias, "
+                f"dispersões e concentrações. Dados de apoio:\n{digest}"
+            ), digest, lambda: str(stats.to_dict())))
+        replies = submit_prompts(self.llm, prompts)
 
-            # Gráficos locais
+        for (name, df, numeric_cols), reply in zip(selected, replies):
+            # Gráficos locais: bins calculados no servidor, só arestas e contagens na figura
             for col in numeric_cols:
                 try:
-                    fig = px.histogram(df, x=col, title=f"Distribuição de {col} — {name}")
+                    edges, counts = histogram_bins(df, col)
+                    fig = histogram_figure(edges, counts, f"Distribuição de {col} — {name}", col)
                     results.append({
                         "title": f"📈 Distribuição — {col} ({name})",
                         "type": "chart",
@@ -39,20 +61,11 @@ class VisualizerAgent:
                 except Exception:
                     continue
 
-            # Interpretação automática via LLM
-            try:
-                prompt = (
-                    f"Você é um analista de dados. Analise os histogramas das variáveis numéricas "
-                    f"do dataset '{name}' e descreva brevemente padrões visíveis: assimetrias, "
-                    f"dispersões e concentrações. Dados de apoio: {df.describe(include='number').to_dict()}."
-                )
-                commentary = self.llm.invoke(prompt).content
-            except Exception:
-                commentary = (
-                    "Resumo automático indisponível. "
-                    "Sugestão: observe os histogramas para identificar distribuições assimétricas "
-                    "e picos de frequência, que indicam concentração de valores ou outliers."
-                )
+            commentary = StreamedText(reply, fallback=(
+                "Resumo automático indisponível. "
+                "Sugestão: observe os histogramas para identificar distribuições assimétricas "
+                "e picos de frequência, que indicam concentração de valores ou outliers."
+            ))
 
             results.append({
                 "title": f"🧠 Interpretação Automática — {name}",
@@ -65,16 +78,33 @@ class VisualizerAgent:
     # ============================================================
     # 🔹 BOXPLOTS
     # ============================================================
-    def boxplots(self):
+    def boxplots(self, datasets=None, columns=None):
         """Gera boxplots para variáveis numéricas com interpretação automática via LLM."""
         results = []
-        for name, df in self.dfs.items():
-            numeric_cols = df.select_dtypes(include="number").columns
+        selected = []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            numeric_cols = select_columns(numeric_columns(df), columns)
+            if len(numeric_cols) == 0:
+                continue
+            selected.append((name, df, numeric_cols))
+        # Interpretação com LLM prioritário — um pedido por dataset, em paralelo com os gráficos
+        prompts = []
+        for name, df, numeric_cols in selected:
+            stats = describe_numeric(df, numeric_cols)
+            digest = numeric_digest(stats)
+            prompts.append(log_prompt("VisualizerAgent", name, (
+                f"Analise os boxplots das variáveis numéricas do dataset '{name}'. "
+                f"Explique em linguagem natural quais variáveis apresentam maior dispersão, "
+                f"assimetria ou outliers significativos. Use um tom analítico e direto. "
+                f"Dados estatísticos:\n{digest}"
+            ), digest, lambda: str(stats.to_dict())))
+        replies = submit_prompts(self.llm, prompts)
 
-            # Geração dos gráficos
+        for (name, df, numeric_cols), reply in zip(selected, replies):
+            # Geração dos gráficos: quartis e bigodes pré-calculados + amostra dos outliers
             for col in numeric_cols:
                 try:
-                    fig = px.box(df, y=col, title=f"Boxplot de {col} — {name}")
+                    fig = box_figure(box_stats(df, col), f"Boxplot de {col} — {name}", col)
                     results.append({
                         "title": f"📊 Boxplot — {col} ({name})",
                         "type": "chart",
@@ -83,21 +113,11 @@ class VisualizerAgent:
                 except Exception:
                     continue
 
-            # Interpretação com LLM prioritário
-            try:
-                prompt = (
-                    f"Analise os boxplots das variáveis numéricas do dataset '{name}'. "
-                    f"Explique em linguagem natural quais variáveis apresentam maior dispersão, "
-                    f"assimetria ou outliers significativos. Use um tom analítico e direto. "
-                    f"Dados estatísticos: {df.describe(include='number').to_dict()}."
-                )
-                commentary = self.llm.invoke(prompt).content
-            except Exception:
-                commentary = (
-                    "Resumo automático indisponível. "
-                    "Sugestão: observe variáveis com grande dispersão nos boxplots — "
-                    "elas indicam variabilidade alta ou presença de outliers."
-                )
+            commentary = StreamedText(reply, fallback=(
+                "Resumo automático indisponível. "
+                "Sugestão: observe variáveis com grande dispersão nos boxplots — "
+                "elas indicam variabilidade alta ou presença de outliers."
+            ))
 
             results.append({
                 "title": f"🧠 Interpretação Automática — {name}",
@@ -110,15 +130,30 @@ class VisualizerAgent:
     # ============================================================
     # 🔹 GRÁFICOS DE BARRAS
     # ============================================================
-    def barplots(self):
+    def barplots(self, datasets=None, columns=None, top_k=10):
         """Gera gráficos de barras para variáveis categóricas com interpretação automática via LLM."""
         results = []
-        for name, df in self.dfs.items():
-            cat_cols = df.select_dtypes(exclude="number").columns
+        selected = [
+            (name, df, select_columns(categorical_columns(df), columns))
+            for name, df in select_datasets(self.dfs, datasets, columns).items()
+        ]
+        # LLM interpretação — um pedido por dataset, em paralelo com os gráficos
+        prompts = []
+        for name, df, cat_cols in selected:
+            stats = describe_categorical(df, cat_cols)
+            digest = categorical_digest(stats)
+            prompts.append(log_prompt("VisualizerAgent", name, (
+                f"Analise as distribuições categóricas do dataset '{name}'. "
+                f"Identifique categorias dominantes, raras e possíveis desequilíbrios "
+                f"de frequência. Dados de apoio:\n{digest}"
+            ), digest, lambda: str(stats.to_dict())))
+        replies = submit_prompts(self.llm, prompts)
 
+        for (name, df, cat_cols), reply in zip(selected, replies):
             for col in cat_cols:
                 try:
-                    top_cat = df[col].value_counts().reset_index().head(10)
+                    # Top-k com memória limitada (sketch), sem tabela de todas as categorias
+                    top_cat = top_values(df, col, top_k).reset_index()
                     top_cat.columns = [col, "Frequência"]
                     fig = px.bar(top_cat, x=col, y="Frequência", title=f"Top categorias — {col} ({name})")
                     results.append({
@@ -129,20 +164,11 @@ class VisualizerAgent:
                 except Exception:
                     continue
 
-            # LLM interpretação
-            try:
-                prompt = (
-                    f"Analise as distribuições categóricas do dataset '{name}'. "
-                    f"Identifique categorias dominantes, raras e possíveis desequilíbrios "
-                    f"de frequência. Dados de apoio: {df.describe(include='object').to_dict()}."
-                )
-                commentary = self.llm.invoke(prompt).content
-            except Exception:
-                commentary = (
-                    "Resumo automático indisponível. "
-                    "Sugestão: observe categorias dominantes e pouco representadas — "
-                    "elas indicam concentração de registros ou casos raros."
-                )
+            commentary = StreamedText(reply, fallback=(
+                "Resumo automático indisponível. "
+                "Sugestão: observe categorias dominantes e pouco representadas — "
+                "elas indicam concentração de registros ou casos raros."
+            ))
 
             results.append({
                 "title": f"🧠 Interpretação Automática — {name}",
@@ -155,15 +181,32 @@ class VisualizerAgent:
     # ============================================================
     # 🔹 GRÁFICOS DE PIZZA
     # ============================================================
-    def piecharts(self):
+    def piecharts(self, datasets=None, columns=None):
         """Gera gráficos de pizza para variáveis categóricas com poucas categorias (<=6)."""
         results = []
-        for name, df in self.dfs.items():
-            cat_cols = df.select_dtypes(exclude="number").columns
+        selected = [
+            (name, df, select_columns(categorical_columns(df), columns))
+            for name, df in select_datasets(self.dfs, datasets, columns).items()
+        ]
+        # Interpretação automática — um pedido por dataset, em paralelo com os gráficos
+        prompts = []
+        for name, df, cat_cols in selected:
+            stats = describe_categorical(df, cat_cols)
+            digest = categorical_digest(stats)
+            prompts.append(log_prompt("VisualizerAgent", name, (
+                f"Analise os gráficos de pizza do dataset '{name}'. "
+                f"Explique brevemente o equilíbrio entre categorias, e destaque se há predominância "
+                f"de alguma delas. Dados categóricos:\n{digest}"
+            ), digest, lambda: str(stats.to_dict())))
+        replies = submit_prompts(self.llm, prompts)
+
+        for (name, df, cat_cols), reply in zip(selected, replies):
             for col in cat_cols:
                 try:
-                    counts = df[col].value_counts()
-                    if 2 <= len(counts) <= 6:
+                    sk = frequency_sketch(df, col)
+                    # Sketch inexato ⇒ mais categorias do que a capacidade: não cabe numa pizza
+                    counts = sk.top(len(sk))
+                    if sk.exact and 2 <= len(counts) <= 6:
                         fig = px.pie(values=counts.values, names=counts.index,
                                      title=f"Distribuição de {col} ({name})")
                         results.append({
@@ -174,20 +217,11 @@ class VisualizerAgent:
                 except Exception:
                     continue
 
-            # Interpretação automática
-            try:
-                prompt = (
-                    f"Analise os gráficos de pizza do dataset '{name}'. "
-                    f"Explique brevemente o equilíbrio entre categorias, e destaque se há predominância "
-                    f"de alguma delas. Dados categóricos: {df.describe(include='object').to_dict()}."
-                )
-                commentary = self.llm.invoke(prompt).content
-            except Exception:
-                commentary = (
-                    "Resumo automático indisponível. "
-                    "Sugestão: observe gráficos com categorias dominantes — "
-                    "elas podem indicar concentração de casos ou viés de amostragem."
-                )
+            commentary = StreamedText(reply, fallback=(
+                "Resumo automático indisponível. "
+                "Sugestão: observe gráficos com categorias dominantes — "
+                "elas podem indicar concentração de casos ou viés de amostragem."
+            ))
 
             results.append({
                 "title": f"🧠 Interpretação Automática — {name}",
@@ -196,3 +230,129 @@ class VisualizerAgent:
             })
 
         return results
+
+    # ============================================================
+    # 🔹 DISPERSÃO (relação entre pares de variáveis numéricas)
+    # ============================================================
+    def scatterplots(self, datasets=None, columns=None, points=None):
+        """
+        Dispersão das colunas pedidas (a primeira contra as seguintes; uma só
+        coluna faz par com a mais correlacionada) ou, sem colunas, dos pares
+        mais correlacionados. Tabelas grandes usam WebGL e uma amostra de até
+        `points` pontos (EDA_CHART_POINTS por omissão), tirada bloco a bloco.
+        """
+        results, selected = [], []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            all_numeric = list(numeric_columns(df))
+            if len(all_numeric) < 2:
+                continue
+            numeric_cols = list(select_columns(pd.Index(all_numeric), columns))
+            corr = correlation_matrix(df)
+            if len(numeric_cols) == 1:
+                others = corr.reindex(index=all_numeric)[numeric_cols[0]].drop(numeric_cols[0]).abs()
+                numeric_cols.append(others.sort_values(ascending=False, na_position="last").index[0])
+            corr = corr.reindex(index=numeric_cols, columns=numeric_cols)
+            if len(numeric_cols) <= SCATTER_MAX_PAIRS + 1:
+                pairs = [(numeric_cols[0], c) for c in numeric_cols[1:]]
+            else:
+                values = corr.to_numpy(dtype="float64")
+                i, j = np.triu_indices(len(numeric_cols), k=1)
+                order = np.argsort(-np.nan_to_num(np.abs(values[i, j])))[:SCATTER_MAX_PAIRS]
+                pairs = [(numeric_cols[i[o]], numeric_cols[j[o]]) for o in order]
+            selected.append((name, df, pairs, corr))
+
+        # Interpretação automática — um pedido por dataset, em paralelo com os gráficos
+        prompts = []
+        for name, df, pairs, corr in selected:
+            cols = list(dict.fromkeys(c for pair in pairs for c in pair))
+            digest = correlation_digest(corr.loc[cols, cols])
+            prompts.append(log_prompt("VisualizerAgent", name, (
+                f"Você é um analista de dados. Analise os gráficos de dispersão do dataset '{name}' "
+                f"para os pares {', '.join(f'{x} × {y}' for x, y in pairs)}. Descreva brevemente "
+                f"a forma das relações (lineares ou não), grupos e pontos afastados. "
+                f"Dados de apoio:\n{digest}"
+            ), digest))
+        replies = submit_prompts(self.llm, prompts)
+
+        for (name, df, pairs, corr), reply in zip(selected, replies):
+            for x, y in pairs:
+                try:
+                    sample, n = sample_points(df, x, y, points)
+                    fig = scatter_figure(sample["x"], sample["y"], f"{y} × {x} — {name}", x, y, points, rows=n)
+                    results.append({
+                        "title": f"🔵 Dispersão — {y} × {x} ({name})",
+                        "type": "chart",
+                        "content": fig
+                    })
+                except Exception:
+                    continue
+
+            results.append({
+                "title": f"🧠 Interpretação Automática — {name}",
+                "type": "text",
+                "content": StreamedText(reply, fallback=(
+                    "Resumo automático indisponível. "
+                    "Sugestão: nuvens alongadas indicam relação linear; curvas, grupos "
+                    "separados ou pontos isolados merecem uma análise mais detalhada."
+                ))
+            })
+
+        return results
+
+    # ============================================================
+    # 🔹 LINHAS (séries ordenadas)
+    # ============================================================
+    def lineplots(self, datasets=None, columns=None, points=None):
+        """
+        Séries numéricas ao longo de uma coluna de data (a pedida ou a primeira)
+        ou, sem datas, pela ordem das linhas. Cada série é reduzida por LTTB a
+        `points` pontos (EDA_CHART_POINTS por omissão), bloco a bloco em datasets
+        em disco, e usa WebGL em tabelas grandes.
+        """
+        results, selected = [], []
+        for name, df in select_datasets(self.dfs, datasets, columns).items():
+            numeric_cols = list(select_columns(numeric_columns(df), columns))[:LINE_MAX_SERIES]
+            if not numeric_cols:
+                continue
+            dates = pd.Index([c for c, t in df.dtypes.items() if pd.api.types.is_datetime64_any_dtype(t)])
+            x_col = select_columns(dates, columns)[0] if len(dates) else None
+            selected.append((name, df, x_col, numeric_cols))
+
+        # Interpretação automática — um pedido por dataset, em paralelo com os gráficos
+        prompts = []
+        for name, df, x_col, numeric_cols in selected:
+            stats = describe_numeric(df, numeric_cols)
+            digest = numeric_digest(stats)
+            axis = f"ao longo de '{x_col}'" if x_col else "pela ordem das linhas"
+            prompts.append(log_prompt("VisualizerAgent", name, (
+                f"Você é um analista de dados. Analise as séries {', '.join(map(str, numeric_cols))} "
+                f"do dataset '{name}' {axis}. Descreva brevemente tendências, sazonalidades, "
+                f"quebras de nível e picos. Dados de apoio:\n{digest}"
+            ), digest, lambda: str(stats.to_dict())))
+        replies = submit_prompts(self.llm, prompts)
+
+        for (name, df, x_col, numeric_cols), reply in zip(selected, replies):
+            for col in numeric_cols:
+                try:
+                    reduced, n = lttb_points(df, x_col, col, points)
+                    fig = line_figure(reduced["x"], {col: reduced["y"]}, f"{col} — {name}",
+                                      x_col or "linha", points, rows=n)
+                    results.append({
+                        "title": f"📉 Série — {col} ({name})",
+                        "type": "chart",
+                        "content": fig
+                    })
+                except Exception:
+                    continue
+
+            results.append({
+                "title": f"🧠 Interpretação Automática — {name}",
+                "type": "text",
+                "content": StreamedText(reply, fallback=(
+                    "Resumo automático indisponível. "
+                    "Sugestão: procure tendências de longo prazo, padrões que se repetem "
+                    "e picos isolados, que podem indicar eventos ou erros de registo."
+                ))
+            })
+
+        return results
@@ -1,4 +1,5 @@
 import sqlite3
+import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -18,6 +19,17 @@ def init_memory():
             created_at TEXT
         )
         """)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            temperature REAL,
+            response TEXT,
+            created_at REAL,
+            last_used REAL,
+            hits INTEGER DEFAULT 0
+        )
+        """)
         conn.commit()
 
 def save_qa(user, question, answer):
@@ -80,3 +92,44 @@ def get_all_users():
         c = conn.cursor()
         c.execute("SELECT DISTINCT user FROM qa_history ORDER BY user")
         return [row[0] for row in c.fetchall()]
+
+# ===== Cache de respostas do LLM =====
+def cache_get(key, ttl_seconds):
+    """Resposta em cache para a chave, ou None se não existir ou tiver expirado."""
+    now = time.time()
+    with sqlite3.connect(DB_PATH) as conn:
+        c = conn.cursor()
+        c.execute("SELECT response, created_at FROM llm_cache WHERE key=?", (key,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        if now - row[1] > ttl_seconds:
+            c.execute("DELETE FROM llm_cache WHERE key=?", (key,))
+            conn.commit()
+            return None
+        c.execute("UPDATE llm_cache SET last_used=?, hits=hits+1 WHERE key=?", (now, key))
+        conn.commit()
+        return row[0]
+
+def cache_put(key, model, temperature, response, max_entries):
+    """Guarda a resposta e remove as entradas menos usadas acima de max_entries."""
+    now = time.time()
+    with sqlite3.connect(DB_PATH) as conn:
+        c = conn.cursor()
+        c.execute("INSERT OR REPLACE INTO llm_cache(key, model, temperature, response, created_at, last_used, hits) "
+                  "VALUES(?,?,?,?,?,?,0)", (key, model, temperature, response, now, now))
+        c.execute("DELETE FROM llm_cache WHERE key IN ("
+                  "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (max_entries,))
+        conn.commit()
+
+def cache_info():
+    with sqlite3.connect(DB_PATH) as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(LENGTH(response)), 0) FROM llm_cache")
+        entries, hits, size = c.fetchone()
+        return {"entries": entries, "stored_hits": hits, "bytes": size}
+
+def cache_clear():
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
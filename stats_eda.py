@@ -0,0 +1,1037 @@
+import os
+import json
+import weakref
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+
+
+# ================================
+# 🤝 Estatísticas partilhadas entre agentes
+# ================================
+# Dentro de shared_stats(), cada estatística é calculada uma só vez por
+# dataset e argumentos, mesmo quando vários passos de um plano correm em
+# threads diferentes (basta correrem numa cópia do contexto atual).
+_shared_memo = contextvars.ContextVar("shared_stats", default=None)
+
+
+@contextmanager
+def shared_stats():
+    token = _shared_memo.set(({}, threading.Lock()))
+    try:
+        yield
+    finally:
+        _shared_memo.reset(token)
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, pd.Index)):
+        return tuple(value)
+    return value
+
+
+def _shared(fn):
+    @wraps(fn)
+    def wrapper(df, *args, **kwargs):
+        memo = _shared_memo.get()
+        if memo is None:
+            return fn(df, *args, **kwargs)
+        cache, lock = memo
+        key = (fn.__name__, id(df), tuple(_freeze(a) for a in args),
+               tuple(sorted((k, _freeze(v)) for k, v in kwargs.items())))
+        with lock:
+            future = cache.get(key)
+            owner = future is None
+            if owner:
+                future = cache[key] = Future()
+        if owner:
+            # Quem chega primeiro calcula; os outros esperam pelo mesmo resultado
+            try:
+                future.set_result(fn(df, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+    return wrapper
+
+
+class StreamingProfile:
+    """
+    Perfil estatístico calculado numa única passagem, chunk a chunk.
+
+    Por coluna guarda contagens, nulos, mínimo/máximo e média/variância
+    (Welford/Chan). Dois perfis de partes diferentes do mesmo ficheiro podem
+    ser combinados com merge() e o resultado é exato, como se o ficheiro
+    tivesse sido lido de uma vez.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    def _column(self, col, dtype):
+        if col not in self.columns:
+            self.columns[col] = {"dtype": dtype, "count": 0, "nulls": 0,
+                                 "n": 0, "mean": 0.0, "m2": 0.0,
+                                 "min": None, "max": None}
+        return self.columns[col]
+
+    @staticmethod
+    def _combine(st, n_b, mean_b, m2_b, min_b, max_b):
+        """Combina as estatísticas de um bloco (n_b, média, M2) no acumulador (Chan et al.)."""
+        if n_b == 0:
+            return
+        n_a = st["n"]
+        n = n_a + n_b
+        delta = mean_b - st["mean"]
+        st["mean"] += delta * n_b / n
+        st["m2"] += m2_b + delta * delta * n_a * n_b / n
+        st["n"] = n
+        st["min"] = min_b if st["min"] is None else min(st["min"], min_b)
+        st["max"] = max_b if st["max"] is None else max(st["max"], max_b)
+
+    def update(self, chunk: pd.DataFrame):
+        """Atualiza o perfil com um chunk (cálculos vetorizados em NumPy)."""
+        self.rows += len(chunk)
+        nulls = chunk.isna().sum()
+        for col in chunk.columns:
+            st = self._column(col, str(chunk[col].dtype))
+            st["count"] += len(chunk) - int(nulls[col])
+            st["nulls"] += int(nulls[col])
+
+        num = chunk.select_dtypes(include="number")
+        if num.shape[1] == 0:
+            return
+        x = num.to_numpy(dtype="float64", na_value=np.nan)
+        valid = ~np.isnan(x)
+        n_b = valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.nansum(x, axis=0) / n_b
+            m2_b = np.nansum((x - mean_b) ** 2, axis=0)
+        x_min = np.where(valid, x, np.inf).min(axis=0)
+        x_max = np.where(valid, x, -np.inf).max(axis=0)
+        for j, col in enumerate(num.columns):
+            st = self.columns[col]
+            st["dtype"] = str(num[col].dtype)
+            self._combine(st, int(n_b[j]), float(mean_b[j]), float(m2_b[j]),
+                          float(x_min[j]), float(x_max[j]))
+
+    def merge(self, other: "StreamingProfile"):
+        """Junta outro perfil a este (resultado exato)."""
+        self.rows += other.rows
+        for col, ob in other.columns.items():
+            st = self._column(col, ob["dtype"])
+            st["count"] += ob["count"]
+            st["nulls"] += ob["nulls"]
+            if ob["n"]:
+                self._combine(st, ob["n"], ob["mean"], ob["m2"], ob["min"], ob["max"])
+        return self
+
+    @property
+    def numeric_columns(self):
+        return [c for c, st in self.columns.items() if st["n"] > 0]
+
+    def describe(self) -> pd.DataFrame:
+        """Tabela no formato de df.describe(include="all").T (sem quartis)."""
+        rows = {}
+        for col, st in self.columns.items():
+            row = {"count": st["count"], "nulls": st["nulls"], "dtype": st["dtype"]}
+            if st["n"]:
+                row.update({
+                    "mean": st["mean"],
+                    "std": (st["m2"] / (st["n"] - 1)) ** 0.5 if st["n"] > 1 else np.nan,
+                    "min": st["min"],
+                    "max": st["max"],
+                })
+            rows[col] = row
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def summary_lines(self):
+        """Resumo textual curto (para o AdvisorAgent)."""
+        desc = self.describe()
+        lines = [f"{self.rows} linhas, {len(self.columns)} colunas "
+                 f"({len(self.numeric_columns)} numéricas)."]
+        nulls = desc["nulls"][desc["nulls"] > 0]
+        if len(nulls):
+            lines.append("Valores ausentes: " + ", ".join(f"{c}={int(v)}" for c, v in nulls.items()))
+        for col in self.numeric_columns:
+            r = desc.loc[col]
+            lines.append(f"{col}: média={r['mean']:.4g}, desvio={r['std']:.4g}, "
+                         f"mín={r['min']:.4g}, máx={r['max']:.4g}")
+        return lines
+
+    # ---- persistência ----
+    def to_dict(self):
+        return {"rows": self.rows, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, data):
+        prof = cls()
+        prof.rows = data["rows"]
+        prof.columns = data["columns"]
+        return prof
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as fh:
+            return cls.from_dict(json.load(fh))
+
+
+class StreamingCorrelation:
+    """
+    Matriz de correlação de Pearson calculada por chunks a partir de co-momentos.
+
+    Acumula, para cada par de colunas, o nº de linhas com ambos os valores
+    presentes, as somas, as somas de quadrados e os produtos cruzados (centrados
+    num deslocamento fixo, para evitar cancelamento numérico). Usa memória
+    O(colunas²) independentemente do nº de linhas e reproduz a exclusão par a
+    par de nulos de df.corr().
+    """
+
+    def __init__(self):
+        self.columns = []
+        self.shift = np.zeros(0)
+        self.n = np.zeros((0, 0))
+        self.sx = np.zeros((0, 0))
+        self.sxx = np.zeros((0, 0))
+        self.sxy = np.zeros((0, 0))
+
+    def _ensure(self, cols, shift):
+        """Acrescenta colunas novas (com matrizes a zero) mantendo a ordem de chegada."""
+        new = [c for c in cols if c not in self.columns]
+        if not new:
+            return
+        k, m = len(self.columns), len(self.columns) + len(new)
+        for attr in ("n", "sx", "sxx", "sxy"):
+            grown = np.zeros((m, m))
+            grown[:k, :k] = getattr(self, attr)
+            setattr(self, attr, grown)
+        self.shift = np.concatenate([self.shift, [shift[cols.index(c)] for c in new]])
+        self.columns += new
+
+    def _add(self, cols, n, sx, sxx, sxy):
+        idx = np.array([self.columns.index(c) for c in cols])
+        ix = np.ix_(idx, idx)
+        self.n[ix] += n
+        self.sx[ix] += sx
+        self.sxx[ix] += sxx
+        self.sxy[ix] += sxy
+
+    def update(self, chunk: pd.DataFrame):
+        """Atualiza os co-momentos com as colunas numéricas de um chunk."""
+        num = chunk.select_dtypes(include="number")
+        if num.shape[1] == 0:
+            return
+        cols = list(num.columns)
+        x = num.to_numpy(dtype="float64", na_value=np.nan)
+        valid = ~np.isnan(x)
+        with np.errstate(invalid="ignore"):
+            first_mean = np.where(valid.any(axis=0), np.nanmean(np.where(valid, x, np.nan), axis=0), 0.0)
+        self._ensure(cols, np.nan_to_num(first_mean))
+        shift = self.shift[[self.columns.index(c) for c in cols]]
+        m = valid.astype("float64")
+        x0 = np.where(valid, x - shift, 0.0)
+        self._add(cols, m.T @ m, x0.T @ m, (x0 * x0).T @ m, x0.T @ x0)
+
+    def merge(self, other: "StreamingCorrelation"):
+        """Junta outro acumulador (re-centrando os seus momentos no deslocamento deste)."""
+        if not other.columns:
+            return self
+        self._ensure(other.columns, other.shift)
+        d = self.shift[[self.columns.index(c) for c in other.columns]] - other.shift
+        n, sx = other.n, other.sx
+        sx_new = sx - n * d[:, None]
+        sxx_new = other.sxx - 2 * d[:, None] * sx + n * (d ** 2)[:, None]
+        sxy_new = other.sxy - d[None, :] * sx - d[:, None] * sx.T + n * np.outer(d, d)
+        self._add(other.columns, n, sx_new, sxx_new, sxy_new)
+        return self
+
+    def corr(self) -> pd.DataFrame:
+        """Matriz de correlação (equivalente a df.corr(numeric_only=True))."""
+        n = self.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = self.sxy - self.sx * self.sx.T / n
+            var_i = self.sxx - self.sx ** 2 / n
+            var_j = var_i.T
+            r = cov / np.sqrt(var_i * var_j)
+        r[(n < 2) | (var_i <= 0) | (var_j <= 0)] = np.nan
+        r = np.clip(r, -1.0, 1.0)
+        return pd.DataFrame(r, index=self.columns, columns=self.columns)
+
+    # ---- persistência ----
+    def save(self, path):
+        np.savez(path, columns=np.array(self.columns, dtype=object), shift=self.shift,
+                 n=self.n, sx=self.sx, sxx=self.sxx, sxy=self.sxy)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=True)
+        acc = cls()
+        acc.columns = list(data["columns"])
+        for attr in ("shift", "n", "sx", "sxx", "sxy"):
+            setattr(acc, attr, data[attr])
+        return acc
+
+
+@_shared
+def correlation_matrix(df) -> pd.DataFrame:
+    """
+    Correlação de Pearson para DataFrames em memória ou datasets em disco.
+    Datasets em disco usam o acumulador guardado na conversão ou, se não
+    existir, percorrem os chunks sem concatenar.
+    """
+    acc = getattr(df, "correlation", None)
+    if acc is not None:
+        return acc.corr()
+    if hasattr(df, "iter_chunks"):
+        acc = StreamingCorrelation()
+        for chunk in df.iter_chunks(df.select_dtypes(include="number").columns):
+            acc.update(chunk)
+        return acc.corr()
+    return profile_of(df).correlation()
+
+
+# Erro de rank (unilateral, ~99% de confiança) do KLL em função de k, segundo
+# as constantes empíricas publicadas pelo Apache DataSketches
+def kll_rank_error(k):
+    return 2.296 / k ** 0.9723
+
+
+def kll_k_for_error(rank_error):
+    return max(8, int(np.ceil((2.296 / rank_error) ** (1 / 0.9723))))
+
+
+class KLLSketch:
+    """
+    Sketch de quantis KLL: memória O(k) por coluna, atualizado em blocos NumPy
+    e combinável entre chunks. Cada nível guarda itens com peso 2**nível.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        # Compacta o nível mais baixo acima da capacidade enquanto o total
+        # de itens exceder a soma das capacidades
+        while sum(map(len, self.levels)) > sum(self._capacity(h) for h in range(len(self.levels))):
+            h = next(h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            buf = np.sort(self.levels[h])
+            # Nº ímpar de itens: o primeiro fica neste nível
+            odd = len(buf) % 2
+            promoted = buf[odd:][self._rng.integers(2)::2]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            self.levels[h] = buf[:odd]
+
+    def update(self, values):
+        v = np.asarray(values, dtype="float64")
+        v = v[~np.isnan(v)]
+        if v.size == 0:
+            return
+        self.n += v.size
+        self.levels[0] = np.concatenate([self.levels[0], v])
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    @property
+    def exact(self):
+        """Enquanto nada foi compactado, o sketch contém todos os valores."""
+        return all(len(items) == 0 for items in self.levels[1:])
+
+    @property
+    def rank_error(self):
+        return 0.0 if self.exact else kll_rank_error(self.k)
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Quantil(is) aproximado(s); aceita escalar ou lista."""
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        if self.exact:
+            return np.quantile(self.levels[0], q)
+        values, cw = self._weighted()
+        idx = np.searchsorted(cw, np.asarray(q) * cw[-1], side="left")
+        return values[np.minimum(idx, len(values) - 1)]
+
+    def count_outside(self, lower, upper):
+        """Nº estimado de valores < lower e > upper."""
+        if self.n == 0:
+            return 0.0
+        values, cw = self._weighted()
+        below = np.searchsorted(values, lower, side="left")
+        above = np.searchsorted(values, upper, side="right")
+        n_below = cw[below - 1] if below > 0 else 0.0
+        n_above = cw[-1] - (cw[above - 1] if above > 0 else 0.0)
+        return float(n_below + n_above)
+
+    def to_dict(self):
+        return {"k": self.k, "n": self.n, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sk = cls(k=data["k"])
+        sk.n = data["n"]
+        sk.levels = [np.asarray(items, dtype="float64") for items in data["levels"]]
+        return sk
+
+
+class QuantileSketches:
+    """Um KLLSketch por coluna numérica, com erro de rank configurável."""
+
+    def __init__(self, rank_error=0.01):
+        self.k = kll_k_for_error(rank_error)
+        self.sketches = {}
+
+    def update(self, chunk: pd.DataFrame):
+        num = chunk.select_dtypes(include="number")
+        for col in num.columns:
+            if col not in self.sketches:
+                self.sketches[col] = KLLSketch(self.k)
+            self.sketches[col].update(num[col].to_numpy(dtype="float64", na_value=np.nan))
+
+    def merge(self, other: "QuantileSketches"):
+        for col, sk in other.sketches.items():
+            if col in self.sketches:
+                self.sketches[col].merge(sk)
+            else:
+                self.sketches[col] = sk
+        return self
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"k": self.k, "sketches": {c: sk.to_dict() for c, sk in self.sketches.items()}}, fh)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        qs = cls()
+        qs.k = data["k"]
+        qs.sketches = {c: KLLSketch.from_dict(d) for c, d in data["sketches"].items()}
+        return qs
+
+
+def _sketches_for(df):
+    """Sketches guardados no dataset em disco ou calculados percorrendo os chunks."""
+    sketches = getattr(df, "quantiles", None)
+    if sketches is None:
+        sketches = QuantileSketches()
+        for chunk in df.iter_chunks(df.select_dtypes(include="number").columns):
+            sketches.update(chunk)
+    return sketches
+
+
+@_shared
+def iqr_table(df, whisker=1.5, columns=None) -> pd.DataFrame:
+    """
+    Limites IQR e nº de outliers por coluna numérica.
+
+    DataFrames em memória usam quantis exatos; datasets em disco usam sketches
+    KLL numa única passagem e reportam o erro de rank e o erro máximo estimado
+    da contagem de outliers.
+    """
+    if columns is None:
+        columns = numeric_columns(df)
+    rows = {}
+    if hasattr(df, "iter_chunks"):
+        sketches = _sketches_for(df).sketches
+        for col in (c for c in columns if c in sketches):
+            sk = sketches[col]
+            q1, q3 = sk.quantile([0.25, 0.75])
+            iqr = q3 - q1
+            lower, upper = q1 - whisker * iqr, q3 + whisker * iqr
+            rows[col] = {"q1": q1, "q3": q3, "iqr": iqr, "lower": lower, "upper": upper,
+                         "outliers": int(round(sk.count_outside(lower, upper))),
+                         "rank_error": sk.rank_error,
+                         "outliers_error": int(np.ceil(2 * sk.rank_error * sk.n))}
+    else:
+        # Quartis e contagens guardados no perfil do DataFrame
+        rows = profile_of(df).iqr_rows(list(columns), whisker)
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+@_shared
+def describe_numeric(df, columns=None) -> pd.DataFrame:
+    """
+    Equivalente a df.describe(include="number"), opcionalmente só para
+    `columns`. Datasets em disco usam o perfil e os sketches acumulados
+    (quartis aproximados), sem reler os dados.
+    """
+    if columns is None:
+        columns = numeric_columns(df)
+    columns = list(columns)
+    profile = getattr(df, "profile", None)
+    if profile is None:
+        if hasattr(df, "to_pandas"):
+            return df.to_pandas(columns).describe(include="number")
+        return profile_of(df).describe_numeric(columns)
+    numeric = [c for c in profile.numeric_columns if c in columns]
+    # reindex: sem colunas numéricas devolve as 8 linhas do describe sem colunas
+    desc = profile.describe().reindex(index=numeric, columns=["count", "mean", "std", "min", "max"])
+    sketches = _sketches_for(df).sketches
+    for label, q in (("25%", 0.25), ("50%", 0.5), ("75%", 0.75)):
+        desc[label] = [sketches[c].quantile(q) if c in sketches else np.nan for c in desc.index]
+    return desc[["count", "mean", "std", "min", "25%", "50%", "75%", "max"]].astype("float64").T
+
+
+# ================================
+# 🎯 Outliers IQR em várias colunas de uma vez
+# ================================
+# Em vez de um ciclo por coluna (dois quantile() e um filtro cada), as cercas
+# de todas as colunas são comparadas com o bloco numérico inteiro: uma matriz
+# booleana linhas × colunas, processada em blocos de OUTLIER_CHUNK_ROWS linhas
+# para limitar a memória. Dá a contagem por coluna, as linhas com outliers e
+# um score por linha.
+OUTLIER_CHUNK_ROWS = 100_000
+
+
+def iqr_fences(q1, q3, whisker=1.5):
+    """IQR e cercas inferior/superior (escalares ou arrays, por coluna)."""
+    iqr = q3 - q1
+    return iqr, q1 - whisker * iqr, q3 + whisker * iqr
+
+
+def scan_outliers(chunks, columns, lower, upper, iqr, with_rows=True):
+    """
+    Uma passagem vetorizada pelos blocos de linhas. Devolve (contagens por
+    coluna, posições das linhas com outliers, nº de colunas fora das cercas e
+    score dessas linhas). O score soma a distância à cerca em unidades de IQR
+    (nas colunas com IQR 0 cada valor fora conta 1).
+    """
+    columns = list(columns)
+    lower, upper, iqr = (np.asarray(a, dtype="float64") for a in (lower, upper, iqr))
+    counts = np.zeros(len(columns), dtype="int64")
+    positions, flags, scores = [], [], []
+    offset = 0
+    for chunk in chunks:
+        values = chunk[columns].to_numpy(dtype="float64", na_value=np.nan)
+        excess = np.fmax(lower - values, values - upper)  # > 0 fora das cercas, NaN ignorado
+        mask = excess > 0
+        counts += mask.sum(axis=0)
+        if with_rows:
+            hit = np.flatnonzero(mask.any(axis=1))
+            if len(hit):
+                sub = mask[hit]
+                spread = np.divide(excess[hit], iqr, out=sub.astype("float64"), where=iqr > 0)
+                positions.append(hit + offset)
+                flags.append(sub.sum(axis=1))
+                scores.append(np.where(sub, spread, 0.0).sum(axis=1))
+        offset += len(values)
+    join = lambda parts, dtype: np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    return counts, join(positions, "int64"), join(flags, "int64"), join(scores, "float64")
+
+
+class OutlierScan:
+    """
+    Resultado de outlier_scan(): `table` (como iqr_table), `rows` (linhas com
+    pelo menos um outlier, índice original, colunas n_outliers e score, por
+    score decrescente) e a lista de colunas analisadas.
+    """
+
+    def __init__(self, table, rows, columns):
+        self.table = table
+        self.rows = rows
+        self.columns = list(columns)
+
+    @property
+    def scores(self) -> pd.Series:
+        return self.rows["score"]
+
+    def to_csv(self) -> bytes:
+        return self.rows.to_csv(index_label="linha").encode("utf-8")
+
+
+def _scan_rows(index, positions=(), flags=(), scores=()) -> pd.DataFrame:
+    positions = np.asarray(positions, dtype="int64")
+    rows = pd.DataFrame({"n_outliers": flags, "score": scores}, index=index[positions])
+    return rows.sort_values("score", ascending=False, kind="stable")
+
+
+@_shared
+def outlier_scan(df, whisker=1.5, columns=None) -> OutlierScan:
+    """
+    Contagens IQR por coluna, linhas com outliers e score por linha numa só
+    passagem vetorizada. DataFrames em memória usam quartis exatos (guardados
+    no perfil); datasets em disco usam os sketches KLL e numeram as linhas
+    pela ordem dos chunks.
+    """
+    if columns is None:
+        columns = numeric_columns(df)
+    if not hasattr(df, "iter_chunks"):
+        return profile_of(df).outlier_scan(list(columns), whisker)
+    table = iqr_table(df, whisker, columns)
+    cols = list(table.index)
+    if not cols:
+        return OutlierScan(table, _scan_rows(pd.RangeIndex(len(df))), cols)
+    counts, positions, flags, scores = scan_outliers(
+        df.iter_chunks(cols), cols, table["lower"], table["upper"], table["iqr"])
+    # A passagem dá a contagem exata para as cercas (aproximadas) dos sketches
+    table = table.assign(outliers=counts)
+    rows = _scan_rows(pd.RangeIndex(len(df)), positions, flags, scores)
+    return OutlierScan(table, rows, cols)
+
+
+# ================================
+# 📶 Histogramas calculados no servidor
+# ================================
+# Só as arestas e contagens dos bins vão para o gráfico, nunca a coluna
+# inteira. Regras: "fd" (Freedman–Diaconis, largura 2·IQR·n^(-1/3), robusta
+# a caudas) ou "sturges" (log2(n) + 1 bins); o nº de bins é limitado a
+# HIST_MAX_BINS e colunas inteiras com poucos valores têm um bin por valor.
+HIST_RULE = os.getenv("EDA_HIST_RULE", "fd")
+HIST_MAX_BINS = int(os.getenv("EDA_HIST_MAX_BINS", "200"))
+
+
+def bin_edges(n, lo, hi, q1, q3, rule=None, integer=False) -> np.ndarray:
+    """Arestas dos bins a partir de n, mínimo, máximo e quartis (sem reler os dados)."""
+    rule = rule or HIST_RULE
+    if n == 0 or not (np.isfinite(lo) and np.isfinite(hi)):
+        return np.array([0.0, 1.0])
+    if hi <= lo:
+        return np.array([lo - 0.5, lo + 0.5])
+    sturges = int(np.ceil(np.log2(n))) + 1
+    width = 2 * (q3 - q1) * n ** (-1 / 3) if rule == "fd" else 0
+    bins = int(np.ceil((hi - lo) / width)) if width > 0 else sturges
+    bins = max(1, min(bins, HIST_MAX_BINS))
+    if integer and hi - lo + 1 <= bins:
+        return np.arange(lo - 0.5, hi + 1.5)
+    return np.linspace(lo, hi, bins + 1)
+
+
+@_shared
+def histogram_bins(df, col, rule=None):
+    """
+    (arestas, contagens) do histograma de uma coluna numérica. DataFrames em
+    memória usam NumPy sobre a coluna (guardado no perfil); datasets em disco
+    usam mínimo/máximo do perfil e quartis dos sketches, contando por chunks.
+    """
+    rule = rule or HIST_RULE
+    if not hasattr(df, "iter_chunks"):
+        return profile_of(df).histogram(col, rule)
+    desc = describe_numeric(df, [col])[col]
+    integer = pd.api.types.is_integer_dtype(df.dtypes[col])
+    edges = bin_edges(int(desc["count"]), desc["min"], desc["max"], desc["25%"], desc["75%"], rule, integer)
+    counts = np.zeros(len(edges) - 1, dtype="int64")
+    for chunk in df.iter_chunks([col]):
+        values = chunk[col].to_numpy(dtype="float64", na_value=np.nan)
+        counts += np.histogram(values[np.isfinite(values)], edges)[0]
+    return edges, counts
+
+
+# ================================
+# 📦 Boxplots a partir de estatísticas
+# ================================
+# Quartis, mediana e bigodes (Tukey: valores extremos dentro das cercas)
+# calculados no servidor; dos outliers vai para o gráfico só uma amostra
+# uniforme de até BOX_MAX_OUTLIERS pontos, por isso o tamanho da figura não
+# depende do nº de linhas.
+BOX_MAX_OUTLIERS = int(os.getenv("EDA_BOX_MAX_OUTLIERS", "500"))
+
+
+def box_from_chunks(chunks, q1, median, q3, whisker=1.5, max_points=None, seed=0) -> dict:
+    """
+    Uma passagem pelos blocos (arrays float64): bigodes, média, nº de outliers
+    e amostra uniforme sem reposição dos outliers (fica com os `max_points` de
+    menor chave aleatória, o que dá o mesmo resultado em memória e por chunks).
+    """
+    max_points = BOX_MAX_OUTLIERS if max_points is None else max_points
+    iqr, lower, upper = iqr_fences(q1, q3, whisker)
+    rng = np.random.default_rng(seed)
+    low = high = np.nan
+    n = n_out = 0
+    total = 0.0
+    keys, points = np.empty(0), np.empty(0)
+    for values in chunks:
+        values = values[~np.isnan(values)]
+        inside = (values >= lower) & (values <= upper)
+        if inside.any():
+            low, high = np.fmin(low, values[inside].min()), np.fmax(high, values[inside].max())
+        out = values[~inside]
+        n, n_out, total = n + len(values), n_out + len(out), total + values.sum()
+        if len(out):
+            keys, points = np.concatenate([keys, rng.random(len(out))]), np.concatenate([points, out])
+            if len(keys) > max_points:
+                keep = np.argpartition(keys, max_points - 1)[:max_points] if max_points else []
+                keys, points = keys[keep], points[keep]
+    return {"n": n, "mean": total / n if n else np.nan, "q1": q1, "median": median, "q3": q3,
+            "lowerfence": low, "upperfence": high, "outliers": n_out, "points": np.sort(points)}
+
+
+@_shared
+def box_stats(df, col, whisker=1.5) -> dict:
+    """
+    Estatísticas de um boxplot de uma coluna numérica. Em memória usa os
+    quartis exatos do perfil; em disco os quartis dos sketches e uma passagem
+    pelos chunks para os bigodes e a amostra de outliers.
+    """
+    if not hasattr(df, "iter_chunks"):
+        return profile_of(df).box(col, whisker)
+    desc = describe_numeric(df, [col])[col]
+    chunks = (chunk[col].to_numpy(dtype="float64", na_value=np.nan) for chunk in df.iter_chunks([col]))
+    return box_from_chunks(chunks, desc["25%"], desc["50%"], desc["75%"], whisker)
+
+# Linhas por bloco ao contar frequências de colunas em memória e nº de
+# contadores mantidos por coluna pelo sketch de top-k
+FREQ_CHUNK_ROWS = 100_000
+TOPK_CAPACITY = 1000
+
+
+class TopKSketch:
+    """
+    Sketch SpaceSaving (versão combinável) para as categorias mais frequentes.
+
+    Guarda no máximo `capacity` contadores. As contagens são limites
+    superiores, com erro por item em `errors`. Itens fora do sketch têm
+    frequência ≤ `floor`. Enquanto nada foi descartado (floor == 0), o
+    resultado é exato.
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.n = 0
+        self.floor = 0
+        self.counts = pd.Series(dtype="int64")
+        self.errors = pd.Series(dtype="int64")
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def exact(self):
+        return self.floor == 0
+
+    def _combine(self, counts, errors, floor, n):
+        idx = self.counts.index.union(counts.index, sort=False)
+        total = self.counts.reindex(idx).fillna(self.floor) + counts.reindex(idx).fillna(floor)
+        err = self.errors.reindex(idx).fillna(self.floor) + errors.reindex(idx).fillna(floor)
+        total = total.sort_values(ascending=False, kind="stable")
+        dropped = total.iloc[self.capacity:]
+        self.floor = max(self.floor + floor, int(dropped.max()) if len(dropped) else 0)
+        self.counts = total.iloc[:self.capacity].astype("int64")
+        self.errors = err.reindex(self.counts.index).astype("int64")
+        self.n += n
+
+    def update(self, values: pd.Series):
+        """Atualiza com um bloco de valores (contagem vetorizada só do bloco)."""
+        vc = values.value_counts()
+        vc = vc[vc > 0]  # category: value_counts inclui categorias sem ocorrências
+        vc.index = vc.index.astype(object)
+        self._combine(vc, pd.Series(0, index=vc.index, dtype="int64"), 0, int(vc.sum()))
+
+    def merge(self, other: "TopKSketch"):
+        self._combine(other.counts, other.errors, other.floor, other.n)
+        return self
+
+    def top(self, k=10) -> pd.Series:
+        """As k categorias mais frequentes, no formato de value_counts().head(k)."""
+        return self.counts.head(k).rename("count")
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "n": self.n, "floor": self.floor,
+                "values": [str(v) for v in self.counts.index],
+                "counts": self.counts.tolist(), "errors": self.errors.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sk = cls(data["capacity"])
+        sk.n, sk.floor = data["n"], data["floor"]
+        idx = pd.Index(data["values"], dtype=object)
+        sk.counts = pd.Series(data["counts"], index=idx, dtype="int64")
+        sk.errors = pd.Series(data["errors"], index=idx, dtype="int64")
+        return sk
+
+
+class FrequencySketches:
+    """Um TopKSketch por coluna não numérica."""
+
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.sketches = {}
+
+    def update(self, chunk: pd.DataFrame):
+        for col in chunk.select_dtypes(exclude="number").columns:
+            if col not in self.sketches:
+                self.sketches[col] = TopKSketch(self.capacity)
+            self.sketches[col].update(chunk[col])
+
+    def merge(self, other: "FrequencySketches"):
+        for col, sk in other.sketches.items():
+            if col in self.sketches:
+                self.sketches[col].merge(sk)
+            else:
+                self.sketches[col] = sk
+        return self
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"capacity": self.capacity,
+                       "sketches": {c: sk.to_dict() for c, sk in self.sketches.items()}}, fh)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        fs = cls(data["capacity"])
+        fs.sketches = {c: TopKSketch.from_dict(d) for c, d in data["sketches"].items()}
+        return fs
+
+
+@_shared
+def frequency_sketch(df, col) -> TopKSketch:
+    """
+    TopKSketch de uma coluna: guardado no dataset em disco, calculado por
+    chunks do dataset em disco ou por blocos de FREQ_CHUNK_ROWS em memória.
+    """
+    stored = getattr(df, "frequencies", None)
+    if stored is not None and col in stored.sketches:
+        return stored.sketches[col]
+    if hasattr(df, "iter_chunks"):
+        sk = TopKSketch()
+        for chunk in df.iter_chunks([col]):
+            sk.update(chunk[col])
+        return sk
+
+    def build():
+        sk, s = TopKSketch(), df[col]
+        for start in range(0, len(s), FREQ_CHUNK_ROWS):
+            sk.update(s.iloc[start:start + FREQ_CHUNK_ROWS])
+        return sk
+    return profile_of(df).frequency_sketch(col, build)
+
+
+def top_values(df, col, k=10) -> pd.Series:
+    """Equivalente a df[col].value_counts().head(k) com memória limitada."""
+    return frequency_sketch(df, col).top(k).rename_axis(col)
+
+
+@_shared
+def describe_categorical(df, columns=None) -> pd.DataFrame:
+    """
+    Equivalente a df.describe(include=["object", "category"]) calculado com
+    sketches de top-k. Se o sketch descartou categorias, `unique` mostra
+    apenas o limite inferior (ex.: "> 1000").
+    """
+    if columns is None:
+        columns = categorical_columns(df)
+    rows = {}
+    for col in columns:
+        sk = frequency_sketch(df, col)
+        top = sk.top(1)
+        rows[col] = {
+            "count": sk.n,
+            "unique": len(sk) if sk.exact else f"> {sk.capacity}",
+            "top": top.index[0] if len(top) else None,
+            # Limite inferior garantido (igual à contagem exata se nada foi descartado)
+            "freq": int(top.iloc[0] - sk.errors.iloc[0]) if len(top) else None,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index").T
+
+
+# ================================
+# 🗂️ Perfil reutilizável por DataFrame em memória
+# ================================
+class DatasetProfile:
+    """
+    Estatísticas de um DataFrame em memória, preenchidas coluna a coluna
+    quando são pedidas pela primeira vez e reutilizadas nas perguntas
+    seguintes: partição por tipo, describe, quartis, nulos, contagens de
+    outliers, histogramas, boxplots, correlações e sketches de frequência.
+    Fica associado à impressão digital do DataFrame (formato, colunas e
+    tipos); se esta mudar, o perfil é recriado.
+    """
+
+    def __init__(self, df, fingerprint):
+        self.fingerprint = fingerprint
+        self._df = weakref.ref(df)
+        self.numeric_columns = df.select_dtypes(include="number").columns
+        self.other_columns = df.columns.difference(self.numeric_columns, sort=False)
+        self._numeric = {}    # coluna → describe(include="number")
+        self._summary = {}    # coluna → describe(include="all") + nulos
+        self._quartiles = {}  # coluna → (q1, q3)
+        self._outliers = {}   # (coluna, whisker) → nº de outliers
+        self._scans = {}      # (colunas, whisker) → OutlierScan
+        self._histograms = {} # (coluna, regra) → (arestas, contagens)
+        self._boxes = {}      # (coluna, whisker) → estatísticas do boxplot
+        self._sketches = {}   # coluna → TopKSketch
+        self._corr = None
+        self._lock = threading.RLock()
+
+    @property
+    def df(self):
+        return self._df()
+
+    def _fill(self, store, columns, compute):
+        """Calcula de uma vez só as colunas que ainda faltam em `store`."""
+        with self._lock:
+            missing = [c for c in columns if c not in store]
+            if missing:
+                store.update(compute(missing))
+            return [store[c] for c in columns]
+
+    def describe_numeric(self, columns) -> pd.DataFrame:
+        columns = [c for c in columns if c in self.numeric_columns]
+        stats = self._fill(self._numeric, columns,
+                           lambda cols: dict(self.df[cols].describe(include="number").items()))
+        return pd.DataFrame(dict(zip(columns, stats)), index=["count", "mean", "std", "min",
+                                                              "25%", "50%", "75%", "max"])
+
+    def summary(self, columns) -> pd.DataFrame:
+        def compute(cols):
+            desc = self.df[cols].describe(include="all").T
+            desc["nulls"] = self.df[cols].isna().sum()
+            return {c: row for c, row in desc.iterrows()}
+        table = pd.DataFrame(self._fill(self._summary, list(columns), compute))
+        order = ["count", "unique", "top", "freq", "mean", "std", "min", "25%", "50%", "75%", "max"]
+        return table[[c for c in order if c in table] + [c for c in table if c not in order]]
+
+    def quartiles(self, columns) -> dict:
+        def compute(cols):
+            # Reaproveita os quartis de um describe já feito; o resto num só quantile()
+            known = {c: (self._numeric[c]["25%"], self._numeric[c]["75%"])
+                     for c in cols if c in self._numeric}
+            rest = [c for c in cols if c not in known]
+            if rest:
+                q = self.df[rest].quantile([0.25, 0.75])
+                known.update({c: (q.at[0.25, c], q.at[0.75, c]) for c in rest})
+            return known
+        columns = [c for c in columns if c in self.numeric_columns]
+        return dict(zip(columns, self._fill(self._quartiles, columns, compute)))
+
+    def _chunks(self, columns):
+        df = self.df
+        for start in range(0, len(df), OUTLIER_CHUNK_ROWS):
+            yield df.iloc[start:start + OUTLIER_CHUNK_ROWS][columns]
+
+    def _fences(self, columns, whisker):
+        quartiles = self.quartiles(columns)
+        cols = list(quartiles)
+        q1, q3 = (np.array([quartiles[c][i] for c in cols], dtype="float64") for i in (0, 1))
+        return (cols, q1, q3) + iqr_fences(q1, q3, whisker)
+
+    def iqr_rows(self, columns, whisker) -> dict:
+        cols, q1, q3, iqr, lower, upper = self._fences(columns, whisker)
+        with self._lock:
+            missing = [i for i, c in enumerate(cols) if (c, whisker) not in self._outliers]
+            if missing:
+                # Só as contagens: uma passagem vetorizada pelas colunas em falta
+                names = [cols[i] for i in missing]
+                counts = scan_outliers(self._chunks(names), names, lower[missing], upper[missing],
+                                       iqr[missing], with_rows=False)[0]
+                self._outliers.update({(c, whisker): int(n) for c, n in zip(names, counts)})
+            return {c: {"q1": q1[i], "q3": q3[i], "iqr": iqr[i], "lower": lower[i], "upper": upper[i],
+                        "outliers": self._outliers[(c, whisker)], "rank_error": 0.0, "outliers_error": 0}
+                    for i, c in enumerate(cols)}
+
+    def outlier_scan(self, columns, whisker) -> "OutlierScan":
+        cols, _, _, iqr, lower, upper = self._fences(columns, whisker)
+        key = (tuple(cols), whisker)
+        with self._lock:
+            if key not in self._scans:
+                counts, positions, flags, scores = scan_outliers(self._chunks(cols), cols, lower, upper, iqr)
+                self._outliers.update({(c, whisker): int(n) for c, n in zip(cols, counts)})
+                table = pd.DataFrame.from_dict(self.iqr_rows(cols, whisker), orient="index")
+                rows = _scan_rows(self.df.index, positions, flags, scores)
+                self._scans[key] = OutlierScan(table, rows, cols)
+            return self._scans[key]
+
+    def histogram(self, col, rule):
+        def compute(keys):
+            values = self.df[col].to_numpy(dtype="float64", na_value=np.nan)
+            values = values[np.isfinite(values)]
+            if len(values):
+                lo, hi = values.min(), values.max()
+                q1, q3 = self.quartiles([col])[col]
+            else:
+                lo = hi = q1 = q3 = np.nan
+            integer = pd.api.types.is_integer_dtype(self.df[col].dtype)
+            edges = bin_edges(len(values), lo, hi, q1, q3, rule, integer)
+            return {keys[0]: (edges, np.histogram(values, edges)[0])}
+        return self._fill(self._histograms, [(col, rule)], compute)[0]
+
+    def box(self, col, whisker):
+        def compute(keys):
+            q1, q3 = self.quartiles([col])[col]
+            median = self._numeric[col]["50%"] if col in self._numeric else self.df[col].median()
+            values = self.df[col].to_numpy(dtype="float64", na_value=np.nan)
+            return {keys[0]: box_from_chunks([values], q1, median, q3, whisker)}
+        return self._fill(self._boxes, [(col, whisker)], compute)[0]
+
+    def correlation(self) -> pd.DataFrame:
+        with self._lock:
+            if self._corr is None:
+                self._corr = self.df.corr(numeric_only=True)
+            return self._corr
+
+    def frequency_sketch(self, col, build):
+        return self._fill(self._sketches, [col], lambda cols: {cols[0]: build()})[0]
+
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def profile_of(df):
+    """
+    DatasetProfile partilhado de um DataFrame em memória (None para datasets
+    em disco, que já guardam as suas estatísticas na conversão).
+    """
+    if not isinstance(df, pd.DataFrame):
+        return None
+    fingerprint = (df.shape, tuple(df.columns), tuple(str(t) for t in df.dtypes))
+    key = id(df)
+    with _profiles_lock:
+        profile = _profiles.get(key)
+        if profile is None or profile.df is not df or profile.fingerprint != fingerprint:
+            profile = _profiles[key] = DatasetProfile(df, fingerprint)
+            weakref.finalize(df, _profiles.pop, key, None)
+        return profile
+
+
+def numeric_columns(df) -> pd.Index:
+    profile = profile_of(df)
+    return profile.numeric_columns if profile else df.select_dtypes(include="number").columns
+
+
+def categorical_columns(df) -> pd.Index:
+    profile = profile_of(df)
+    return profile.other_columns if profile else df.select_dtypes(exclude="number").columns
+
+
+def describe_all(df, columns=None) -> pd.DataFrame:
+    """describe(include="all").T com a contagem de nulos, reutilizando o perfil do DataFrame."""
+    columns = df.columns if columns is None else columns
+    profile = profile_of(df)
+    if profile is None:
+        frame = df.to_pandas(list(columns)) if hasattr(df, "to_pandas") else df[list(columns)]
+        desc = frame.describe(include="all").T
+        desc["nulls"] = frame.isna().sum()
+        return desc
+    return profile.summary(columns)
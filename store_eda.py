@@ -0,0 +1,275 @@
+import os, re, glob, uuid, shutil, weakref
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from utils_eda import SNIFF_BYTES, sniff_csv
+from stats_eda import StreamingProfile, StreamingCorrelation, QuantileSketches, FrequencySketches
+
+STORE_DIR = os.path.expanduser(os.getenv("EDA_STORE_DIR", "~/.eda_store"))
+STORE_MAX_BYTES = int(float(os.getenv("EDA_STORE_MAX_MB", "20480")) * 1024 * 1024)
+
+# Datasets abertos neste processo (pasta -> DiskDataset): nunca são removidos por evict_store
+_live = weakref.WeakValueDictionary()
+
+
+class DiskDataset:
+    """
+    Dataset guardado em disco como uma série de ficheiros Arrow IPC sem
+    compressão (um por chunk). As leituras usam memory-map e carregam apenas
+    as colunas pedidas, por isso o dataset não fica inteiro em RAM.
+    """
+
+    def __init__(self, path, name=None, owned=False):
+        """
+        :param owned: a pasta pertence a este objeto (criada por build_store)
+                      e é apagada quando ele deixa de ser usado
+        """
+        self.path = path
+        self.name = name or os.path.basename(path.rstrip(os.sep))
+        _live[os.path.abspath(path)] = self
+        if owned:
+            weakref.finalize(self, shutil.rmtree, path, True)
+        self.parts = sorted(glob.glob(os.path.join(path, "part-*.arrow")))
+        schemas, self.part_rows = [], []
+        for part in self.parts:
+            with pa.memory_map(part) as source:
+                reader = ipc.open_file(source)
+                schemas.append(reader.schema)
+                self.part_rows.append(sum(reader.get_batch(i).num_rows
+                                          for i in range(reader.num_record_batches)))
+        # Tipos podem variar entre chunks (ex.: int num chunk, float noutro)
+        self.schema = pa.unify_schemas(schemas, promote_options="permissive") if schemas else pa.schema([])
+        self._empty = self.schema.empty_table().to_pandas()
+        self._profile = None
+        self._correlation = None
+        self._quantiles = None
+        self._frequencies = None
+
+    @property
+    def profile(self):
+        """Perfil estatístico calculado durante a conversão (None se inexistente)."""
+        profile_path = os.path.join(self.path, "profile.json")
+        if self._profile is None and os.path.exists(profile_path):
+            self._profile = StreamingProfile.load(profile_path)
+        return self._profile
+
+    @property
+    def correlation(self):
+        """Co-momentos para a matriz de correlação, acumulados na conversão."""
+        corr_path = os.path.join(self.path, "correlation.npz")
+        if self._correlation is None and os.path.exists(corr_path):
+            self._correlation = StreamingCorrelation.load(corr_path)
+        return self._correlation
+
+    @property
+    def quantiles(self):
+        """Sketches KLL por coluna numérica, acumulados na conversão."""
+        q_path = os.path.join(self.path, "quantiles.json")
+        if self._quantiles is None and os.path.exists(q_path):
+            self._quantiles = QuantileSketches.load(q_path)
+        return self._quantiles
+
+    @property
+    def frequencies(self):
+        """Sketches de top-k por coluna não numérica, acumulados na conversão."""
+        f_path = os.path.join(self.path, "frequencies.json")
+        if self._frequencies is None and os.path.exists(f_path):
+            self._frequencies = FrequencySketches.load(f_path)
+        return self._frequencies
+
+    # ---- superfície compatível com DataFrame (só metadados) ----
+    @property
+    def columns(self):
+        return self._empty.columns
+
+    @property
+    def dtypes(self):
+        return self._empty.dtypes
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def __len__(self):
+        return sum(self.part_rows)
+
+    def select_dtypes(self, include=None, exclude=None):
+        """Seleção de colunas por tipo, sem ler dados (devolve um DataFrame vazio)."""
+        return self._empty.select_dtypes(include=include, exclude=exclude)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.to_pandas([key])[key]
+        return self.to_pandas(list(key))
+
+    # ---- leitura ----
+    def _read_part(self, part, columns=None):
+        with pa.memory_map(part) as source:
+            table = ipc.open_file(source).read_all()
+        # Seleciona antes de converter: só as colunas pedidas são lidas do memory-map
+        if columns is not None:
+            table = table.select(list(columns))
+        target = pa.schema([self.schema.field(c) for c in table.column_names])
+        if not table.schema.equals(target):
+            table = table.cast(target)
+        return table.to_pandas()
+
+    def iter_chunks(self, columns=None):
+        """Percorre o dataset chunk a chunk (cada chunk é um DataFrame pequeno)."""
+        for part in self.parts:
+            yield self._read_part(part, columns)
+
+    def to_pandas(self, columns=None):
+        """Materializa apenas as colunas pedidas (todas, se columns=None)."""
+        chunks = list(self.iter_chunks(columns))
+        if not chunks:
+            return self._empty if columns is None else self._empty[list(columns)]
+        return pd.concat(chunks, ignore_index=True)
+
+    def head(self, n=5):
+        return next(self.iter_chunks(), self._empty).head(n)
+
+    def __repr__(self):
+        return f"DiskDataset({self.name!r}, rows={len(self)}, cols={len(self.columns)})"
+
+
+def as_dataframe(df, columns=None):
+    """
+    Devolve um DataFrame para cálculo: DataFrames em memória passam sem cópia;
+    DiskDatasets carregam apenas as colunas indicadas.
+    """
+    if isinstance(df, DiskDataset):
+        return df.to_pandas(None if columns is None else list(columns))
+    return df
+
+
+def _dir_size(path):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+def evict_store(max_bytes=STORE_MAX_BYTES):
+    """
+    Remove as pastas de STORE_DIR menos recentes até caberem em max_bytes
+    (sobras de sessões que terminaram sem apagar a sua). As pastas de
+    datasets abertos neste processo nunca são removidas.
+    """
+    if not os.path.isdir(STORE_DIR):
+        return
+    entries = []
+    for e in os.scandir(STORE_DIR):
+        if e.is_dir() and os.path.abspath(e.path) not in _live:
+            entries.append((e.stat().st_mtime, _dir_size(e.path), e.path))
+    total = sum(size for _, size, _ in entries)
+    total += sum(_dir_size(path) for path in list(_live.keys()) if os.path.isdir(path))
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def _widen(pinned, found):
+    """Tipo comum quando uma coluna muda de tipo entre chunks (numérico -> float64, resto -> texto)."""
+    if pa.types.is_null(pinned):
+        return found
+    if pa.types.is_null(found):
+        return pinned
+    numeric = (pa.types.is_integer, pa.types.is_floating, pa.types.is_boolean)
+    if any(f(pinned) for f in numeric) and any(f(found) for f in numeric):
+        return pa.float64()
+    return pa.large_string()
+
+
+def _to_schema(table, schema):
+    """
+    Converte a tabela de um chunk para os tipos fixados em `schema` (o do 1º
+    chunk). Se uma coluna não couber no tipo fixado (ex.: códigos numéricos que
+    passam a ter letras), alarga o tipo. Devolve (tabela, schema, alargou).
+    """
+    if schema is None:
+        return table, table.schema, False
+    fields, arrays, widened = [], [], False
+    for field, column in zip(schema, table.columns):
+        if column.type != field.type:
+            try:
+                column = column.cast(field.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                field = field.with_type(_widen(field.type, column.type))
+                column = column.cast(field.type)
+                widened = True
+        fields.append(field)
+        arrays.append(column)
+    schema = pa.schema(fields)
+    return pa.Table.from_arrays(arrays, schema=schema), schema, widened
+
+
+def _write_part(path, table):
+    with pa.OSFile(path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def build_store(csv_path, name, chunksize=50_000, on_chunk=None):
+    """
+    Converte um CSV em DiskDataset lendo-o por chunks (sem o carregar inteiro).
+    Na mesma passagem calcula um StreamingProfile, os co-momentos da
+    correlação e sketches de quantis e de frequências, guardados junto do dataset.
+
+    O schema é fixado pelo 1º chunk e os seguintes são convertidos para ele;
+    se um tipo mudar a meio do ficheiro, a coluna é alargada (float64 ou texto),
+    as partes já escritas são reescritas e os acumuladores recalculados, para
+    que partes e estatísticas vejam sempre o mesmo tipo.
+
+    :param csv_path: caminho do CSV
+    :param name: nome do dataset
+    :param chunksize: nº de linhas por chunk / ficheiro Arrow
+    :param on_chunk: callback opcional (nº do chunk, linhas acumuladas, DataFrame do chunk)
+    :return: DiskDataset
+    """
+    # Uma pasta por carregamento: outra sessão com o mesmo ficheiro pode estar
+    # a ler as partes da sua pasta sob demanda. A pasta é apagada quando o
+    # DiskDataset deixa de ser usado; sobras de processos antigos saem por LRU
+    evict_store()
+    safe = re.sub(r"[^\w.-]", "_", name) or "dataset"
+    path = os.path.join(STORE_DIR, f"{safe}-{uuid.uuid4().hex[:12]}")
+    os.makedirs(path)
+
+    with open(csv_path, "rb") as fh:
+        opts = sniff_csv(fh.read(SNIFF_BYTES))
+
+    def accumulators():
+        return StreamingProfile(), StreamingCorrelation(), QuantileSketches(), FrequencySketches()
+
+    def accumulate(chunk):
+        for acc in (profile, correlation, quantiles, frequencies):
+            acc.update(chunk)
+
+    total, schema, parts = 0, None, []
+    profile, correlation, quantiles, frequencies = accumulators()
+    reader = pd.read_csv(csv_path, chunksize=int(chunksize), engine="c", **opts)
+    for i, chunk in enumerate(reader):
+        chunk.columns = chunk.columns.str.strip()
+        raw = pa.Table.from_pandas(chunk, preserve_index=False).replace_schema_metadata(None)
+        table, schema, widened = _to_schema(raw, schema)
+        if widened:
+            # Raro: reescreve as partes anteriores com o tipo alargado e refaz as estatísticas
+            profile, correlation, quantiles, frequencies = accumulators()
+            for part in parts:
+                with pa.memory_map(part) as source:
+                    old = ipc.open_file(source).read_all().cast(schema)
+                _write_part(part, old)
+                accumulate(old.to_pandas())
+        if not table.schema.equals(raw.schema):
+            chunk = table.to_pandas()
+        parts.append(os.path.join(path, f"part-{i:05d}.arrow"))
+        _write_part(parts[-1], table)
+        accumulate(chunk)
+        total += len(chunk)
+        if on_chunk:
+            on_chunk(i, total, chunk)
+    profile.save(os.path.join(path, "profile.json"))
+    correlation.save(os.path.join(path, "correlation.npz"))
+    quantiles.save(os.path.join(path, "quantiles.json"))
+    frequencies.save(os.path.join(path, "frequencies.json"))
+    return DiskDataset(path, name=name, owned=True)
@@ -1,28 +1,318 @@
-import os, zipfile
+import os, csv, re, zipfile, datetime, time, shutil, tempfile, itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import pandas as pd
 
-def read_any(files):
+try:
+    import pyarrow  # noqa: F401
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+# Nº de processos usados para ler membros de ZIPs em paralelo
+ZIP_WORKERS = int(os.getenv("EDA_ZIP_WORKERS", os.cpu_count() or 1))
+# Bytes lidos do início de cada ficheiro para detetar o dialeto do CSV
+SNIFF_BYTES = 64 * 1024
+_DELIMITERS = ",;\t|"
+_DECIMAL_COMMA = re.compile(r"(?:^|[;\t|])\s*\"?-?(?:\d{1,3}(?:\.\d{3})+|\d+),\d+\"?\s*(?=[;\t|]|$)", re.MULTILINE)
+# Milhares com ponto e decimal com vírgula (pt-BR): "1.234,56"
+_THOUSANDS_DOT = re.compile(r"(?:^|[;\t|])\s*\"?-?\d{1,3}(?:\.\d{3})+,\d+\"?\s*(?=[;\t|]|$)", re.MULTILINE)
+_DECIMAL_DOT = re.compile(r"(?:^|[;\t|])\s*\"?-?\d+\.\d+\"?\s*(?=[;\t|]|$)", re.MULTILINE)
+
+
+def sniff_csv(sample: bytes) -> dict:
+    """
+    Deteta encoding, separador, aspas e separadores decimal e de milhares
+    ("1.234,56") a partir de uma amostra limitada de bytes do ficheiro.
+
+    :param sample: primeiros bytes do CSV
+    :return: dict com os argumentos a passar ao pd.read_csv
+    """
+    if sample.startswith(b"\xef\xbb\xbf"):
+        encoding = "utf-8-sig"
+    else:
+        encoding = "utf-8"
+    try:
+        text = sample.decode(encoding)
+    except UnicodeDecodeError as e:
+        # Um caractere multibyte cortado no fim da amostra não invalida o UTF-8
+        if e.start >= len(sample) - 3:
+            text = sample[:e.start].decode(encoding)
+        else:
+            encoding = "latin-1"
+            text = sample.decode(encoding)
+
+    # Ignora a última linha (possivelmente incompleta) da amostra
+    if len(sample) >= SNIFF_BYTES and "\n" in text:
+        text = text[:text.rfind("\n")]
+
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=_DELIMITERS)
+        sep, quotechar = dialect.delimiter, dialect.quotechar or '"'
+    except csv.Error:
+        header = text.splitlines()[0] if text else ""
+        sep = max(_DELIMITERS, key=header.count)
+        quotechar = '"'
+
+    decimal = "."
+    if sep != ",":
+        if len(_DECIMAL_COMMA.findall(text)) > len(_DECIMAL_DOT.findall(text)):
+            decimal = ","
+
+    opts = {"sep": sep, "quotechar": quotechar, "decimal": decimal, "encoding": encoding}
+    if decimal == "," and _THOUSANDS_DOT.search(text):
+        # Só o motor C aceita thousands (o pyarrow não tem esta opção)
+        opts["thousands"] = "."
+    return opts
+
+
+def _normalize_dates(df):
+    """Converte colunas de datas (datetime.date) devolvidas pelo pyarrow em datetime64."""
+    for col in df.columns:
+        if df[col].dtype == object:
+            first = df[col].dropna()
+            if len(first) and isinstance(first.iloc[0], datetime.date):
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+def read_csv_fast(f):
+    """
+    Lê um CSV detetando o dialeto uma única vez numa amostra e usando o motor
+    mais rápido disponível (pyarrow → C), com o motor python como último recurso.
+
+    :param f: caminho ou objeto tipo ficheiro (binário, com seek)
+    :return: DataFrame
+    """
+    if isinstance(f, (str, os.PathLike)):
+        with open(f, "rb") as h:
+            return read_csv_fast(h)
+
+    start = f.tell() if hasattr(f, "tell") else 0
+    sample = f.read(SNIFF_BYTES)
+    if isinstance(sample, str):
+        sample = sample.encode("utf-8")
+    opts = sniff_csv(sample)
+
+    engines = (["pyarrow"] if _HAS_PYARROW and "thousands" not in opts else []) + ["c"]
+    for engine in engines:
+        f.seek(start)
+        try:
+            df = pd.read_csv(f, engine=engine, **opts)
+            return _normalize_dates(df) if engine == "pyarrow" else df
+        except Exception:
+            continue
+
+    # Último recurso: motor python com deteção própria do separador
+    for encoding in dict.fromkeys([opts["encoding"], "latin-1"]):
+        f.seek(start)
+        try:
+            return pd.read_csv(f, sep=None, engine="python", encoding=encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Não foi possível ler o CSV com nenhum dos motores disponíveis.")
+
+
+# Padrões pt-BR: "1.234,56", "-12,5", "1.234"; datas "31/12/2024" (com hora opcional)
+_PTBR_NUMBER = r"-?(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d+)?"
+_PTBR_DATE = r"\d{2}/\d{2}/\d{4}(?: \d{2}:\d{2}(?::\d{2})?)?"
+_ISO_DATE = r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?"
+# Colunas de texto com proporção de valores distintos até este limite viram category
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _all_match(values, pattern):
+    """Verifica (primeiro numa amostra, depois em toda a coluna) se todos os valores casam o padrão."""
+    if values.empty:
+        return False
+    if not values.head(1000).str.fullmatch(pattern).all():
+        return False
+    return bool(values.str.fullmatch(pattern).all())
+
+
+def _compact_text(s):
+    values = s.dropna().astype(str).str.strip()
+    # Só com alguma parte decimal e sem zeros à esquerda: "12.345.678" ou
+    # "01.234.567" são identificadores (CNPJ, códigos), não números
+    if (_all_match(values, _PTBR_NUMBER) and values.str.contains(",", regex=False).any()
+            and not values.str.match(r"-?0\d").any()):
+        return pd.to_numeric(s.astype(str).str.strip().str.replace(".", "", regex=False)
+                             .str.replace(",", ".", regex=False), errors="coerce")
+    if _all_match(values, _PTBR_DATE):
+        return pd.to_datetime(s, dayfirst=True, errors="coerce")
+    if _all_match(values, _ISO_DATE):
+        return pd.to_datetime(s, format="ISO8601", errors="coerce")
+    if len(s) and s.nunique(dropna=True) / len(s) <= CATEGORY_MAX_RATIO:
+        return s.astype("category")
+    return s
+
+
+def _compact_numeric(s):
+    if pd.api.types.is_bool_dtype(s):
+        return s
+    # Apenas inteiros: float32 acumularia médias/variâncias com menos precisão
+    # e alteraria os resultados dos agentes
+    if pd.api.types.is_integer_dtype(s):
+        unsigned = s.min() >= 0 if len(s) else False
+        return pd.to_numeric(s, downcast="unsigned" if unsigned else "integer")
+    return s
+
+
+def compact_dtypes(df):
+    """
+    Reduz a memória de um DataFrame: faz downcast de inteiros,
+    converte números e datas em formato pt-BR/ISO guardados como texto e
+    transforma texto de baixa cardinalidade em category.
+
+    :return: (DataFrame compactado, DataFrame com bytes poupados por coluna)
+    """
+    before = df.memory_usage(deep=True, index=False)
+    out = df.copy(deep=False)
+    for col in out.columns:
+        s = out[col]
+        if pd.api.types.is_numeric_dtype(s):
+            out[col] = _compact_numeric(s)
+        elif pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+            s = _compact_text(s)
+            out[col] = _compact_numeric(s) if pd.api.types.is_numeric_dtype(s) else s
+    after = out.memory_usage(deep=True, index=False)
+
+    report = pd.DataFrame({
+        "Coluna": df.columns,
+        "Tipo original": df.dtypes.astype(str).values,
+        "Tipo novo": out.dtypes.astype(str).values,
+        "Bytes antes": before.values,
+        "Bytes depois": after.values,
+    })
+    report["Bytes poupados"] = report["Bytes antes"] - report["Bytes depois"]
+    return out, report
+
+
+def _parse_zip_member(zip_path, member):
+    """Lê um membro CSV de um ZIP (executado num processo do pool)."""
+    t0 = time.perf_counter()
+    with zipfile.ZipFile(zip_path) as z, z.open(member) as h:
+        df = read_csv_fast(h)
+    return df, time.perf_counter() - t0
+
+
+def iter_zip_csv(f, workers=None):
+    """
+    Descomprime e lê os membros .csv de um ZIP em paralelo num pool de processos.
+
+    Mantém no máximo `workers` membros em processamento ao mesmo tempo, para
+    limitar o pico de memória, e devolve os resultados à medida que terminam.
+
+    :param f: caminho ou objeto tipo ficheiro do ZIP
+    :param workers: nº de processos (por omissão EDA_ZIP_WORKERS ou nº de CPUs)
+    :return: gerador de (índice, membro, DataFrame, segundos, total de membros)
+    """
+    workers = workers or ZIP_WORKERS
+    tmp_path = None
+    if isinstance(f, (str, os.PathLike)):
+        zip_path = f
+    else:
+        # Os processos precisam de um caminho: copia o upload para disco por blocos
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
+            shutil.copyfileobj(f, tmp, 8 * 1024 * 1024)
+            zip_path = tmp_path = tmp.name
+        f.seek(0)
+
+    try:
+        with zipfile.ZipFile(zip_path) as z:
+            members = [m for m in z.namelist() if m.lower().endswith(".csv")]
+        total = len(members)
+
+        if workers <= 1 or total <= 1:
+            for i, member in enumerate(members):
+                df, elapsed = _parse_zip_member(zip_path, member)
+                yield i, member, df, elapsed, total
+            return
+
+        # spawn: evita fork de um processo com threads (ex.: servidor Streamlit)
+        with ProcessPoolExecutor(max_workers=min(workers, total), mp_context=mp.get_context("spawn")) as pool:
+            pending = {}
+            queue = iter(enumerate(members))
+            for i, member in itertools.islice(queue, workers):
+                pending[pool.submit(_parse_zip_member, zip_path, member)] = (i, member)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    i, member = pending.pop(fut)
+                    df, elapsed = fut.result()
+                    for j, nxt in itertools.islice(queue, 1):
+                        pending[pool.submit(_parse_zip_member, zip_path, nxt)] = (j, nxt)
+                    yield i, member, df, elapsed, total
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+def dataset_name(path) -> str:
+    """Nome do dataset a partir do nome do ficheiro (ou membro do ZIP), sem extensão."""
+    return os.path.splitext(os.path.basename(str(path)))[0]
+
+
+def read_any(files, workers=None, on_progress=None, compact=False, reports=None):
+    """
+    Lê CSVs e ZIPs de CSVs para um dict {nome: DataFrame}.
+
+    :param workers: nº de processos para os membros de ZIPs
+    :param on_progress: callback opcional (membro, concluídos, total, segundos)
+                        chamado a cada membro de ZIP lido
+    :param compact: aplica compact_dtypes a cada DataFrame lido
+    :param reports: dict opcional preenchido com {nome: relatório de compactação}
+    """
     dfs = {}
     def add_df(path, df):
-        name = os.path.splitext(os.path.basename(path))[0]
+        name = dataset_name(path)
         df.columns = df.columns.str.strip()
+        if compact:
+            df, report = compact_dtypes(df)
+            if reports is not None:
+                reports[name] = report
         dfs[name] = df
 
     for f in files:
         fname = getattr(f, "name", str(f))
         if str(fname).lower().endswith(".zip"):
-            with zipfile.ZipFile(f) as z:
-                for member in z.namelist():
-                    if member.lower().endswith(".csv"):
-                        with z.open(member) as h:
-                            df = pd.read_csv(h, sep=None, engine="python")
-                            add_df(member, df)
+            parsed = {}
+            for done, (i, member, df, elapsed, total) in enumerate(iter_zip_csv(f, workers), start=1):
+                parsed[i] = (member, df)
+                if on_progress:
+                    on_progress(member, done, total, elapsed)
+            # Mantém a ordem original dos membros no ZIP
+            for i in sorted(parsed):
+                add_df(*parsed[i])
         elif str(fname).lower().endswith(".csv"):
-            df = pd.read_csv(f, sep=None, engine="python")
+            df = read_csv_fast(f)
             add_df(fname, df)
     return dfs
 
 
+def _match_names(available, wanted):
+    """Nomes de `available` pedidos em `wanted` (sem diferenciar maiúsculas/espaços)."""
+    wanted = {str(w).strip().lower() for w in (wanted or [])}
+    return [a for a in available if str(a).strip().lower() in wanted]
+
+
+def select_datasets(dfs, names=None, columns=None):
+    """
+    Subconjunto dos datasets pedido pelo roteador. Sem nomes reconhecidos,
+    usa os datasets que contêm alguma das colunas pedidas ou, por fim, todos.
+    """
+    chosen = _match_names(dfs.keys(), names)
+    if not chosen and columns:
+        chosen = [k for k, df in dfs.items() if _match_names(df.columns, columns)]
+    return {k: dfs[k] for k in chosen} if chosen else dfs
+
+
+def select_columns(columns, wanted=None):
+    """Colunas pedidas pelo roteador que existem em `columns` (todas, se nenhuma existir)."""
+    chosen = _match_names(columns, wanted)
+    return pd.Index(chosen) if chosen else columns
+
+
 def build_result_block(block_type: str, title: str, content):
     """
     Cria um bloco padronizado para retorno dos agentes.